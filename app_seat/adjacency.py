@@ -0,0 +1,198 @@
+# app_seat/adjacency.py
+"""
+Índice de adyacencia de asientos por evento.
+
+Seat.number es texto libre, así que el orden físico dentro de la fila se
+guarda en Seat.position (lo fija la sincronización del plano según la X
+del canvas; `rebuild_seat_positions` lo recalcula por orden natural del
+número cuando falta). A partir de ahí se construye, una vez por evento y
+en caché, el mapa:
+
+    event_seat_id -> (row_id, section_id, left_id, right_id)
+
+con el que se validan selecciones sin consultas extra: comprobar que una
+retención no deja un asiento suelto es O(tamaño de la selección).
+
+Cada proceso guarda además los índices de los últimos eventos usados, junto
+con un sello de versión por evento que vive en la caché: una retención solo
+lee ese sello (unos bytes) y reutiliza el índice en memoria si coincide, en
+lugar de deserializar el índice entero. `invalidate_adjacency` cambia el
+sello al confirmar la transacción.
+"""
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from .models import EventSeat, Seat
+
+ADJACENCY_TTL = getattr(settings, "SEAT_ADJACENCY_TTL", 60 * 60)
+# Índices que cada proceso mantiene en memoria (los de los eventos más recientes)
+ADJACENCY_LOCAL_EVENTS = getattr(settings, "SEAT_ADJACENCY_LOCAL_EVENTS", 16)
+
+# (row_id, section_id, left_event_seat_id, right_event_seat_id)
+Neighbours = Tuple[str, str, Optional[str], Optional[str]]
+
+
+# event_id -> (versión, índice)
+_local: "OrderedDict[str, Tuple[str, Dict]]" = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def _adjacency_key(event_id) -> str:
+    return f"seat-adjacency:{event_id}"
+
+
+def _version_key(event_id) -> str:
+    return f"seat-adjacency-version:{event_id}"
+
+
+def _version(event_id) -> str:
+    key = _version_key(event_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def natural_key(number: str):
+    """'A10' > 'A9' > 'A1': compara los tramos numéricos como números."""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", number or "")]
+
+
+def invalidate_adjacency(event_ids: Iterable) -> None:
+    """Invalida el índice de los eventos al confirmar la transacción en curso (en el acto si no hay)."""
+    event_ids = [str(pk) for pk in event_ids]
+
+    def bump():
+        cache.set_many({_version_key(pk): uuid.uuid4().hex for pk in event_ids}, None)
+        cache.delete_many([_adjacency_key(pk) for pk in event_ids])
+
+    transaction.on_commit(bump)
+
+
+def rebuild_seat_positions(venue_id) -> int:
+    """
+    Recalcula Seat.position de todo el recinto por orden natural de número
+    en las filas donde falte alguna posición. Devuelve cuántos asientos cambió.
+    """
+    rows: Dict[str, List[tuple]] = {}
+    for pk, row_id, number, position in (
+        Seat.objects.filter(row__section__venue_id=venue_id)
+        .order_by()
+        .values_list("pk", "row_id", "number", "position")
+    ):
+        rows.setdefault(row_id, []).append((pk, number, position))
+
+    ids, positions = [], []
+    for seats in rows.values():
+        if all(position is not None for _, _, position in seats):
+            continue
+        for i, (pk, _, position) in enumerate(sorted(seats, key=lambda s: natural_key(s[1])), start=1):
+            if position != i:
+                ids.append(pk)
+                positions.append(i)
+
+    if ids:
+        table = connection.ops.quote_name(Seat._meta.db_table)
+        with connection.cursor() as cur:
+            cur.execute(
+                f"UPDATE {table} AS s SET position = v.position "
+                f"FROM unnest(%s::varchar[], %s::int[]) AS v(id, position) WHERE s.id = v.id",
+                [ids, positions],
+            )
+    invalidate_adjacency(EventSeat.objects.filter(seat__row__section__venue_id=venue_id)
+                         .values_list("event_id", flat=True).distinct())
+    return len(ids)
+
+
+def get_adjacency(event_id, refresh: bool = False) -> Dict[str, Neighbours]:
+    """
+    Índice de vecinos del evento (cacheado hasta que cambian sus asientos).
+    `refresh` lo reconstruye aunque el sello no haya cambiado (asientos
+    creados sin señales, p. ej. con bulk_create).
+    """
+    event_id = str(event_id)
+    version = _version(event_id)
+    if not refresh:
+        with _local_lock:
+            local = _local.get(event_id)
+            if local is not None and local[0] == version:
+                _local.move_to_end(event_id)
+                return local[1]
+        cached = cache.get(_adjacency_key(event_id))
+        if cached is not None and cached[0] == version:
+            _remember(event_id, version, cached[1])
+            return cached[1]
+
+    rows: Dict[str, List[tuple]] = {}
+    for pk, row_id, section_id, position, number in (
+        EventSeat.objects.filter(event_id=event_id)
+        .order_by()
+        .values_list("pk", "seat__row_id", "seat__row__section_id", "seat__position", "seat__number")
+    ):
+        rows.setdefault(row_id, []).append((position, natural_key(number), str(pk), section_id))
+
+    index = {}
+    for row_id, seats in rows.items():
+        # Sin posición (aún no sincronizado) se ordena por número
+        seats.sort(key=lambda s: (s[0] is None, s[0] or 0, s[1]))
+        ordered = [s[2] for s in seats]
+        for i, (_, _, pk, section_id) in enumerate(seats):
+            index[pk] = (
+                row_id,
+                section_id,
+                ordered[i - 1] if i > 0 else None,
+                ordered[i + 1] if i + 1 < len(ordered) else None,
+            )
+    # Con la versión leída antes de consultar: si cambia mientras tanto, este índice no se reutiliza
+    cache.set(_adjacency_key(event_id), (version, index), ADJACENCY_TTL)
+    _remember(event_id, version, index)
+    return index
+
+
+def _remember(event_id: str, version: str, index: Dict[str, Neighbours]) -> None:
+    with _local_lock:
+        _local[event_id] = (version, index)
+        _local.move_to_end(event_id)
+        while len(_local) > ADJACENCY_LOCAL_EVENTS:
+            _local.popitem(last=False)
+
+
+def neighbourhood(index: Dict[str, Neighbours], selected: Iterable[str], reach: int = 2) -> Set[str]:
+    """Ids de la selección más sus vecinos hasta `reach` posiciones a cada lado."""
+    out = set()
+    for pk in selected:
+        out.add(pk)
+        for side in (2, 3):
+            cur = pk
+            for _ in range(reach):
+                cur = index[cur][side]
+                if cur is None:
+                    break
+                out.add(cur)
+    return out
+
+
+def find_orphans(index: Dict[str, Neighbours], selected: Set[str], free: Set[str]) -> List[str]:
+    """
+    Asientos libres que quedarían aislados (sin vecino libre a ningún lado)
+    si se retiene `selected`. `free` son los libres antes de retener.
+    """
+    remaining = free - selected
+    orphans = []
+    for pk in selected:
+        for side in (2, 3):
+            gap = index[pk][side]
+            if gap is None or gap not in remaining:
+                continue
+            _, _, left, right = index[gap]
+            if (left is None or left not in remaining) and (right is None or right not in remaining):
+                orphans.append(gap)
+    return sorted(set(orphans))
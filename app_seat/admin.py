@@ -1,4 +1,4 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django import forms
 from django.contrib.gis.geos import Point
 from import_export.admin import ImportExportModelAdmin
@@ -14,17 +14,26 @@ from django.shortcuts import get_object_or_404, render
 from django.urls import path, reverse
 
 from .utils import extract_lat_lon_from_link
+from .price_rules import apply_rules, preview_rules
+from .publishing import publish_for_event, publish_seatmap
+from .services import SeatServiceError, TRANSITION_FIELDS, transition_seat
 from .models import (
     Venue,
     Section,
     Row,
     Seat,
     SeatMap,
+    SeatMapRevision,
+    SeatMapSyncJob,
+    PublishedSeatMap,
     Event,
     PriceCategory,
+    PriceRule,
     EventSeat,
     Hold,
     Booking,
+    WaitingRoom,
+    EventArchive,
 )
 
 # <<< IMPORTANTE: importa el sincronizador >>>
@@ -66,6 +75,33 @@ class PriceCategoryInline(admin.TabularInline):
     ordering = ("name",)
 
 
+class PriceRuleInline(admin.TabularInline):
+    model = PriceRule
+    extra = 0
+    fields = ("order", "active", "price_category", "section", "row_from", "row_to", "seat_type")
+    ordering = ("order",)
+    raw_id_fields = ("section",)
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        # Solo las categorías del evento que se está editando
+        if db_field.name == "price_category":
+            event_id = request.resolver_match.kwargs.get("object_id") if request.resolver_match else None
+            kwargs["queryset"] = PriceCategory.objects.filter(event_id=event_id)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class SeatMapRevisionInline(admin.TabularInline):
+    model = SeatMapRevision
+    extra = 0
+    fields = ("version", "kind", "user", "created_at")
+    readonly_fields = fields
+    ordering = ("-version",)
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 # -------------------------
 # Helpers
 # -------------------------
@@ -213,7 +249,48 @@ class EventAdmin(admin.ModelAdmin):
     search_fields = ("name",)
     prepopulated_fields = {"slug": ("name",)}
     ordering = ("start_datetime",)
-    inlines = [PriceCategoryInline]
+    inlines = [PriceCategoryInline, PriceRuleInline]
+    actions = ["preview_price_rules", "apply_price_rules", "publish_seatmaps"]
+    # Se cambia con la acción de publicar, que comprueba que los asientos estén alineados
+    readonly_fields = ("published_seatmap",)
+
+    @admin.action(description="Previsualizar reglas de precio (sin guardar)")
+    def preview_price_rules(self, request, queryset):
+        for event in queryset:
+            try:
+                preview = preview_rules(event.pk)
+            except SeatServiceError as exc:
+                messages.error(request, f"{event.name}: {exc}")
+                continue
+            counts = ", ".join(f"{name}: {n}" for name, n in sorted(preview["categories"].items())) or "ninguna"
+            messages.info(
+                request,
+                f"{event.name}: {counts}. Cambiarían {preview['changed']}; "
+                f"sin regla {preview['unmatched']}; retenidos/vendidos {preview['locked']}.",
+            )
+
+    @admin.action(description="Aplicar reglas de precio")
+    def apply_price_rules(self, request, queryset):
+        for event in queryset:
+            try:
+                changed = apply_rules(event.pk)
+            except SeatServiceError as exc:
+                messages.error(request, f"{event.name}: {exc}")
+                continue
+            messages.success(request, f"{event.name}: {changed} asientos cambiaron de categoría.")
+
+    @admin.action(description="Publicar el plano y servirlo a los compradores")
+    def publish_seatmaps(self, request, queryset):
+        for event in queryset.select_related("seatmap"):
+            try:
+                published = publish_for_event(event, user=request.user)
+            except SeatServiceError as exc:
+                messages.error(request, f"{event.name}: {exc}")
+                continue
+            messages.success(
+                request,
+                f"{event.name}: publicado v{published.seatmap_version} ({published.seat_count} asientos).",
+            )
 
 
 @admin.register(PriceCategory)
@@ -224,10 +301,44 @@ class PriceCategoryAdmin(admin.ModelAdmin):
     ordering = ("event", "name")
 
 
+class EventSeatAdminForm(forms.ModelForm):
+    # Versión leída al abrir el formulario; el guardado la usa como compare-and-swap
+    expected_version = forms.IntegerField(widget=forms.HiddenInput, required=False)
+
+    class Meta:
+        model = EventSeat
+        fields = "__all__"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.fields["expected_version"].initial = self.instance.version
+
+    def clean(self):
+        cleaned = super().clean()
+        expected = cleaned.get("expected_version")
+        if self.instance.pk and expected is not None:
+            # El admin valida y guarda en la misma transacción: con la fila
+            # bloqueada, nadie puede cambiar la versión entre esta comprobación
+            # y save_model, así que el conflicto se muestra aquí y no tras guardar
+            current = (
+                EventSeat.objects.select_for_update()
+                .filter(pk=self.instance.pk)
+                .values_list("version", flat=True)
+                .first()
+            )
+            if current is not None and current != expected:
+                raise forms.ValidationError(
+                    "Otro usuario modificó este asiento mientras lo editabas. Recarga la página."
+                )
+        return cleaned
+
+
 @admin.register(EventSeat)
 class EventSeatAdmin(admin.ModelAdmin):
+    form = EventSeatAdminForm
     list_display = ("event", "seat", "status",
-                    "price_category", "hold_expires_at")
+                    "price_category", "price", "hold_expires_at", "version")
     list_filter = ("status", "event", "price_category")
     search_fields = (
         "event__name",
@@ -238,6 +349,40 @@ class EventSeatAdmin(admin.ModelAdmin):
     ordering = ("event", "seat__row__section__name",
                 "seat__row__name", "seat__number")
     raw_id_fields = ("seat",)
+    readonly_fields = ("version",)
+
+    def get_readonly_fields(self, request, obj=None):
+        fields = super().get_readonly_fields(request, obj)
+        # El asiento y el evento identifican la fila: no se reasignan al editar
+        return (*fields, "event", "seat") if obj else fields
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            return super().save_model(request, obj, form, change)
+
+        expected = form.cleaned_data.get("expected_version")
+        if expected is None:
+            expected = obj.version
+        changes = {f: form.cleaned_data[f] for f in form.changed_data if f in TRANSITION_FIELDS}
+        others = {
+            f: form.cleaned_data[f] for f in form.changed_data
+            if f not in TRANSITION_FIELDS and f != "expected_version"
+        }
+        if changes:
+            if changes.get("price_category") is not None:
+                changes["price_category"] = changes["price_category"].pk
+            transition_seat(obj.pk, expected, **changes)
+        if others:
+            EventSeat.objects.filter(pk=obj.pk).update(**others)
+
+
+@admin.register(WaitingRoom)
+class WaitingRoomAdmin(admin.ModelAdmin):
+    list_display = ("event", "active", "rate_per_second", "burst", "issued", "admitted")
+    list_filter = ("active",)
+    search_fields = ("event__name",)
+    readonly_fields = ("issued", "admitted", "admitted_at")
+    raw_id_fields = ("event",)
 
 
 @admin.register(Hold)
@@ -258,13 +403,65 @@ class BookingAdmin(admin.ModelAdmin):
     filter_horizontal = ("seats",)
 
 
+@admin.register(SeatMapSyncJob)
+class SeatMapSyncJobAdmin(admin.ModelAdmin):
+    list_display = ("venue", "seatmap_version", "status", "progress", "saves", "attempts", "created_at", "finished_at")
+    list_filter = ("status", "venue")
+    ordering = ("-created_at",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PublishedSeatMap)
+class PublishedSeatMapAdmin(admin.ModelAdmin):
+    list_display = ("seatmap", "seatmap_version", "seat_count", "content_hash", "published_by", "created_at")
+    list_filter = ("seatmap__venue",)
+    ordering = ("-created_at",)
+    exclude = ("data_gzip",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(EventArchive)
+class EventArchiveAdmin(admin.ModelAdmin):
+    list_display = ("event", "seat_count", "booked_count", "booking_count", "codec", "raw_size", "created_at")
+    search_fields = ("event__name",)
+    exclude = ("payload",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(SeatMap)
 class SeatMapAdmin(admin.ModelAdmin):
-    list_display = ("venue", "name")
+    list_display = ("venue", "name", "version")
     list_filter = ("venue",)
     search_fields = ("name",)
     ordering = ("venue", "name")
     change_form_template = "admin/app_seat/seatmap/change_form.html"
+    inlines = [SeatMapRevisionInline]
+    actions = ["publish"]
+
+    @admin.action(description="Publicar (versión inmutable para compradores)")
+    def publish(self, request, queryset):
+        for seatmap in queryset.select_related("venue"):
+            try:
+                published = publish_seatmap(seatmap, user=request.user)
+            except SeatServiceError as exc:
+                messages.error(request, f"{seatmap}: {exc}")
+                continue
+            messages.success(request, f"{seatmap}: publicado v{published.seatmap_version} ({published.content_hash[:8]}).")
 
     def get_urls(self):
         urls = super().get_urls()
@@ -0,0 +1,386 @@
+# app_seat/admission.py
+"""
+Sala de espera virtual (control de admisión) para on-sales de alta demanda.
+
+Flujo:
+  1) El cliente (autenticado) pide un ticket de cola -> token firmado con
+     su posición y su usuario.
+  2) Consulta su estado; cuando su posición queda admitida recibe un pase
+     firmado y de corta duración, válido solo para ese usuario y evento.
+  3) Las rutas de selección/retención exigen el pase (cabecera
+     X-Queue-Token) mientras la sala del evento esté activa.
+
+La cola avanza como un token bucket: `admitted` crece a `rate_per_second`
+y nunca supera `issued + burst`. El estado vive en un backend intercambiable
+(settings.SEAT_ADMISSION["BACKEND"]): tabla WaitingRoom o memoria del proceso
+(solo para un único nodo). Consultar la posición solo lee el estado; la cola
+la avanza un único proceso periódico (`manage.py run_waiting_room_ticker`,
+ver `advance_rooms`).
+"""
+import hashlib
+import importlib
+import math
+import threading
+import time
+from typing import Dict, Optional, Set, Tuple
+
+from fastapi import Depends, Header, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+from django.conf import settings
+from django.core import signing
+from django.db import ProgrammingError, connection, transaction
+
+from web.auth_jwt import get_current_user
+
+from .models import EventSeat, Hold, WaitingRoom
+
+TOKEN_SALT = "app_seat.admission.token"
+PASS_SALT = "app_seat.admission.pass"
+
+
+def _cfg() -> Dict:
+    return getattr(settings, "SEAT_ADMISSION", {}) or {}
+
+
+# ============================================================
+# Backends
+# ============================================================
+
+class BaseQueueBackend:
+    """Interfaz de estado de las salas de espera."""
+
+    def active_events(self) -> Set[str]:
+        raise NotImplementedError
+
+    def open(self, event_id, rate_per_second: Optional[float] = None, burst: Optional[int] = None) -> None:
+        raise NotImplementedError
+
+    def close(self, event_id) -> None:
+        raise NotImplementedError
+
+    def enqueue(self, event_id) -> Optional[int]:
+        """Emite la siguiente posición (1..n) o None si la sala no está activa."""
+        raise NotImplementedError
+
+    def advance(self, event_id) -> Optional[Tuple[int, int, float]]:
+        """Avanza la cola; devuelve (admitted, issued, rate) o None si no está activa."""
+        raise NotImplementedError
+
+    def peek(self, event_id) -> Optional[Tuple[int, int, float]]:
+        """Como `advance`, pero sin escribir: el estado proyectado a este instante."""
+        raise NotImplementedError
+
+    def is_active(self, event_id) -> bool:
+        return str(event_id) in self.active_events()
+
+
+class InMemoryQueueBackend(BaseQueueBackend):
+    """Estado en memoria del proceso. Solo válido con un único worker."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rooms: Dict[str, Dict] = {}
+
+    def active_events(self) -> Set[str]:
+        return set(self._rooms)
+
+    def open(self, event_id, rate_per_second=None, burst=None) -> None:
+        cfg = _cfg()
+        with self._lock:
+            burst = int(burst if burst is not None else cfg.get("BURST", 100))
+            self._rooms[str(event_id)] = {
+                "rate": float(rate_per_second or cfg.get("RATE_PER_SECOND", 50)),
+                "burst": burst,
+                "issued": 0,
+                "admitted": float(burst),
+                "admitted_at": time.time(),
+            }
+
+    def close(self, event_id) -> None:
+        with self._lock:
+            self._rooms.pop(str(event_id), None)
+
+    def enqueue(self, event_id) -> Optional[int]:
+        with self._lock:
+            room = self._rooms.get(str(event_id))
+            if room is None:
+                return None
+            room["issued"] += 1
+            return room["issued"]
+
+    def advance(self, event_id):
+        with self._lock:
+            room = self._rooms.get(str(event_id))
+            if room is None:
+                return None
+            now = time.time()
+            room["admitted"] = min(
+                room["issued"] + room["burst"],
+                room["admitted"] + room["rate"] * (now - room["admitted_at"]),
+            )
+            room["admitted_at"] = now
+            return int(room["admitted"]), room["issued"], room["rate"]
+
+    def peek(self, event_id):
+        # En memoria no hay fila que se dispute: avanzar al leer no cuesta nada
+        return self.advance(event_id)
+
+
+class DatabaseQueueBackend(BaseQueueBackend):
+    """
+    Estado en la tabla WaitingRoom. Las posiciones salen de una secuencia de
+    PostgreSQL por sala (nextval no bloquea filas), así que entrar en la cola
+    no escribe en la fila de la sala; solo `advance` la actualiza.
+    """
+
+    ACTIVE_TTL = 2.0
+
+    def __init__(self):
+        self._active_cache: Tuple[float, Set[str]] = (0.0, set())
+
+    def active_events(self) -> Set[str]:
+        fetched_at, events = self._active_cache
+        if time.monotonic() - fetched_at > self.ACTIVE_TTL:
+            events = {
+                str(pk) for pk in WaitingRoom.objects.filter(active=True).values_list("event_id", flat=True)
+            }
+            self._active_cache = (time.monotonic(), events)
+        return events
+
+    def _sequence(self, event_id) -> str:
+        return "app_seat_queue_" + hashlib.sha1(str(event_id).encode("utf-8")).hexdigest()[:20]
+
+    def _create_sequence(self, event_id) -> None:
+        with connection.cursor() as cur:
+            cur.execute(f"CREATE SEQUENCE IF NOT EXISTS {connection.ops.quote_name(self._sequence(event_id))}")
+
+    def _fetch(self, sql: str, params, event_id) -> Optional[tuple]:
+        """Una fila de `sql`; si la secuencia de la sala no existe (sala creada desde el admin), la crea."""
+        for _ in range(2):
+            try:
+                with transaction.atomic(), connection.cursor() as cur:
+                    cur.execute(sql.format(
+                        table=WaitingRoom._meta.db_table,
+                        sequence=connection.ops.quote_name(self._sequence(event_id)),
+                    ), params)
+                    return cur.fetchone()
+            except ProgrammingError:
+                self._create_sequence(event_id)
+        return None
+
+    def open(self, event_id, rate_per_second=None, burst=None) -> None:
+        cfg = _cfg()
+        defaults = {
+            "active": True,
+            "rate_per_second": float(rate_per_second or cfg.get("RATE_PER_SECOND", 50)),
+            "burst": int(burst if burst is not None else cfg.get("BURST", 100)),
+        }
+        self._create_sequence(event_id)
+        WaitingRoom.objects.update_or_create(
+            event_id=event_id,
+            defaults=defaults,
+            # Una sala nueva admite de golpe las primeras `burst` posiciones
+            create_defaults={**defaults, "admitted": defaults["burst"]},
+        )
+        self._active_cache = (0.0, set())
+
+    def close(self, event_id) -> None:
+        WaitingRoom.objects.filter(event_id=event_id).update(active=False)
+        self._active_cache = (0.0, set())
+
+    def enqueue(self, event_id) -> Optional[int]:
+        if not self.is_active(event_id):
+            return None
+        row = self._fetch("SELECT nextval('{sequence}')", [], event_id)
+        return int(row[0]) if row else None
+
+    def _issued(self, event_id) -> int:
+        row = self._fetch("SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM {sequence}", [], event_id)
+        return int(row[0]) if row else 0
+
+    def advance(self, event_id):
+        # Reloj de la BD para que todos los nodos vean la cola igual
+        issued = self._issued(event_id)
+        row = self._fetch(
+            "UPDATE {table} SET "
+            "issued = GREATEST(issued, %s), "
+            "admitted = LEAST(GREATEST(issued, %s) + burst, admitted + rate_per_second * "
+            "EXTRACT(EPOCH FROM (now() - admitted_at))), "
+            "admitted_at = now() "
+            "WHERE event_id = %s AND active "
+            "RETURNING admitted, issued, rate_per_second",
+            [issued, issued, str(event_id)],
+            event_id,
+        )
+        if not row:
+            return None
+        return int(row[0]), int(row[1]), float(row[2])
+
+    def peek(self, event_id):
+        issued = self._issued(event_id)
+        row = self._fetch(
+            "SELECT LEAST(GREATEST(issued, %s) + burst, admitted + rate_per_second * "
+            "EXTRACT(EPOCH FROM (now() - admitted_at))), GREATEST(issued, %s), rate_per_second "
+            "FROM {table} WHERE event_id = %s AND active",
+            [issued, issued, str(event_id)],
+            event_id,
+        )
+        if not row:
+            return None
+        return int(row[0]), int(row[1]), float(row[2])
+
+
+_backend: Optional[BaseQueueBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> BaseQueueBackend:
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                path = _cfg().get("BACKEND", "app_seat.admission.DatabaseQueueBackend")
+                module_path, cls_name = path.rsplit(".", 1)
+                _backend = getattr(importlib.import_module(module_path), cls_name)()
+    return _backend
+
+
+def advance_rooms() -> int:
+    """Avanza todas las salas activas; lo llama periódicamente un único proceso. Devuelve cuántas."""
+    backend = get_backend()
+    events = backend.active_events()
+    for event_id in events:
+        backend.advance(event_id)
+    return len(events)
+
+
+# ============================================================
+# Tokens
+# ============================================================
+
+def user_key(current_user: Dict) -> str:
+    """Usuario del JWT al que se atan tickets y pases."""
+    user_id = current_user.get("user_id") or current_user.get("sub")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="User not found")
+    return str(user_id)
+
+
+def issue_ticket(event_id, user: str) -> Optional[Dict]:
+    """Entra en la cola del evento. None si el evento no tiene sala activa."""
+    position = get_backend().enqueue(event_id)
+    if position is None:
+        return None
+    token = signing.dumps({"e": str(event_id), "p": position, "u": user}, salt=TOKEN_SALT)
+    return {"token": token, "position": position}
+
+
+def _load(token: str, salt: str, max_age_key: str, default_age: int) -> Dict:
+    try:
+        return signing.loads(token, salt=salt, max_age=_cfg().get(max_age_key, default_age))
+    except signing.BadSignature:
+        raise HTTPException(status_code=403, detail="Invalid or expired queue token")
+
+
+def queue_status(event_id, token: str, user: str) -> Dict:
+    """
+    Posición del ticket; incluye el pase de admisión cuando ya le toca.
+    Solo lee el estado de la cola (ver `advance_rooms`).
+    """
+    claims = _load(token, TOKEN_SALT, "TOKEN_MAX_AGE", 2 * 60 * 60)
+    if claims.get("e") != str(event_id):
+        raise HTTPException(status_code=403, detail="Queue token belongs to another event")
+    if claims.get("u") != user:
+        raise HTTPException(status_code=403, detail="Queue token belongs to another user")
+
+    state = get_backend().peek(event_id)
+    position = int(claims["p"])
+    if state is None:
+        # Sala cerrada: ya no hace falta esperar
+        return {"position": position, "ahead": 0, "admitted": True, "pass": None, "retry_after": 0}
+
+    admitted, issued, rate = state
+    ahead = max(0, position - admitted)
+    data = {
+        "position": position,
+        "ahead": ahead,
+        "queue_length": max(0, issued - admitted),
+        "admitted": ahead == 0,
+        "pass": None,
+        "retry_after": 0 if ahead == 0 else min(30, max(1, math.ceil(ahead / max(rate, 0.001)))),
+    }
+    if ahead == 0:
+        data["pass"] = signing.dumps({"e": str(event_id), "p": position, "u": user}, salt=PASS_SALT)
+    return data
+
+
+def check_pass(token: Optional[str], event_id, user: str) -> Dict:
+    """Valida un pase de admisión del evento emitido para `user`."""
+    if not token:
+        raise HTTPException(status_code=403, detail="Queue token required")
+    claims = _load(token, PASS_SALT, "PASS_MAX_AGE", 15 * 60)
+    if claims.get("e") != str(event_id):
+        raise HTTPException(status_code=403, detail="Queue token belongs to another event")
+    if claims.get("u") != user:
+        raise HTTPException(status_code=403, detail="Queue token belongs to another user")
+    return claims
+
+
+# ============================================================
+# Dependencia FastAPI
+# ============================================================
+
+# Rutas CRUD genéricas /api/app_seat/<modelo>/{pk}: modelo -> evento del objeto
+_PK_MODELS = {"eventseat": EventSeat, "hold": Hold}
+
+
+async def _request_event(request: Request) -> Optional[str]:
+    """Evento de la petición: del path (event_id, event_seat_id o el pk de un EventSeat/Hold) o del cuerpo."""
+    params = request.path_params
+    if params.get("event_id") is not None:
+        return str(params["event_id"])
+    model, pk = None, None
+    if params.get("event_seat_id") is not None:
+        model, pk = EventSeat, params["event_seat_id"]
+    elif params.get("pk") is not None:
+        segments = request.url.path.rstrip("/").split("/")
+        model, pk = _PK_MODELS.get(segments[-2] if len(segments) > 1 else ""), params["pk"]
+    if model is not None:
+        event_id = await run_in_threadpool(
+            lambda: model.objects.filter(pk=pk).values_list("event_id", flat=True).first()
+        )
+        if event_id is not None:
+            return str(event_id)
+
+    if request.method in ("POST", "PUT", "PATCH"):
+        try:
+            body = await request.json()
+        except Exception:
+            body = None
+        if isinstance(body, dict) and body.get("event") is not None:
+            return str(body["event"])
+    return None
+
+
+async def require_admission(
+    request: Request,
+    x_queue_token: Optional[str] = Header(None),
+    current_user: Dict = Depends(get_current_user),
+) -> Optional[Dict]:
+    """
+    Exige un pase de admisión del usuario si el evento de la petición tiene
+    una sala activa (ver `_request_event`). Si hay salas activas y no se
+    puede determinar el evento, responde 403: un pase de otra sala no vale.
+    """
+    backend = get_backend()
+    active = await run_in_threadpool(backend.active_events)
+    if not active:
+        return None
+
+    event_id = await _request_event(request)
+    if event_id is None:
+        raise HTTPException(status_code=403, detail="Cannot determine the event for admission")
+    if event_id not in active:
+        return None
+    return check_pass(x_queue_token, event_id, user_key(current_user))
@@ -0,0 +1,203 @@
+# app_seat/allocation.py
+"""
+Asignación automática de asientos para grupos grandes (colegios, empresas).
+
+Busca, dentro de una sección, un bloque compacto que ocupe filas contiguas:
+en cada fila toma un tramo continuo de asientos libres centrado en la
+columna del bloque, sin dejar asientos sueltos a los lados. Cada candidato
+se puntúa por filas usadas (fragmentación), distancia al punto focal y
+dispersión horizontal; el mejor se retiene con create_hold (atómico).
+
+Coordenadas: fila = rango de la fila dentro de su sección (0 = primera);
+columna = desplazamiento respecto al centro de su fila (posiciones del
+índice de adyacencia), así que filas de distinto largo quedan alineadas.
+
+Con `seat_types` los asientos libres de otros tipos no son elegibles, pero
+siguen contando para la regla de asientos sueltos de create_hold: los tramos
+se forman con todos los libres y el bloque solo toma los elegibles, sin
+dejar aislado a ninguno de los demás.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .adjacency import find_orphans, get_adjacency
+from .models import EventSeat, Hold, Row
+from .services import (
+    HOLD_MAX_SEATS, HOLD_NO_ORPHANS, OrphanSeats, SeatConflict, SeatServiceError, create_hold,
+)
+
+ROW_WEIGHT = getattr(settings, "SEAT_GROUP_ROW_WEIGHT", 2.0)        # coste por fila de distancia al foco
+FRAGMENT_WEIGHT = getattr(settings, "SEAT_GROUP_FRAGMENT_WEIGHT", 4.0)  # coste por fila extra usada
+MAX_ATTEMPTS = 3
+
+
+class NoBlockAvailable(SeatServiceError):
+    status_code = 409
+
+
+def _free_seats(event_id, sections, seat_types):
+    now = timezone.now()
+    qs = EventSeat.objects.filter(event_id=event_id).filter(
+        Q(status="available") | Q(status="held", hold_expires_at__lt=now)
+    )
+    if sections:
+        qs = qs.filter(seat__row__section_id__in=list(sections))
+    if seat_types:
+        qs = qs.filter(seat__seat_type__in=list(seat_types))
+    return {str(pk) for pk in qs.order_by().values_list("pk", flat=True)}
+
+
+def _section_rows(index, free, eligible) -> Dict[str, List[Tuple[str, List[Tuple[int, List[str], float, List[int]]]]]]:
+    """
+    {section_id: [(row_id, runs), ...]} con todas las filas de la sección, de
+    la primera a la última (las llenas con runs vacío, cortan el bloque).
+    runs: (inicio, [ids en orden], centro_de_fila, elegibles) de los tramos
+    libres; elegibles[i] = cuántos de ids[:i] están en `eligible`.
+    """
+    section_ids = {section_id for _, section_id, _, _ in index.values()}
+    row_keys = {
+        row_id: (order, name)
+        for row_id, order, name in Row.objects.filter(section_id__in=section_ids).values_list("pk", "order", "name")
+    }
+    sections: Dict[str, Dict[str, list]] = {}
+    for pk, (row_id, section_id, left, _) in index.items():
+        if left is not None:
+            continue
+        # Recorre la fila desde su extremo izquierdo
+        ordered, cur = [], pk
+        while cur is not None:
+            ordered.append(cur)
+            cur = index[cur][3]
+        runs, current = [], []
+        for i, sid in enumerate(ordered):
+            if sid in free:
+                current.append(sid)
+                continue
+            if current:
+                runs.append((i - len(current), current))
+                current = []
+        if current:
+            runs.append((len(ordered) - len(current), current))
+        centre = (len(ordered) - 1) / 2
+        sections.setdefault(section_id, {})[row_id] = [(s, ids, centre, _prefix(ids, eligible)) for s, ids in runs]
+    return {
+        section_id: sorted(rows.items(), key=lambda r: row_keys.get(r[0], (0, "")))
+        for section_id, rows in sections.items()
+        if any(run[3][-1] for runs in rows.values() for run in runs)
+    }
+
+
+def _prefix(ids: List[str], eligible) -> List[int]:
+    counts = [0]
+    for sid in ids:
+        counts.append(counts[-1] + (sid in eligible))
+    return counts
+
+
+def _place(length: int, take: int, start: int, target: float, eligible: List[int]) -> Optional[int]:
+    """
+    Desplazamiento dentro de un tramo de `length` para `take` asientos
+    elegibles lo más cerca posible de `target` (columna absoluta) sin dejar
+    un hueco de 1.
+    """
+    best = None
+    for offset in range(length - take + 1):
+        if offset == 1 or length - take - offset == 1:
+            continue
+        if eligible[offset + take] - eligible[offset] != take:
+            continue
+        dist = abs(start + offset + (take - 1) / 2 - target)
+        if best is None or dist < best[0]:
+            best = (dist, offset)
+    return best[1] if best else None
+
+
+def _take_from_row(runs, remaining: int, target_offset: float):
+    """Mejor tramo de la fila para el bloque: (ids, centro relativo) o None."""
+    best = None
+    for start, ids, centre, eligible in runs:
+        take = min(remaining, eligible[-1])
+        while take > 0:
+            offset = _place(len(ids), take, start, centre + target_offset, eligible)
+            if offset is not None:
+                break
+            take -= 1
+        if not take:
+            continue
+        mid = start + offset + (take - 1) / 2 - centre
+        # Primero cuantos más asientos, después lo más alineado
+        key = (-take, abs(mid - target_offset))
+        if best is None or key < best[0]:
+            best = (key, ids[offset:offset + take], mid)
+    return (best[1], best[2]) if best else None
+
+
+def find_block(event_id, size: int, *, sections: Optional[Iterable] = None,
+               seat_types: Optional[Iterable[str]] = None, max_rows: Optional[int] = None,
+               focal_row: int = 0, focal_offset: float = 0.0) -> Optional[Dict]:
+    """
+    Mejor bloque de `size` asientos libres, o None. Devuelve
+    {"section", "seats", "rows", "score"}.
+    """
+    index = get_adjacency(event_id)
+    eligible = _free_seats(event_id, sections, seat_types)
+    # Libres de cualquier tipo: los que create_hold mira al buscar asientos sueltos
+    free = _free_seats(event_id, sections, None) if seat_types else eligible
+    best = None
+    for section_id, rows in _section_rows(index, free, eligible).items():
+        for first in range(len(rows)):
+            seeds = {focal_offset}
+            seeds.update(
+                start + (len(ids) - 1) / 2 - centre for start, ids, centre, _ in rows[first][1]
+            )
+            for seed in seeds:
+                chosen, cost, remaining, target = [], 0.0, size, seed
+                for rank in range(first, len(rows)):
+                    if max_rows and rank - first >= max_rows:
+                        break
+                    taken = _take_from_row(rows[rank][1], remaining, target)
+                    if taken is None:
+                        break  # el bloque debe ocupar filas contiguas
+                    ids, mid = taken
+                    chosen.extend(ids)
+                    remaining -= len(ids)
+                    cost += len(ids) * (abs(rank - focal_row) * ROW_WEIGHT + abs(mid - focal_offset))
+                    if rank == first:
+                        target = mid
+                    if not remaining:
+                        break
+                if remaining:
+                    continue
+                used = rank - first + 1
+                score = cost / size + (used - 1) * FRAGMENT_WEIGHT
+                if best is not None and score >= best["score"]:
+                    continue
+                if HOLD_NO_ORPHANS and find_orphans(index, set(chosen), free):
+                    continue
+                best = {"section": section_id, "seats": chosen, "rows": used, "score": round(score, 3)}
+    return best
+
+
+def allocate_group(event_id, size: int, *, user=None, ttl: Optional[int] = None, **constraints) -> Tuple[Hold, Dict]:
+    """
+    Busca un bloque y lo retiene. Si otra retención gana la carrera por
+    algún asiento, vuelve a buscar (hasta MAX_ATTEMPTS veces).
+    """
+    if size < 1:
+        raise SeatServiceError("Party size must be positive")
+    if size > HOLD_MAX_SEATS:
+        raise SeatServiceError(f"At most {HOLD_MAX_SEATS} seats per hold")
+
+    for attempt in range(MAX_ATTEMPTS):
+        block = find_block(event_id, size, **constraints)
+        if block is None:
+            raise NoBlockAvailable("No block of adjacent seats available", size=size)
+        try:
+            return create_hold(event_id, block["seats"], user=user, ttl=ttl), block
+        except (SeatConflict, OrphanSeats):
+            # Otra retención cambió el bloque o sus vecinos entre la búsqueda y el hold
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AppSeatConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "app_seat"
+
+    def ready(self):
+        import app_seat.signals
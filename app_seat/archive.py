@@ -0,0 +1,237 @@
+# app_seat/archive.py
+"""
+Archivado en frío del inventario de eventos terminados.
+
+`archive_event()` vuelca en un EventArchive (JSON columnar comprimido) el
+estado final de los asientos del evento, las retenciones que queden y los
+asientos de cada reserva, y después borra por lotes las filas calientes de
+EventSeat, Hold y las tablas intermedias. Las filas de Booking se conservan
+(son el registro de la venta); solo pierden sus enlaces a asientos, que
+quedan en el archivo.
+
+Formato del JSON (format=1): cada tabla es un dict de columnas del mismo
+largo; retenciones y reservas referencian asientos por su índice en
+`seats`. El precio propio de cada asiento (`price`, vacío si usa el de su
+categoría) se guarda como texto.
+"""
+import json
+import lzma
+import zlib
+from collections import Counter
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .adjacency import invalidate_adjacency
+from .availability import invalidate_manifest
+from .models import Booking, Event, EventArchive, EventSeat, Hold
+from .partitions import detach_event_partition, is_partitioned
+
+ARCHIVE_FORMAT = 1
+DELETE_BATCH_SIZE = getattr(settings, "SEAT_ARCHIVE_BATCH_SIZE", 5000)
+DEFAULT_CODEC = getattr(settings, "SEAT_ARCHIVE_CODEC", "lzma")
+
+_COMPRESS = {
+    "lzma": lambda raw: lzma.compress(raw, preset=6),
+    "zlib": lambda raw: zlib.compress(raw, 9),
+}
+_DECOMPRESS = {
+    "lzma": lzma.decompress,
+    "zlib": zlib.decompress,
+}
+
+
+def _iso(value) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def _columns(rows: List[Dict], names) -> Dict[str, list]:
+    return {name: [row[name] for row in rows] for name in names}
+
+
+def finished_events(cutoff=None):
+    """Eventos terminados antes de `cutoff` (por defecto, ahora) y sin archivar."""
+    cutoff = cutoff or timezone.now()
+    return Event.objects.filter(
+        Q(end_datetime__lt=cutoff) | Q(end_datetime__isnull=True, start_datetime__lt=cutoff),
+        archive__isnull=True,
+    )
+
+
+# ============================================================
+# Escritura
+# ============================================================
+
+def build_payload(event: Event) -> Dict:
+    seat_fields = ("id", "seat_id", "seat__row__section__name", "seat__row__name",
+                   "seat__number", "status", "price_category_id", "price", "version", "updated_at")
+    seats = list(
+        EventSeat.objects.filter(event=event)
+        .order_by("seat__row__section__order", "seat__row__order", "seat__number", "id")
+        .values(*seat_fields)
+    )
+    index = {row["id"]: i for i, row in enumerate(seats)}
+    for row in seats:
+        row["updated_at"] = _iso(row["updated_at"])
+        row["price"] = None if row["price"] is None else str(row["price"])
+
+    def seat_refs(through, owner_field, owner_ids) -> Dict:
+        refs: Dict[str, List[int]] = {pk: [] for pk in owner_ids}
+        for owner_id, seat_id in through.objects.filter(**{f"{owner_field}__in": owner_ids}).values_list(
+            owner_field, "eventseat_id"
+        ):
+            if seat_id in index:
+                refs[owner_id].append(index[seat_id])
+        return refs
+
+    holds = list(Hold.objects.filter(event=event).values("id", "user_id", "created_at", "expires_at"))
+    hold_refs = seat_refs(Hold.seats.through, "hold_id", [h["id"] for h in holds])
+    for row in holds:
+        row["created_at"] = _iso(row["created_at"])
+        row["expires_at"] = _iso(row["expires_at"])
+        row["seats"] = hold_refs[row["id"]]
+
+    bookings = list(Booking.objects.filter(event=event).values("id", "user_id", "status", "total_price", "created_at"))
+    booking_refs = seat_refs(Booking.seats.through, "booking_id", [b["id"] for b in bookings])
+    for row in bookings:
+        row["created_at"] = _iso(row["created_at"])
+        row["total_price"] = str(row["total_price"])
+        row["seats"] = booking_refs[row["id"]]
+
+    return {
+        "format": ARCHIVE_FORMAT,
+        "event": {
+            "id": event.pk,
+            "name": event.name,
+            "slug": event.slug,
+            "venue_id": event.venue_id,
+            "start_datetime": _iso(event.start_datetime),
+            "end_datetime": _iso(event.end_datetime),
+        },
+        "price_categories": [
+            {"id": pc.pk, "name": pc.name, "price": str(pc.price)} for pc in event.price_categories.all()
+        ],
+        "seats": _columns(seats, seat_fields),
+        "holds": _columns(holds, ("id", "user_id", "created_at", "expires_at", "seats")),
+        "bookings": _columns(bookings, ("id", "user_id", "status", "total_price", "created_at", "seats")),
+    }
+
+
+def _purge_hot_rows(event: Event, batch_size: int) -> int:
+    """Borra por lotes (una transacción por lote) las filas calientes del evento."""
+    es_table = connection.ops.quote_name(EventSeat._meta.db_table)
+    hold_link = connection.ops.quote_name(Hold.seats.through._meta.db_table)
+    booking_link = connection.ops.quote_name(Booking.seats.through._meta.db_table)
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(EventSeat.objects.filter(event=event).order_by().values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                break
+            # SQL directo: el ORM cargaría cada fila para emitir post_delete
+            with connection.cursor() as cur:
+                for table in (hold_link, booking_link):
+                    cur.execute(f"DELETE FROM {table} WHERE eventseat_id = ANY(%s)", [ids])
+                cur.execute(f"DELETE FROM {es_table} WHERE event_id = %s AND id = ANY(%s)", [event.pk, ids])
+                deleted += cur.rowcount
+    Hold.objects.filter(event=event).delete()
+    if is_partitioned():
+        detach_event_partition(event.pk, drop=True)
+    invalidate_manifest(event.pk)
+    invalidate_adjacency([event.pk])
+    return deleted
+
+
+def archive_event(event: Event, *, codec: str = DEFAULT_CODEC, batch_size: int = DELETE_BATCH_SIZE,
+                  purge: bool = True) -> EventArchive:
+    """
+    Archiva un evento y (si `purge`) borra sus filas calientes.
+    Si el archivo ya existe solo completa el borrado pendiente.
+    """
+    if codec not in _COMPRESS:
+        raise ValueError(f"Unknown archive codec '{codec}'")
+
+    archive = EventArchive.objects.filter(event=event).first()
+    if archive is None:
+        with transaction.atomic():
+            payload = build_payload(event)
+            raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+            archive = EventArchive.objects.create(
+                event=event,
+                codec=codec,
+                payload=_COMPRESS[codec](raw),
+                raw_size=len(raw),
+                seat_count=len(payload["seats"]["id"]),
+                booked_count=payload["seats"]["status"].count("booked"),
+                hold_count=len(payload["holds"]["id"]),
+                booking_count=len(payload["bookings"]["id"]),
+            )
+    if purge:
+        _purge_hot_rows(event, batch_size)
+    return archive
+
+
+# ============================================================
+# Lectura
+# ============================================================
+
+class ArchivedEvent:
+    """Vista de solo lectura sobre el contenido de un EventArchive."""
+
+    def __init__(self, archive: EventArchive):
+        self.archive = archive
+        data = json.loads(_DECOMPRESS[archive.codec](bytes(archive.payload)))
+        if data.get("format") != ARCHIVE_FORMAT:
+            raise ValueError(f"Unsupported archive format {data.get('format')}")
+        self.event = data["event"]
+        self.price_categories = data["price_categories"]
+        self._seats = data["seats"]
+        self._holds = data["holds"]
+        self._bookings = data["bookings"]
+
+    @staticmethod
+    def _rows(columns: Dict[str, list]) -> Iterator[Dict]:
+        names = list(columns)
+        for values in zip(*(columns[n] for n in names)):
+            yield dict(zip(names, values))
+
+    def seats(self) -> Iterator[Dict]:
+        for row in self._rows(self._seats):
+            # Los archivos anteriores no guardaban el precio propio del asiento
+            price = row.get("price")
+            row["price"] = None if price is None else Decimal(price)
+            yield row
+
+    def holds(self) -> Iterator[Dict]:
+        seat_ids = self._seats["id"]
+        for row in self._rows(self._holds):
+            row["seats"] = [seat_ids[i] for i in row["seats"]]
+            yield row
+
+    def bookings(self) -> Iterator[Dict]:
+        seat_ids = self._seats["id"]
+        for row in self._rows(self._bookings):
+            row["seats"] = [seat_ids[i] for i in row["seats"]]
+            row["total_price"] = Decimal(row["total_price"])
+            yield row
+
+    def status_counts(self) -> Dict[str, int]:
+        return dict(Counter(self._seats["status"]))
+
+
+def load_archive(event_id) -> Optional[ArchivedEvent]:
+    archive = EventArchive.objects.filter(event_id=event_id).first()
+    return ArchivedEvent(archive) if archive else None
+
+
+def seat_status_counts(event_id) -> Dict[str, int]:
+    """Recuento de asientos por estado, desde las tablas calientes o el archivo."""
+    archived = load_archive(event_id)
+    if archived is not None:
+        return archived.status_counts()
+    rows = EventSeat.objects.filter(event_id=event_id).order_by().values("status").annotate(n=Count("id"))
+    return {row["status"]: row["n"] for row in rows}
@@ -0,0 +1,185 @@
+# app_seat/availability.py
+"""
+Representación compacta de la disponibilidad de un evento.
+
+- Manifiesto: lista ordenada y estable de ids de EventSeat, identificada por
+  un hash (manifest_version). El índice de cada asiento en el manifiesto es
+  su posición en el snapshot.
+- Snapshot: estado de cada asiento en 2 bits (4 asientos por byte,
+  el primer asiento en los bits menos significativos), en base64 o binario.
+- Delta: pares [índice, código] de los asientos cambiados desde una versión
+  de snapshot (marca de tiempo en milisegundos).
+
+Una retención vencida se codifica como disponible aunque la fila siga en
+'held'; el barrido de retenciones (services.release_expired_holds) la pasa
+a 'available' y toca updated_at, así que los deltas también la corrigen.
+"""
+import base64
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import EventSeat
+
+STATUS_CODES = {"available": 0, "held": 1, "booked": 2}
+CODE_STATUSES = {v: k for k, v in STATUS_CODES.items()}
+
+MANIFEST_TTL = getattr(settings, "SEAT_MANIFEST_TTL", 300)
+SNAPSHOT_TTL = getattr(settings, "SEAT_SNAPSHOT_TTL", 1)
+# Solapamiento para no perder cambios de transacciones que confirman tarde
+DELTA_OVERLAP_MS = getattr(settings, "SEAT_DELTA_OVERLAP_MS", 2000)
+# Deltas más antiguos que esto se responden con un snapshot completo
+DELTA_MAX_AGE_MS = getattr(settings, "SEAT_DELTA_MAX_AGE_MS", 10 * 60 * 1000)
+
+MANIFEST_ORDER = (
+    "seat__row__section__order",
+    "seat__row__section__name",
+    "seat__row__order",
+    "seat__row__name",
+    "seat__number",
+    "id",
+)
+
+
+def _manifest_key(event_id) -> str:
+    return f"seat-manifest:{event_id}"
+
+
+def _snapshot_key(event_id) -> str:
+    return f"seat-snapshot:{event_id}"
+
+
+def _now_ms() -> int:
+    return int(timezone.now().timestamp() * 1000)
+
+
+def _manifest_version(ids: Iterable[str]) -> str:
+    h = hashlib.sha1()
+    for pk in ids:
+        h.update(str(pk).encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()[:16]
+
+
+def status_code(status: str, hold_expires_at: Optional[datetime], now: datetime) -> int:
+    """Código de 2 bits del asiento; una retención vencida cuenta como disponible."""
+    if status == "held" and hold_expires_at is not None and hold_expires_at < now:
+        return STATUS_CODES["available"]
+    return STATUS_CODES.get(status, 3)
+
+
+def pack_statuses(codes: List[int]) -> bytes:
+    """Empaqueta códigos de 2 bits, 4 por byte."""
+    out = bytearray((len(codes) + 3) // 4)
+    for i, code in enumerate(codes):
+        out[i >> 2] |= (code & 0b11) << ((i & 3) * 2)
+    return bytes(out)
+
+
+def unpack_statuses(packed: bytes, count: int) -> List[int]:
+    return [(packed[i >> 2] >> ((i & 3) * 2)) & 0b11 for i in range(count)]
+
+
+def invalidate_manifest(event_id) -> None:
+    cache.delete_many([_manifest_key(event_id), _snapshot_key(event_id)])
+
+
+def get_manifest(event_id) -> Dict:
+    """Manifiesto cacheado: {"version": str, "seats": [ids]}."""
+    manifest = cache.get(_manifest_key(event_id))
+    if manifest is None:
+        ids = [
+            str(pk) for pk in EventSeat.objects.filter(event_id=event_id)
+            .order_by(*MANIFEST_ORDER)
+            .values_list("id", flat=True)
+        ]
+        manifest = {"version": _manifest_version(ids), "seats": ids}
+        cache.set(_manifest_key(event_id), manifest, MANIFEST_TTL)
+    return manifest
+
+
+def build_snapshot(event_id) -> Dict:
+    """
+    Snapshot completo del evento. 'version' se toma antes de leer para que
+    un delta posterior con since=version no pierda cambios concurrentes.
+    """
+    cached = cache.get(_snapshot_key(event_id))
+    if cached is not None:
+        return cached
+
+    version = _now_ms()
+    now = timezone.now()
+    rows = list(
+        EventSeat.objects.filter(event_id=event_id)
+        .order_by(*MANIFEST_ORDER)
+        .values_list("id", "status", "hold_expires_at")
+    )
+    ids = [str(pk) for pk, _, _ in rows]
+    manifest = {"version": _manifest_version(ids), "seats": ids}
+    cache.set(_manifest_key(event_id), manifest, MANIFEST_TTL)
+
+    packed = pack_statuses([status_code(status, expires, now) for _, status, expires in rows])
+    snapshot = {
+        "event": str(event_id),
+        "manifest_version": manifest["version"],
+        "version": version,
+        "count": len(ids),
+        "packed": packed,
+    }
+    cache.set(_snapshot_key(event_id), snapshot, SNAPSHOT_TTL)
+    return snapshot
+
+
+def snapshot_as_json(snapshot: Dict) -> Dict:
+    data = {k: v for k, v in snapshot.items() if k != "packed"}
+    data["encoding"] = "2bit-base64"
+    data["bits"] = base64.b64encode(snapshot["packed"]).decode("ascii")
+    return data
+
+
+def build_delta(event_id, since: int, manifest_version: Optional[str] = None) -> Dict:
+    """
+    Cambios desde 'since'. Si el manifiesto cambió o 'since' es demasiado
+    antiguo, devuelve {"reset": True, ...snapshot} para que el cliente
+    recargue completo.
+    """
+    version = _now_ms()
+    manifest = get_manifest(event_id)
+    stale = manifest_version and manifest_version != manifest["version"]
+    if stale or version - since > DELTA_MAX_AGE_MS:
+        invalidate_manifest(event_id)
+        data = snapshot_as_json(build_snapshot(event_id))
+        data["reset"] = True
+        return data
+
+    changed_after = datetime.fromtimestamp((since - DELTA_OVERLAP_MS) / 1000, tz=dt_timezone.utc)
+    now = timezone.now()
+    rows = EventSeat.objects.filter(
+        event_id=event_id, updated_at__gt=changed_after
+    ).values_list("id", "status", "hold_expires_at")
+
+    index = {pk: i for i, pk in enumerate(manifest["seats"])}
+    changes = []
+    for pk, status, expires in rows:
+        i = index.get(str(pk))
+        if i is None:
+            # Asiento nuevo que no está en el manifiesto cacheado
+            invalidate_manifest(event_id)
+            data = snapshot_as_json(build_snapshot(event_id))
+            data["reset"] = True
+            return data
+        changes.append([i, status_code(status, expires, now)])
+    changes.sort()
+
+    return {
+        "event": str(event_id),
+        "manifest_version": manifest["version"],
+        "since": since,
+        "version": version,
+        "changes": changes,
+    }
+
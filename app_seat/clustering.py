@@ -0,0 +1,313 @@
+# app_seat/clustering.py
+"""
+Agrupado de círculos del canvas en filas, con NumPy.
+
+Disposiciones (ui.rowLayout del plano):
+  - "straight": filas horizontales; fila nueva cuando la Y se aleja de la
+                media de la fila en curso más que la tolerancia, orden por X.
+  - "angled":   filas rectas giradas; se rota a los ejes principales (PCA)
+                y se agrupa como "straight".
+  - "arc":      filas concéntricas (anfiteatro); con un centro común (dado,
+                ajustado a las filas que ya trae el canvas o estimado) se
+                agrupa por radio y se ordena por ángulo.
+  - "auto":     "arc" si el ajuste concéntrico explica mejor las filas que
+                "angled"; si no, "angled".
+
+Todas ordenan una vez (argsort); "straight" corta con la media acumulada
+(ventanas vectorizadas por fila) y el resto donde el salto entre valores
+consecutivos supera la tolerancia; no hay bucles por punto.
+
+Si todos los asientos de una sección traen su fila (row_name, y row_index
+para el orden), `assign_rows` respeta esas filas en vez de agruparlas:
+así se conservan las filas del generador (app_seat.generator) y las que
+se colocan por fila en el diseñador.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+LAYOUTS = ("straight", "angled", "arc", "auto")
+# Radios mayores que esto × extensión de la sección se tratan como filas rectas
+MAX_ARC_RADIUS_RATIO = 20.0
+
+
+def _split(values: np.ndarray, tolerance: float) -> np.ndarray:
+    """Etiqueta de fila (0..k-1) por saltos mayores que `tolerance` en `values` ordenados."""
+    order = np.argsort(values, kind="stable")
+    labels_sorted = np.concatenate(([0], np.cumsum(np.diff(values[order]) > tolerance)))
+    labels = np.empty_like(labels_sorted)
+    labels[order] = labels_sorted
+    return labels
+
+
+def _split_running_mean(values: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Etiqueta de fila (0..k-1) recorriendo `values` en orden: un valor abre
+    fila nueva si se aleja más de `tolerance` de la media de la fila en
+    curso (el agrupado original del diseñador). Por fila se busca el corte
+    sobre una ventana que se duplica, así que no hay bucle por punto.
+    """
+    order = np.argsort(values, kind="stable")
+    v = values[order]
+    n = len(v)
+    labels_sorted = np.empty(n, dtype=np.int64)
+    start, label = 0, 0
+    while start < n:
+        end, window = n, 64
+        while True:
+            stop = min(n, start + window)
+            # Suma acumulada desde el primero de la fila: misma media (y mismos empates) que sumando uno a uno
+            d = v[start:stop]
+            mean = np.cumsum(d)[:-1] / np.arange(1, len(d))
+            far = np.flatnonzero(d[1:] - mean > tolerance)
+            if len(far):
+                end = start + 1 + int(far[0])
+                break
+            if stop == n:
+                break
+            window *= 2
+        labels_sorted[start:end] = label
+        start, label = end, label + 1
+    labels = np.empty_like(labels_sorted)
+    labels[order] = labels_sorted
+    return labels
+
+
+def _rows(labels: np.ndarray, across: np.ndarray, along: np.ndarray) -> List[np.ndarray]:
+    """Índices por fila: filas por `across` medio, dentro de cada una por `along`."""
+    order = np.lexsort((along, labels))
+    bounds = np.flatnonzero(np.diff(labels[order])) + 1
+    groups = np.split(order, bounds)
+    groups.sort(key=lambda g: across[g].mean())
+    return groups
+
+
+def _straight(x, y, tolerance) -> List[np.ndarray]:
+    return _rows(_split_running_mean(y, tolerance), y, x)
+
+
+def _rotate(x, y) -> Tuple[np.ndarray, np.ndarray]:
+    """Coordenadas (a lo largo de la fila, a través de las filas) por PCA."""
+    pts = np.column_stack((x - x.mean(), y - y.mean()))
+    _, vecs = np.linalg.eigh(pts.T @ pts)
+    along, across = pts @ vecs[:, 1], pts @ vecs[:, 0]
+    # Conserva la orientación del canvas: izquierda->derecha y arriba->abajo
+    if vecs[0, 1] < 0:
+        along = -along
+    if vecs[1, 0] < 0:
+        across = -across
+    return along, across
+
+
+def _fit_centre(x, y, labels) -> np.ndarray:
+    """
+    Centro común de filas concéntricas: mínimos cuadrados lineales de
+    x² + y² = 2ax + 2by + c_fila (un c por fila, a y b compartidos). Los c
+    se eliminan restando la media de cada fila, así que el sistema queda en
+    dos incógnitas (O(n), sin matriz de n × filas).
+    """
+    k = int(labels.max()) + 1
+    counts = np.bincount(labels, minlength=k)
+
+    def demean(v):
+        return v - (np.bincount(labels, v, minlength=k) / counts)[labels]
+
+    a = np.column_stack((demean(2 * x), demean(2 * y)))
+    sol, *_ = np.linalg.lstsq(a, demean(x * x + y * y), rcond=None)
+    return sol
+
+
+def _boundary_centre(x, y, gap, bins: int = 32) -> np.ndarray:
+    """
+    Estimación inicial del centro: círculo ajustado (con descarte de
+    atípicos) al borde exterior o interior de la nube de puntos, tomando el
+    punto extremo de cada franja a lo largo de las filas. Gana el borde
+    con más puntos sobre el círculo.
+    """
+    along, across = _rotate(x, y)
+    lo, hi = along.min(), along.max()
+    b = np.minimum(((along - lo) / max(hi - lo, 1e-9) * bins).astype(np.int64), bins - 1)
+    order = np.lexsort((across, b))
+    starts = np.r_[0, np.flatnonzero(np.diff(b[order])) + 1]
+    ends = np.r_[starts[1:] - 1, len(order) - 1]
+    best = None
+    for pick in (order[starts], order[ends]):
+        px, py = x[pick], y[pick]
+        keep = np.ones(len(pick), dtype=bool)
+        for _ in range(4):
+            centre = _fit_centre(px[keep], py[keep], np.zeros(int(keep.sum()), dtype=np.int64))
+            r = np.hypot(px - centre[0], py - centre[1])
+            keep = np.abs(r - np.median(r[keep])) <= gap
+            if keep.sum() < 4:
+                break
+        if best is None or keep.mean() > best[0]:
+            best = (keep.mean(), centre)
+    return best[1]
+
+
+def _refine_centre(x, y, centre, span, grid: int = 17, rounds: int = 4, sample: int = 4000) -> np.ndarray:
+    """
+    Refina en rejilla (de grueso a fino) buscando el centro con el que los
+    radios forman bandas más nítidas (mayor suma de saltos² entre radios
+    consecutivos, normalizada por el rango).
+    """
+    if len(x) > sample:
+        pick = np.random.default_rng(0).choice(len(x), sample, replace=False)
+        x, y = x[pick], y[pick]
+    steps = np.linspace(-1.0, 1.0, grid)
+    for _ in range(rounds):
+        gx, gy = np.meshgrid(centre[0] + span * steps, centre[1] + span * steps)
+        cand = np.column_stack((gx.ravel(), gy.ravel()))
+        radius = np.sort(np.hypot(x[None, :] - cand[:, :1], y[None, :] - cand[:, 1:]), axis=1)
+        jumps = np.diff(radius, axis=1)
+        score = (jumps ** 2).sum(axis=1) / np.maximum(radius[:, -1] - radius[:, 0], 1e-9) ** 2
+        centre = cand[score.argmax()]
+        span /= grid / 4
+    return centre
+
+
+def _arc(x, y, gap, hint=None, centre=None):
+    """
+    Filas concéntricas: (grupos, residuo medio de radio, radio medio).
+    Centro: el indicado; si no, ajuste conjunto sobre las filas que ya trae
+    el canvas (`hint`, etiquetas por asiento, -1 = sin fila); si no, estimado.
+    """
+    if centre is None:
+        if hint is not None and (hint >= 0).sum() >= 3 and len(np.unique(hint[hint >= 0])) >= 2:
+            known = hint >= 0
+            centre = _fit_centre(x[known], y[known], np.unique(hint[known], return_inverse=True)[1])
+        else:
+            extent = max(np.ptp(x), np.ptp(y), gap)
+            centre = _refine_centre(x, y, _boundary_centre(x, y, gap), 0.5 * extent)
+            labels = _split(np.hypot(x - centre[0], y - centre[1]), gap)
+            if 1 < labels.max() + 1 < len(x) - 1:
+                centre = _fit_centre(x, y, labels)
+    centre = np.asarray(centre, dtype=np.float64)
+    radius = np.hypot(x - centre[0], y - centre[1])
+    labels = _split(radius, gap)
+    angle = np.arctan2(y - centre[1], x - centre[0])
+    groups = _rows(labels, radius, angle)
+    # Izquierda->derecha en el canvas aunque el centro quede abajo
+    groups = [g if x[g[0]] <= x[g[-1]] else g[::-1] for g in groups]
+    return groups, _residual(groups, radius), float(radius.mean())
+
+
+def _residual(groups: Sequence[np.ndarray], across: np.ndarray) -> float:
+    spread = [across[g].std() for g in groups if len(g) > 1]
+    return float(np.mean(spread)) if spread else 0.0
+
+
+def row_name_for_index(idx: int) -> str:
+    # A, B, C ... R27, etc.
+    return chr(ord("A") + idx) if idx < 26 else f"R{idx + 1}"
+
+
+def row_params(data: Dict) -> Tuple[float, str, Optional[List[float]]]:
+    """(tolerance, layout, centre) de agrupado a partir de data["ui"] del plano."""
+    ui = data.get("ui", {}) if isinstance(data, dict) else {}
+    if not isinstance(ui, dict):
+        ui = {}
+    gap_y = ui.get("gapY")
+    tolerance = 0.6 * (gap_y if isinstance(gap_y, (int, float)) else 26) or 15.0
+    # "straight" | "angled" | "arc" | "auto"; arcCenter opcional [x, y] para "arc"
+    layout = ui.get("rowLayout", "straight")
+    centre = ui.get("arcCenter")
+    if not (isinstance(centre, (list, tuple)) and len(centre) == 2
+            and all(isinstance(v, (int, float)) and np.isfinite(v) for v in centre)):
+        centre = None
+    return tolerance, layout, centre
+
+
+def cluster_rows(points: Sequence[Dict], tolerance: float, layout: str = "straight",
+                 centre: Optional[Sequence[float]] = None) -> List[Dict]:
+    """
+    points: [{"cx": float, "cy": float, "row": str opcional, ...}, ...]
+    Devuelve [{"y": y_prom, "items": [point, ...]}, ...] de la primera fila
+    a la última, con los puntos de cada fila en orden. En "straight", un
+    asiento abre fila nueva si su Y se aleja más de `tolerance` de la Y
+    media de la fila en curso (como el agrupado original del diseñador). En
+    el resto, se corta fila donde el salto entre asientos consecutivos (en
+    la dirección transversal) supera tolerance / 2. En "arc", `centre` fija
+    el centro de las filas; si no se da, se ajusta a partir de las filas
+    que traigan los puntos ("row").
+    """
+    if not points:
+        return []
+    if layout not in LAYOUTS:
+        layout = "straight"
+    n = len(points)
+    x = np.fromiter((p["cx"] for p in points), dtype=np.float64, count=n)
+    y = np.fromiter((p["cy"] for p in points), dtype=np.float64, count=n)
+
+    gap = tolerance / 2
+    if layout == "straight" or n < 3:
+        groups = _straight(x, y, tolerance)
+    else:
+        along, across = _rotate(x, y)
+        angled = _rows(_split(across, gap), across, along)
+        groups = angled
+        if layout in ("arc", "auto"):
+            rows = [p.get("row") or None for p in points]
+            hint = None
+            if any(rows):
+                names = {name: i for i, name in enumerate(sorted({r for r in rows if r}))}
+                hint = np.fromiter((names[r] if r else -1 for r in rows), dtype=np.int64, count=n)
+            arc_groups, arc_residual, mean_radius = _arc(x, y, gap, hint, centre)
+            extent = max(np.ptp(x), np.ptp(y), tolerance)
+            if layout == "arc" or (
+                mean_radius < MAX_ARC_RADIUS_RATIO * extent
+                and arc_residual < _residual(angled, across)
+            ):
+                groups = arc_groups
+
+    return [
+        {"y": float(y[g].mean()), "items": [points[i] for i in g.tolist()]}
+        for g in groups
+    ]
+
+
+def _named_rows(points: Sequence[Dict]) -> List[Tuple[str, List[Dict]]]:
+    """
+    Filas tal como vienen del canvas: se agrupan por "row", se ordenan por
+    "row_index" (las que no lo traen, al final por Y media) y los asientos
+    de cada fila por su proyección sobre el eje principal de la fila,
+    de izquierda a derecha.
+    """
+    groups: Dict[str, List[int]] = {}
+    for i, p in enumerate(points):
+        groups.setdefault(str(p["row"]).strip(), []).append(i)
+    n = len(points)
+    x = np.fromiter((p["cx"] for p in points), dtype=np.float64, count=n)
+    y = np.fromiter((p["cy"] for p in points), dtype=np.float64, count=n)
+
+    def row_key(item):
+        name, members = item
+        indexes = [points[i].get("row_index") for i in members]
+        ok = all(isinstance(v, int) and not isinstance(v, bool) for v in indexes)
+        return (0, min(indexes), 0.0) if ok else (1, 0, float(y[members].mean()))
+
+    out = []
+    for name, members in sorted(groups.items(), key=row_key):
+        idx = np.asarray(members, dtype=np.int64)
+        if len(idx) > 1:
+            along, _ = _rotate(x[idx], y[idx])
+            idx = idx[np.argsort(along, kind="stable")]
+            if x[idx[0]] > x[idx[-1]]:
+                idx = idx[::-1]
+        out.append((name, [points[i] for i in idx.tolist()]))
+    return out
+
+
+def assign_rows(points: Sequence[Dict], tolerance: float, layout: str = "straight",
+                centre: Optional[Sequence[float]] = None) -> List[Tuple[str, List[Dict]]]:
+    """
+    [(nombre de fila, [point, ...]), ...] de la primera fila a la última.
+    Con fila en todos los puntos ("row") se usan esas filas; si no, se
+    agrupa con `cluster_rows` y se nombran A, B, C...
+    """
+    if points and all(str(p.get("row") or "").strip() for p in points):
+        return _named_rows(points)
+    return [
+        (row_name_for_index(i), cluster["items"])
+        for i, cluster in enumerate(cluster_rows(points, tolerance, layout, centre))
+    ]
@@ -0,0 +1,405 @@
+# app_seat/generator.py
+"""
+Generador paramétrico de bloques de asientos.
+
+En lugar de dibujar miles de círculos en el diseñador, cada sección se
+describe con unos pocos parámetros y se generan a la vez (con NumPy) los
+objetos del canvas: el contorno de la sección y un círculo por asiento con
+su fila (row_name / row_index) y su número. La sincronización respeta esas
+filas (ver clustering.assign_rows), así que Section/Row/Seat quedan tal
+como se generaron y el plano se puede seguir editando en el diseñador.
+
+Especificación de una sección (claves opcionales con su valor por defecto):
+
+    {
+      "name": "Platea",                 # obligatorio
+      "layout": "straight",             # "straight" | "rake" | "arc"
+      "rows": 10,                       # obligatorio
+      "seats": 20,                      # asientos de la primera fila
+      "seats_increment": 0,             # asientos más por fila ("rake", "arc")
+      "seats_per_row": [20, 22, ...],   # alternativa explícita a seats/seats_increment
+      "origin": [0, 0],                 # centro de la primera fila; en "arc", centro del arco
+      "angle": 0,                       # giro en grados ("straight", "rake")
+      "radius": 200,                    # radio de la primera fila ("arc")
+      "start_angle": 200, "end_angle": 340,  # sector en grados, 0 = +x, 90 = +y ("arc")
+      "spacing": ui.gapX,               # entre centros de asientos de una fila
+      "row_spacing": ui.gapY,           # entre filas
+      "seat_radius": ui.seatRadius,
+      "row_labels": "letters",          # "letters" (A..Z, AA..) | "numbers"
+      "first_row": 1,                   # posición de la primera etiqueta de fila
+      "skip_rows": [],                  # etiquetas que no se usan (p. ej. ["I", "O"])
+      "numbering": "sequential",        # "sequential" | "odd" | "even" | "center_out"
+      "direction": "ltr",               # "ltr" | "rtl"
+      "first_seat": 1,                  # 2 por defecto con "even"
+      "order": n, "category": "", "seat_type": "standard", "color": "#63b46b"
+    }
+
+En "arc" sin "seats", cada fila lleva los asientos que caben en el sector
+con esa separación; el sector es de 180 grados como mucho. La primera fila es la más cercana al escenario (origen).
+"""
+import math
+import uuid
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from .services import SeatServiceError
+
+LAYOUTS = ("straight", "rake", "arc")
+NUMBERINGS = ("sequential", "odd", "even", "center_out")
+FABRIC_VERSION = "5.3.0"
+# Límites por petición: el generador es para planos reales, no para cualquier tamaño
+MAX_SEATS = getattr(settings, "SEAT_GENERATOR_MAX_SEATS", 100_000)
+MAX_ROWS = getattr(settings, "SEAT_GENERATOR_MAX_ROWS", 500)
+
+_SECTION_STYLE = {
+    "fill": "rgba(100,100,100,.10)",
+    "stroke": "#475569",
+    "strokeWidth": 3,
+    "objectCaching": False,
+    "noScaleCache": True,
+    "perPixelTargetFind": True,
+}
+_SEAT_STROKE = {"stroke": "#334155", "strokeWidth": 0.6}
+_DEFAULT_COLOR = "#63b46b"
+
+
+class GeneratorError(SeatServiceError):
+    status_code = 400
+
+
+# --------- parámetros ----------
+def _num(spec: Dict, key: str, default: float, *, positive: bool = False) -> float:
+    value = spec.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise GeneratorError(f"{key} must be a number", field=key)
+    if positive and value <= 0:
+        raise GeneratorError(f"{key} must be positive", field=key)
+    return float(value)
+
+
+def _int(spec: Dict, key: str, default: int, *, minimum: int = 0) -> int:
+    value = spec.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, int) or value < minimum:
+        raise GeneratorError(f"{key} must be an integer >= {minimum}", field=key)
+    return value
+
+
+def _choice(spec: Dict, key: str, choices: Sequence[str]) -> str:
+    value = spec.get(key, choices[0])
+    if value not in choices:
+        raise GeneratorError(f"{key} must be one of: {', '.join(choices)}", field=key)
+    return value
+
+
+def _point(spec: Dict, key: str) -> Tuple[float, float]:
+    value = spec.get(key, [0, 0])
+    if not (isinstance(value, (list, tuple)) and len(value) == 2
+            and all(not isinstance(v, bool) and isinstance(v, (int, float)) and math.isfinite(v) for v in value)):
+        raise GeneratorError(f"{key} must be [x, y]", field=key)
+    return float(value[0]), float(value[1])
+
+
+# --------- etiquetas y numeración ----------
+def _letters(idx: int) -> str:
+    # 0 -> A, 25 -> Z, 26 -> AA (como nextLetter del diseñador)
+    out = ""
+    idx += 1
+    while idx > 0:
+        idx, rem = divmod(idx - 1, 26)
+        out = chr(ord("A") + rem) + out
+    return out
+
+
+def row_labels(count: int, style: str = "letters", first: int = 1, skip: Sequence[str] = ()) -> List[str]:
+    """`count` etiquetas de fila a partir de la posición `first` (1 = A / 1), sin las de `skip`."""
+    skip = {str(s).strip().upper() for s in skip}
+    label = _letters if style == "letters" else (lambda i: str(i + 1))
+
+    def labels() -> Iterator[str]:
+        i = first - 1
+        while True:
+            name = label(i)
+            if name.upper() not in skip:
+                yield name
+            i += 1
+
+    gen = labels()
+    return [next(gen) for _ in range(count)]
+
+
+def seat_numbers(n: int, numbering: str = "sequential", direction: str = "ltr",
+                 first: Optional[int] = None) -> np.ndarray:
+    """
+    Números de los `n` asientos de una fila, de izquierda a derecha.
+    "center_out": 1 en el centro, impares hacia un lado y pares hacia el
+    otro (impares a la derecha con "ltr").
+    """
+    k = np.arange(n)
+    if direction == "rtl":
+        k = k[::-1]
+    if numbering == "sequential":
+        return (1 if first is None else first) + k
+    if numbering in ("odd", "even"):
+        start = first if first is not None else (1 if numbering == "odd" else 2)
+        return start + 2 * k
+    # center_out: posiciones desde el centro, alternando lado
+    centre = n // 2
+    offset = k - centre
+    out = np.where(offset >= 0, 2 * offset + 1, -2 * offset)
+    return out + ((first if first is not None else 1) - 1)
+
+
+# --------- geometría ----------
+class _Block:
+    """Filas de una sección en coordenadas (u a lo largo de la fila, v a través) y su paso al canvas."""
+
+    def __init__(self, spec: Dict, ui: Dict):
+        self.layout = _choice(spec, "layout", LAYOUTS)
+        self.rows = _int(spec, "rows", 0, minimum=1)
+        if self.rows > MAX_ROWS:
+            raise GeneratorError(f"At most {MAX_ROWS} rows per section", field="rows")
+        self.spacing = _num(spec, "spacing", ui.get("gapX", 24), positive=True)
+        self.row_spacing = _num(spec, "row_spacing", ui.get("gapY", 26), positive=True)
+        self.seat_radius = _num(spec, "seat_radius", ui.get("seatRadius", 10), positive=True)
+        self.origin = _point(spec, "origin")
+        self.v = np.arange(self.rows) * self.row_spacing
+        if self.layout == "arc":
+            self.radius = _num(spec, "radius", 200, positive=True)
+            start = math.radians(_num(spec, "start_angle", 200))
+            end = math.radians(_num(spec, "end_angle", 340))
+            if end <= start:
+                raise GeneratorError("end_angle must be greater than start_angle", field="end_angle")
+            # Filas de más de media vuelta no se pueden ordenar a lo largo de un eje
+            # (clustering.assign_rows): un anillo completo son varias secciones
+            if end - start > math.pi + 1e-9:
+                raise GeneratorError("An arc section can span at most 180 degrees", field="end_angle")
+            self.mid, self.span = (start + end) / 2, end - start
+        else:
+            theta = math.radians(_num(spec, "angle", 0))
+            self.cos, self.sin = math.cos(theta), math.sin(theta)
+        self.counts = self._counts(spec)
+
+    def _counts(self, spec: Dict) -> np.ndarray:
+        if "seats_per_row" in spec:
+            counts = spec["seats_per_row"]
+            if not (isinstance(counts, list) and len(counts) == self.rows
+                    and all(isinstance(c, int) and not isinstance(c, bool) and c >= 1 for c in counts)):
+                raise GeneratorError("seats_per_row must list a positive count for every row", field="seats_per_row")
+            return np.asarray(counts, dtype=np.int64)
+        increment = _int(spec, "seats_increment", 0, minimum=-10_000) if self.layout != "straight" else 0
+        if "seats" in spec or self.layout != "arc":
+            counts = _int(spec, "seats", 0, minimum=1) + increment * np.arange(self.rows)
+        else:
+            # Los que caben en el sector: longitud del arco / separación
+            counts = np.floor(self.span * (self.radius + self.v) / self.spacing).astype(np.int64) + 1
+        if counts.min() < 1:
+            raise GeneratorError("Every row needs at least one seat", field="seats_increment")
+        if self.layout == "arc":
+            extent = (counts - 1) * self.spacing / (self.radius + self.v)
+            too_wide = np.flatnonzero(extent > self.span + 1e-9)
+            if len(too_wide):
+                raise GeneratorError(
+                    f"Row {int(too_wide[0]) + 1} does not fit between start_angle and end_angle", field="seats"
+                )
+        if counts.sum() > MAX_SEATS:
+            raise GeneratorError(f"At most {MAX_SEATS} seats per request", field="seats")
+        return counts
+
+    def to_canvas(self, u: np.ndarray, v: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        ox, oy = self.origin
+        if self.layout == "arc":
+            # u es longitud de arco sobre el radio de su fila; v crece hacia fuera
+            radius = self.radius + v
+            angle = self.mid + u / radius
+            return ox + radius * np.cos(angle), oy + radius * np.sin(angle)
+        return ox + u * self.cos - v * self.sin, oy + u * self.sin + v * self.cos
+
+    def seats(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """(fila, posición en la fila, x, y) de todos los asientos, filas centradas en u = 0."""
+        total = int(self.counts.sum())
+        row = np.repeat(np.arange(self.rows), self.counts)
+        starts = np.cumsum(self.counts) - self.counts
+        k = np.arange(total) - np.repeat(starts, self.counts)
+        u = (k - (self.counts[row] - 1) / 2) * self.spacing
+        x, y = self.to_canvas(u, self.v[row])
+        return row, k, x, y
+
+    def outline(self) -> np.ndarray:
+        """
+        Contorno de la sección: los extremos de cada fila ampliados en un
+        margen, más el borde delantero y trasero (muestreados si son arcos).
+        """
+        pad = self.seat_radius + 0.5 * min(self.spacing, self.row_spacing)
+        half = (self.counts - 1) / 2 * self.spacing + pad
+        front, back = self.v[0] - pad, self.v[-1] + pad
+        half_front, half_back, steps = half[0], half[-1], 2
+        if self.layout == "arc":
+            front = -min(pad, 0.5 * self.radius)
+            # Mismo ángulo que los extremos de la primera/última fila, sobre el radio del borde
+            half_front *= (self.radius + front) / self.radius
+            outer = self.radius + back
+            half_back *= outer / (self.radius + self.v[-1])
+            # Cuerdas del borde exterior con flecha de como mucho medio margen
+            steps = max(2, int(math.ceil(2 * half_back / outer / math.sqrt(4 * pad / outer))) + 1)
+        left = np.column_stack((-half, self.v))
+        right = np.column_stack((half, self.v))[::-1]
+        back_edge = np.column_stack((np.linspace(-half_back, half_back, steps), np.full(steps, back)))
+        front_edge = np.column_stack((np.linspace(half_front, -half_front, steps), np.full(steps, front)))
+        uv = np.concatenate((front_edge[-1:], left, back_edge, right, front_edge[:-1]))
+        x, y = self.to_canvas(uv[:, 0], uv[:, 1])
+        return np.column_stack((x, y))
+
+
+# --------- objetos del canvas ----------
+def _slug(name: str) -> str:
+    return "-".join(name.lower().split()) or "seccion"
+
+
+def generate_section(spec: Dict, ui: Optional[Dict] = None, key: Optional[str] = None,
+                     order: int = 0) -> Dict:
+    """
+    Genera una sección: {"section": objeto polígono, "seats": [círculos],
+    "model": entrada de data["sections"], "rows": n, "seat_count": n}.
+    `key` reutiliza la clave de una sección existente del mismo nombre.
+    """
+    if not isinstance(spec, dict):
+        raise GeneratorError("Each section must be an object")
+    ui = ui or {}
+    name = str(spec.get("name") or "").strip()
+    if not name:
+        raise GeneratorError("Section name is required", field="name")
+    block = _Block(spec, ui)
+    numbering = _choice(spec, "numbering", NUMBERINGS)
+    direction = _choice(spec, "direction", ("ltr", "rtl"))
+    first_seat = _int(spec, "first_seat", 0) if "first_seat" in spec else None
+    skip = spec.get("skip_rows") or []
+    if not isinstance(skip, list):
+        raise GeneratorError("skip_rows must be a list", field="skip_rows")
+    labels = row_labels(
+        block.rows,
+        _choice(spec, "row_labels", ("letters", "numbers")),
+        _int(spec, "first_row", 1, minimum=1),
+        skip,
+    )
+    order = _int(spec, "order", order)
+    category = str(spec.get("category") or "")
+    seat_type = str(spec.get("seat_type") or "standard")
+    color = str(spec.get("color") or _DEFAULT_COLOR)
+    key = key or f"{_slug(name)}-{uuid.uuid4().hex[:6]}"
+
+    row, _, x, y = block.seats()
+    # Números según el orden izquierda->derecha del canvas (el mismo que usa la sincronización)
+    numbers = np.empty(len(x), dtype=np.int64)
+    starts = np.cumsum(block.counts) - block.counts
+    for r, (start, count) in enumerate(zip(starts.tolist(), block.counts.tolist())):
+        nums = seat_numbers(count, numbering, direction, first_seat)
+        if count > 1 and x[start] > x[start + count - 1]:
+            nums = nums[::-1]
+        numbers[start:start + count] = nums
+
+    radius = block.seat_radius
+    common = {"type": "circle", "version": FABRIC_VERSION, "originX": "left", "originY": "top",
+              "radius": radius, "fill": color, **_SEAT_STROKE, "kind": "seat", "category": category or None,
+              "seat_type": seat_type, "section_key": key, "section_name": name, "section_db_id": None}
+    left, top = (x - radius).round(2).tolist(), (y - radius).round(2).tolist()
+    seats = [
+        {**common, "left": left[i], "top": top[i], "id": f"seat-{uuid.uuid4()}",
+         "number": str(n), "row_name": labels[r], "row_index": r + 1}
+        for i, (r, n) in enumerate(zip(row.tolist(), numbers.tolist()))
+    ]
+
+    polygon = [{"x": round(px, 2), "y": round(py, 2)} for px, py in block.outline().tolist()]
+    section = {"type": "polygon", "version": FABRIC_VERSION, "originX": "left", "originY": "top",
+               **_SECTION_STYLE, "points": polygon, "kind": "section", "section_key": key,
+               "section_name": name, "section_order": order, "category": category, "section_db_id": None}
+
+    cx, cy = x.round(2).tolist(), y.round(2).tolist()
+    model_rows = []
+    for r, (start, count) in enumerate(zip(starts.tolist(), block.counts.tolist())):
+        members = sorted(range(start, start + count), key=lambda i: (cx[i], cy[i]))
+        model_rows.append({
+            "name": labels[r],
+            "order": r + 1,
+            "seats": [{"number": str(numbers[i]), "category": category, "seat_type": seat_type,
+                       "x": cx[i], "y": cy[i]} for i in members],
+        })
+    model = {"id": None, "key": key, "name": name, "category": category, "order": order,
+             "polygon": polygon, "rows": model_rows}
+    return {"section": section, "seats": seats, "model": model, "rows": block.rows, "seat_count": len(seats)}
+
+
+def _empty_document() -> Dict:
+    return {
+        "engine": "fabric",
+        "legend": [],
+        "ui": {"gapX": 24, "gapY": 26},
+        "fabric": {"version": FABRIC_VERSION, "objects": []},
+        "sections": [],
+    }
+
+
+def merge_generated(data: Optional[Dict], specs: Sequence[Dict], replace: bool = False) -> Tuple[Dict, List[Dict]]:
+    """
+    Documento del plano con las secciones generadas: las secciones del mismo
+    nombre (con sus asientos) se sustituyen y el resto se conserva; con
+    `replace`, el plano queda solo con lo generado. Devuelve (documento,
+    resumen por sección).
+    """
+    if not isinstance(specs, list) or not specs:
+        raise GeneratorError("sections must be a non-empty list")
+    current = data if isinstance(data, dict) and data else _empty_document()
+    doc = _empty_document() if replace else dict(current)
+    fabric = doc.get("fabric") if isinstance(doc.get("fabric"), dict) else {}
+    objects = [o for o in fabric.get("objects") or [] if isinstance(o, dict)]
+    ui = doc.get("ui") if isinstance(doc.get("ui"), dict) else {}
+
+    names = [str(s.get("name") or "").strip() if isinstance(s, dict) else "" for s in specs]
+    if len(set(names)) != len(names):
+        raise GeneratorError("Section names must be unique")
+    # Claves del plano actual (también con `replace`): la sincronización
+    # reconoce así la sección existente y conserva sus asientos
+    current_fabric = current.get("fabric") if isinstance(current.get("fabric"), dict) else {}
+    existing = {
+        o.get("section_name"): o.get("section_key")
+        for o in current_fabric.get("objects") or []
+        if isinstance(o, dict) and o.get("kind") == "section"
+    }
+    next_order = 1 + max(
+        [o.get("section_order") for o in objects
+         if o.get("kind") == "section" and isinstance(o.get("section_order"), int)] or [0]
+    )
+    generated = []
+    for i, spec in enumerate(specs):
+        generated.append(generate_section(spec, ui, key=existing.get(names[i]), order=next_order + i))
+    if sum(gen["seat_count"] for gen in generated) > MAX_SEATS:
+        raise GeneratorError(f"At most {MAX_SEATS} seats per request", field="seats")
+
+    # Fuera las secciones sustituidas (por nombre) y sus asientos (por clave)
+    replaced = set(names)
+    dropped_keys = {
+        o.get("section_key") for o in objects
+        if o.get("kind") == "section" and o.get("section_name") in replaced
+    }
+    objects = [
+        o for o in objects
+        if not (o.get("kind") == "section" and o.get("section_name") in replaced)
+        and not (o.get("kind") == "seat" and o.get("section_key") in dropped_keys)
+    ]
+    for gen in generated:
+        objects.append(gen["section"])
+        objects.extend(gen["seats"])
+
+    doc["fabric"] = {**fabric, "version": fabric.get("version") or FABRIC_VERSION, "objects": objects}
+    doc["sections"] = [
+        s for s in doc.get("sections") or []
+        if isinstance(s, dict) and s.get("name") not in replaced
+    ] + [gen["model"] for gen in generated]
+    doc.setdefault("engine", "fabric")
+    doc["ui"] = ui
+    summary = [
+        {"name": gen["model"]["name"], "key": gen["model"]["key"], "rows": gen["rows"], "seats": gen["seat_count"]}
+        for gen in generated
+    ]
+    return doc, summary
@@ -0,0 +1,218 @@
+# app_seat/json_body.py
+"""
+Lectura incremental de cuerpos JSON grandes (guardado del plano).
+
+`json.loads(request.body.decode())` tiene a la vez en memoria los bytes del
+cuerpo, el str decodificado y el árbol de objetos. `read_json_body()` lee
+el stream de la petición por bloques, decodifica UTF-8 de forma
+incremental y recorre la estructura de los primeros STREAM_DEPTH niveles
+a mano: cada elemento de `data.fabric.objects` (o de `data.sections`) se
+decodifica con `raw_decode` sobre un búfer pequeño que se descarta al
+avanzar, así que nunca existe el cuerpo completo ni como bytes ni como str.
+
+Además, las claves y los textos cortos que se repiten en cada objeto del
+canvas ("left", "circle", "#334155", "standard"...) se comparten en lugar
+de crear una copia por objeto.
+
+Errores: cuerpo mayor que MAX_UPLOAD_BYTES -> 413; JSON mal formado -> 400
+con mensaje, línea, columna y posición (en caracteres).
+"""
+import codecs
+import json
+import re
+from typing import Any, Dict, List, Tuple
+
+from django.conf import settings
+
+from .services import SeatServiceError
+
+MAX_UPLOAD_BYTES = getattr(settings, "SEAT_MAP_MAX_UPLOAD_BYTES", 50 * 1024 * 1024)
+CHUNK_SIZE = 256 * 1024
+# cuerpo (0) > data (1) > fabric / sections (2) > objects / una sección (3) > elemento
+STREAM_DEPTH = 4
+# Textos de hasta esta longitud se comparten entre objetos (ids y similares no)
+SHARED_STR_MAX = 16
+
+_WHITESPACE = " \t\n\r"
+_DELIMITER = re.compile(r"[,\]}\s]")
+
+
+class JSONBodyError(SeatServiceError):
+    status_code = 400
+
+
+class BodyTooLarge(SeatServiceError):
+    status_code = 413
+
+
+class _Parser:
+    def __init__(self, stream, limit: int):
+        self.stream = stream
+        self.limit = limit
+        self.utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.read_bytes = 0
+        # Posición absoluta (caracteres) y líneas del texto ya descartado del búfer
+        self.dropped = 0
+        self.dropped_lines = 0
+        self.dropped_line_start = 0
+        self.shared: Dict[str, str] = {}
+        self.decoder = json.JSONDecoder(object_pairs_hook=self._object_pairs)
+
+    # --- búfer ---
+    def _share(self, value: str) -> str:
+        return self.shared.setdefault(value, value)
+
+    def _object_pairs(self, pairs: List[Tuple[str, Any]]) -> Dict:
+        share = self.shared.setdefault
+        return {
+            share(k, k): share(v, v) if type(v) is str and len(v) <= SHARED_STR_MAX else v
+            for k, v in pairs
+        }
+
+    def _fill(self, size: int = 0) -> bool:
+        """Añade al búfer al menos CHUNK_SIZE (o `size`) bytes más del stream. False si ya no queda nada."""
+        if self.eof:
+            return False
+        chunk = self.stream.read(max(size, CHUNK_SIZE))
+        self.read_bytes += len(chunk)
+        if self.read_bytes > self.limit:
+            raise BodyTooLarge(f"Request body larger than {self.limit} bytes", limit=self.limit)
+        if self.pos:
+            consumed = self.buf[:self.pos]
+            newlines = consumed.count("\n")
+            if newlines:
+                self.dropped_lines += newlines
+                self.dropped_line_start = self.dropped + consumed.rindex("\n") + 1
+            self.dropped += self.pos
+            self.buf, self.pos = self.buf[self.pos:], 0
+        try:
+            self.buf += self.utf8.decode(chunk, final=not chunk)
+        except UnicodeDecodeError as exc:
+            raise JSONBodyError(f"Request body is not valid UTF-8: {exc.reason}")
+        if not chunk:
+            self.eof = True
+        return bool(chunk) or self.pos < len(self.buf)
+
+    def _fail(self, message: str, pos: int = None):
+        pos = self.pos if pos is None else pos
+        before = self.buf[:pos]
+        newlines = before.count("\n")
+        line = self.dropped_lines + newlines + 1
+        line_start = self.dropped + before.rindex("\n") + 1 if newlines else self.dropped_line_start
+        absolute = self.dropped + pos
+        raise JSONBodyError(
+            f"Invalid JSON: {message}",
+            line=line,
+            column=absolute - line_start + 1,
+            position=absolute,
+        )
+
+    def _peek(self) -> str:
+        """Siguiente carácter que no sea espacio ("" al final del cuerpo)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    # --- valores ---
+    def _raw(self) -> Any:
+        """Un valor completo con raw_decode; si el búfer lo corta, se lee más y se reintenta."""
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as exc:
+                # Puede ser solo que el valor no ha llegado entero: se dobla lo pendiente
+                if self._fill(2 * (len(self.buf) - self.pos)):
+                    continue
+                self._fail(exc.msg, exc.pos)
+            # Un número o literal cortado por el bloque ("123." | "45") se decodifica
+            # como un prefijo válido: sin delimitador detrás, puede seguir en el siguiente
+            if not self.eof and _DELIMITER.search(self.buf, end) is None and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def _value(self, depth: int) -> Any:
+        ch = self._peek()
+        if not ch:
+            self._fail("Expecting value")
+        if depth < STREAM_DEPTH and ch == "{":
+            return self._object(depth)
+        if depth < STREAM_DEPTH and ch == "[":
+            return self._array(depth)
+        value = self._raw()
+        if type(value) is str and len(value) <= SHARED_STR_MAX:
+            value = self._share(value)
+        return value
+
+    def _object(self, depth: int) -> Dict:
+        self.pos += 1
+        out = {}
+        if self._peek() == "}":
+            self.pos += 1
+            return out
+        while True:
+            if self._peek() != '"':
+                self._fail("Expecting property name enclosed in double quotes")
+            key = self._share(self._raw())
+            if self._peek() != ":":
+                self._fail("Expecting ':' delimiter")
+            self.pos += 1
+            out[key] = self._value(depth + 1)
+            ch = self._peek()
+            self.pos += 1
+            if ch == "}":
+                return out
+            if ch != ",":
+                self.pos -= 1
+                self._fail("Expecting ',' delimiter")
+
+    def _array(self, depth: int) -> List:
+        self.pos += 1
+        out = []
+        if self._peek() == "]":
+            self.pos += 1
+            return out
+        while True:
+            out.append(self._value(depth + 1))
+            ch = self._peek()
+            self.pos += 1
+            if ch == "]":
+                return out
+            if ch != ",":
+                self.pos -= 1
+                self._fail("Expecting ',' delimiter")
+
+    def parse(self) -> Any:
+        value = self._value(0)
+        if self._peek():
+            self._fail("Extra data")
+        return value
+
+
+def parse_json_stream(stream, limit: int = MAX_UPLOAD_BYTES) -> Any:
+    """Decodifica un documento JSON leyendo `stream` (.read(n)) por bloques."""
+    return _Parser(stream, limit).parse()
+
+
+def read_json_body(request, limit: int = MAX_UPLOAD_BYTES) -> Dict:
+    """
+    Cuerpo JSON (objeto) de la petición, leído por bloques. BodyTooLarge
+    (413) si supera `limit`; JSONBodyError (400) si no es un objeto JSON válido.
+    """
+    try:
+        declared = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        declared = 0
+    if declared > limit:
+        raise BodyTooLarge(f"Request body larger than {limit} bytes", limit=limit)
+    body = parse_json_stream(request, limit)
+    if not isinstance(body, dict):
+        raise JSONBodyError("Request body must be a JSON object")
+    return body
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app_seat.archive import DEFAULT_CODEC, DELETE_BATCH_SIZE, archive_event, finished_events
+from app_seat.models import Event
+from app_seat.partitions import parse_cutoff
+
+
+class Command(BaseCommand):
+    help = (
+        "Archiva los eventos terminados: comprime asientos, retenciones y "
+        "asientos de reservas en un EventArchive y borra por lotes las filas calientes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--event", action="append", default=[], help="Id de evento (repetible).")
+        parser.add_argument(
+            "--before",
+            help="Eventos terminados antes de esta fecha (YYYY-MM-DD o ISO). Por defecto, ahora.",
+        )
+        parser.add_argument("--codec", choices=["lzma", "zlib"], default=DEFAULT_CODEC)
+        parser.add_argument("--batch-size", type=int, default=DELETE_BATCH_SIZE)
+        parser.add_argument("--keep-hot", action="store_true", help="Crea el archivo sin borrar las filas calientes.")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **opts):
+        if opts["event"]:
+            events = Event.objects.filter(pk__in=opts["event"])
+        else:
+            try:
+                cutoff = parse_cutoff(opts["before"])
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            events = finished_events(cutoff)
+
+        archived = 0
+        for event in events.order_by("start_datetime"):
+            if opts["dry_run"]:
+                self.stdout.write(f"{event.pk}  {event.name}  ({event.seats.count()} asientos)")
+                continue
+            archive = archive_event(
+                event, codec=opts["codec"], batch_size=opts["batch_size"], purge=not opts["keep_hot"]
+            )
+            archived += 1
+            ratio = archive.raw_size / max(1, len(archive.payload))
+            self.stdout.write(
+                f"Archivado: {event.name} — {archive.seat_count} asientos, "
+                f"{archive.booking_count} reservas, {len(archive.payload)} bytes (x{ratio:.1f})"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Eventos archivados: {archived}"))
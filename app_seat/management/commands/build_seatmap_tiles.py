@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app_seat.models import PublishedSeatMap
+from app_seat.tiles import build_tiles
+
+
+class Command(BaseCommand):
+    help = (
+        "Regenera las teselas (contorno, filas y asientos por zona) de los planos "
+        "publicados. Publicar ya lo hace; sirve para versiones publicadas antes de "
+        "las teselas o tras cambiar SEAT_TILE_MAX_SEATS / SEAT_TILE_MAX_ZOOM."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--published", action="append", default=[], help="Id de plano publicado (repetible).")
+        parser.add_argument("--seatmap", action="append", default=[],
+                            help="Id de plano: todas sus versiones publicadas (repetible).")
+        parser.add_argument("--venue", action="append", default=[], help="Id de recinto (repetible).")
+        parser.add_argument("--all", action="store_true", help="Todos los planos publicados.")
+
+    def handle(self, *args, **opts):
+        if opts["published"]:
+            versions = PublishedSeatMap.objects.filter(pk__in=opts["published"])
+        elif opts["seatmap"]:
+            versions = PublishedSeatMap.objects.filter(seatmap_id__in=opts["seatmap"])
+        elif opts["venue"]:
+            versions = PublishedSeatMap.objects.filter(seatmap__venue_id__in=opts["venue"])
+        elif opts["all"]:
+            versions = PublishedSeatMap.objects.all()
+        else:
+            raise CommandError("Indica --published, --seatmap, --venue o --all")
+
+        for published in versions.select_related("seatmap__venue"):
+            result = build_tiles(published)
+            self.stdout.write(
+                f"{published}: {result['seats']} asientos, seat_zoom={result['seat_zoom']}, "
+                f"{result['tiles']} teselas, {result['bytes'] / 1024:.1f} KiB"
+            )
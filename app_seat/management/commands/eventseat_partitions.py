@@ -0,0 +1,97 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from app_seat.models import Event
+from app_seat.partitions import (
+    EventNotArchived,
+    convert_to_partitioned,
+    detach_event_partition,
+    ensure_event_partition,
+    is_partitioned,
+    list_partitions,
+    parse_cutoff,
+    partition_name,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Gestiona el particionado de EventSeat por evento: "
+        "convert (conversión única), create (particiones de eventos), "
+        "detach (eventos pasados ya archivados) y list. Los datos de una partición "
+        "desenganchada son invisibles para el ORM: detach solo acepta eventos con "
+        "EventArchive (archive_finished_events) y borra los enlaces de retenciones "
+        "y reservas a esos asientos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=["convert", "create", "detach", "list"])
+        parser.add_argument("--event", action="append", default=[], help="Id de evento (repetible).")
+        parser.add_argument(
+            "--before",
+            help="detach: eventos terminados antes de esta fecha (YYYY-MM-DD o ISO). Por defecto, ahora.",
+        )
+        parser.add_argument("--drop", action="store_true", help="detach: borra la tabla desenganchada.")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **opts):
+        action = opts["action"]
+        if action != "convert" and action != "list" and not is_partitioned():
+            raise CommandError("EventSeat no está particionada. Ejecuta primero: eventseat_partitions convert")
+
+        if action == "list":
+            if not is_partitioned():
+                self.stdout.write("EventSeat no está particionada.")
+                return
+            for name in list_partitions():
+                self.stdout.write(name)
+            return
+
+        if action == "convert":
+            event_ids = list(Event.objects.values_list("pk", flat=True))
+            if opts["dry_run"]:
+                self.stdout.write(f"Se crearían {len(event_ids)} particiones más la DEFAULT.")
+                return
+            convert_to_partitioned(event_ids)
+            self.stdout.write(self.style.SUCCESS(f"EventSeat particionada ({len(event_ids)} eventos)."))
+            return
+
+        if action == "create":
+            event_ids = opts["event"] or list(Event.objects.values_list("pk", flat=True))
+            created = 0
+            for event_id in event_ids:
+                if opts["dry_run"]:
+                    self.stdout.write(partition_name(event_id))
+                    continue
+                created += ensure_event_partition(event_id)
+            self.stdout.write(self.style.SUCCESS(f"Particiones creadas: {created}"))
+            return
+
+        # detach
+        try:
+            cutoff = parse_cutoff(opts["before"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        events = Event.objects.all()
+        if opts["event"]:
+            events = events.filter(pk__in=opts["event"])
+        else:
+            events = events.filter(
+                Q(end_datetime__lt=cutoff) | Q(end_datetime__isnull=True, start_datetime__lt=cutoff)
+            )
+
+        detached = 0
+        for event in events.only("pk", "name"):
+            if opts["dry_run"]:
+                self.stdout.write(f"{partition_name(event.pk)}  ({event.name})")
+                continue
+            try:
+                done = detach_event_partition(event.pk, drop=opts["drop"])
+            except EventNotArchived:
+                self.stdout.write(self.style.WARNING(f"Sin archivar, se omite: {event.name}"))
+                continue
+            if done:
+                detached += 1
+                self.stdout.write(f"Desenganchada: {partition_name(event.pk)}")
+        self.stdout.write(self.style.SUCCESS(f"Particiones desenganchadas: {detached}"))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from app_seat.models import Event
+from app_seat.pricing import reprice_event
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula los precios por asiento de los eventos (motor de precios dinámicos). "
+        "Pensado para ejecutarse periódicamente durante el on-sale (cron / systemd timer)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--event", action="append", default=[], help="Id de evento (repetible).")
+        parser.add_argument(
+            "--upcoming", action="store_true", help="Todos los eventos que aún no han empezado."
+        )
+        parser.add_argument("--mode", choices=["seat", "category"], default="seat")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **opts):
+        if opts["event"]:
+            events = Event.objects.filter(pk__in=opts["event"])
+        elif opts["upcoming"]:
+            events = Event.objects.filter(start_datetime__gt=timezone.now())
+        else:
+            raise CommandError("Indica --event o --upcoming")
+
+        for event in events.only("pk", "name"):
+            result = reprice_event(event.pk, mode=opts["mode"], dry_run=opts["dry_run"])
+            self.stdout.write(
+                f"{event.name}: {result['seats']} asientos, {result['changed']} cambian, "
+                f"{result['updated']} actualizados "
+                f"[{result.get('min')}–{result.get('max')}, media {result.get('mean')}] "
+                f"load={result['load_ms']}ms compute={result.get('compute_ms', 0)}ms "
+                f"write={result.get('write_ms', 0)}ms"
+            )
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from app_seat.sync_jobs import requeue_stale, run_next
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker de la cola de sincronización de planos (SeatMapSyncJob): aplica "
+        "los planos guardados a Section/Row/Seat. Pensado para correr como servicio "
+        "(systemd / supervisor); se pueden lanzar varios."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Vacía la cola y termina.")
+        parser.add_argument(
+            "--interval", type=float, default=1.0, help="Segundos de espera con la cola vacía."
+        )
+        parser.add_argument(
+            "--max-jobs", type=int, default=0, help="Termina tras N trabajos (0 = sin límite)."
+        )
+
+    def handle(self, *args, **opts):
+        done = 0
+        last_sweep = 0.0
+        while True:
+            close_old_connections()
+            if time.monotonic() - last_sweep > 60:
+                requeued = requeue_stale()
+                if requeued:
+                    self.stdout.write(f"{requeued} trabajos de workers caídos recuperados")
+                last_sweep = time.monotonic()
+
+            job = run_next()
+            if job is None:
+                if opts["once"]:
+                    break
+                time.sleep(opts["interval"])
+                continue
+
+            done += 1
+            elapsed = (job.finished_at - job.started_at).total_seconds()
+            line = (
+                f"{job.venue_id} v{job.seatmap_version}: {job.status} en {elapsed:.2f}s "
+                f"({job.saves} guardados)"
+            )
+            self.stdout.write(self.style.SUCCESS(line) if job.status == "done" else self.style.ERROR(f"{line}: {job.error}"))
+            if opts["max_jobs"] and done >= opts["max_jobs"]:
+                break
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from app_seat.admission import advance_rooms
+
+
+class Command(BaseCommand):
+    help = (
+        "Avanza las salas de espera activas (WaitingRoom) a intervalos fijos. "
+        "Consultar la posición en la cola solo lee: sin este proceso la cola no "
+        "avanza. Pensado para correr como servicio (systemd / supervisor); basta uno."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Avanza una vez y termina.")
+        parser.add_argument("--interval", type=float, default=1.0, help="Segundos entre avances.")
+
+    def handle(self, *args, **opts):
+        while True:
+            close_old_connections()
+            started = time.monotonic()
+            advance_rooms()
+            if opts["once"]:
+                break
+            time.sleep(max(0.0, opts["interval"] - (time.monotonic() - started)))
@@ -0,0 +1,199 @@
+import asyncio
+import random
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from app_seat.locks import lock_stats
+from app_seat.models import Booking, Event, EventSeat, Hold, PriceCategory, Row, Seat, SeatMap, Section, Venue
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+class Command(BaseCommand):
+    help = (
+        "Simula un on-sale: crea un recinto y evento sintéticos y lanza N clientes "
+        "asíncronos contra la app ASGI en proceso (retener / liberar / reservar). "
+        "Informa throughput, latencias p50/p99, esperas de locks y verifica que "
+        "ningún asiento quede reservado dos veces."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=50)
+        parser.add_argument("--cycles", type=int, default=20, help="Ciclos por cliente.")
+        parser.add_argument("--sections", type=int, default=4)
+        parser.add_argument("--rows", type=int, default=20, help="Filas por sección.")
+        parser.add_argument("--seats-per-row", type=int, default=30)
+        parser.add_argument("--max-hold", type=int, default=4, help="Máximo de asientos por retención.")
+        parser.add_argument("--book-ratio", type=float, default=0.5, help="Probabilidad de reservar tras retener.")
+        parser.add_argument("--hot-fraction", type=float, default=0.1,
+                            help="Fracción de asientos 'de primera fila' que concentra la mitad de la demanda.")
+        parser.add_argument("--seed", type=int, default=None)
+        parser.add_argument("--keep", action="store_true", help="No borra los datos sintéticos al terminar.")
+
+    # ------------------------------------------------------------------
+    # Datos sintéticos
+    # ------------------------------------------------------------------
+    def _setup(self, opts):
+        tag = uuid.uuid4().hex[:8]
+        venue = Venue.objects.create(name=f"Simulación on-sale {tag}", slug=f"sim-onsale-{tag}")
+        sections = Section.objects.bulk_create(
+            [Section(venue=venue, name=f"S{i + 1}", order=i) for i in range(opts["sections"])]
+        )
+        rows = Row.objects.bulk_create(
+            [
+                Row(section=section, name=f"R{r + 1}", order=r)
+                for section in sections
+                for r in range(opts["rows"])
+            ]
+        )
+        seats = Seat.objects.bulk_create(
+            [Seat(row=row, number=str(n + 1), position=n + 1) for row in rows for n in range(opts["seats_per_row"])]
+        )
+        seatmap = SeatMap.objects.create(venue=venue, name="Simulación")
+        event = Event.objects.create(
+            name=f"On-sale {tag}",
+            slug=f"sim-onsale-{tag}",
+            venue=venue,
+            seatmap=seatmap,
+            start_datetime=timezone.now() + timedelta(days=30),
+        )
+        category = PriceCategory.objects.create(event=event, name="General", price=100)
+        event_seats = EventSeat.objects.bulk_create(
+            [EventSeat(event=event, seat=seat, price_category=category) for seat in seats],
+            batch_size=2000,
+        )
+        user = get_user_model().objects.create_user(email=f"sim-{tag}@example.invalid", password=uuid.uuid4().hex)
+        return venue, event, [str(es.pk) for es in event_seats], user
+
+    def _token(self, user):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        return str(RefreshToken.for_user(user).access_token)
+
+    # ------------------------------------------------------------------
+    # Clientes
+    # ------------------------------------------------------------------
+    async def _run_clients(self, event_id, seat_ids, token, opts, rng):
+        import httpx
+        from web.asgi import app
+
+        latencies = defaultdict(list)
+        statuses = Counter()
+        hot = seat_ids[: max(1, int(len(seat_ids) * opts["hot_fraction"]))]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        async def timed(client, kind, method, url, **kwargs):
+            start = time.perf_counter()
+            resp = await client.request(method, url, **kwargs)
+            latencies[kind].append(time.perf_counter() - start)
+            statuses[f"{kind} {resp.status_code}"] += 1
+            return resp
+
+        async def client_loop(client):
+            for _ in range(opts["cycles"]):
+                pool = hot if rng.random() < 0.5 else seat_ids
+                wanted = rng.sample(pool, min(len(pool), rng.randint(1, opts["max_hold"])))
+                resp = await timed(client, "hold", "POST", f"/api/seats/events/{event_id}/holds",
+                                   json={"seats": wanted}, headers=headers)
+                if resp.status_code != 201:
+                    continue
+                hold_id = resp.json()["id"]
+                if rng.random() < opts["book_ratio"]:
+                    key = uuid.uuid4().hex
+                    await timed(client, "book", "POST", f"/api/seats/holds/{hold_id}/confirm",
+                                headers={**headers, "Idempotency-Key": key})
+                else:
+                    await timed(client, "release", "DELETE", f"/api/seats/holds/{hold_id}", headers=headers)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://onsale.sim", timeout=60) as client:
+            start = time.perf_counter()
+            await asyncio.gather(*(client_loop(client) for _ in range(opts["clients"])))
+            elapsed = time.perf_counter() - start
+        return latencies, statuses, elapsed
+
+    # ------------------------------------------------------------------
+    # Invariantes
+    # ------------------------------------------------------------------
+    def _check_invariants(self, event):
+        errors = []
+        BookingSeat = Booking.seats.through
+        doubled = (
+            BookingSeat.objects.filter(booking__event=event, booking__status="confirmed")
+            .values("eventseat_id")
+            .annotate(n=Count("booking_id"))
+            .filter(n__gt=1)
+        )
+        if doubled.exists():
+            errors.append(f"{doubled.count()} asientos en más de una reserva confirmada")
+
+        booked = EventSeat.objects.filter(event=event, status="booked")
+        unlinked = booked.exclude(bookings__status="confirmed").count()
+        if unlinked:
+            errors.append(f"{unlinked} asientos 'booked' sin reserva confirmada")
+
+        not_booked = (
+            EventSeat.objects.filter(event=event, bookings__status="confirmed")
+            .exclude(status="booked").distinct().count()
+        )
+        if not_booked:
+            errors.append(f"{not_booked} asientos reservados con estado distinto de 'booked'")
+
+        held_and_booked = (
+            EventSeat.objects.filter(event=event, holds__isnull=False)
+            .filter(Q(status="booked") | Q(bookings__isnull=False)).distinct().count()
+        )
+        if held_and_booked:
+            errors.append(f"{held_and_booked} asientos retenidos y reservados a la vez")
+        return errors
+
+    # ------------------------------------------------------------------
+    def handle(self, *args, **opts):
+        rng = random.Random(opts["seed"])
+        venue, event, seat_ids, user = self._setup(opts)
+        self.stdout.write(f"Evento sintético {event.pk}: {len(seat_ids)} asientos, {opts['clients']} clientes")
+
+        try:
+            lock_stats.reset()
+            latencies, statuses, elapsed = asyncio.run(
+                self._run_clients(event.pk, seat_ids, self._token(user), opts, rng)
+            )
+
+            total_ops = sum(len(v) for v in latencies.values())
+            self.stdout.write(f"\nOperaciones: {total_ops} en {elapsed:.2f}s ({total_ops / elapsed:.1f} ops/s)")
+            for kind, values in sorted(latencies.items()):
+                values.sort()
+                self.stdout.write(
+                    f"  {kind:<8} n={len(values):<6} "
+                    f"p50={_percentile(values, 50) * 1000:.1f}ms p99={_percentile(values, 99) * 1000:.1f}ms"
+                )
+            self.stdout.write("Respuestas: " + ", ".join(f"{k}={v}" for k, v in sorted(statuses.items())))
+            locks = lock_stats.snapshot()
+            self.stdout.write(
+                f"Locks ({locks['granularity']}): {locks['acquisitions']} adquisiciones, "
+                f"{locks['contended']} con espera, avg={locks['avg_wait_ms']}ms max={locks['max_wait_ms']}ms"
+            )
+            booked = EventSeat.objects.filter(event=event, status="booked").count()
+            self.stdout.write(f"Asientos reservados: {booked} / {len(seat_ids)}")
+
+            errors = self._check_invariants(event)
+        finally:
+            if not opts["keep"]:
+                Hold.objects.filter(event=event).delete()
+                venue.delete()
+                user.delete()
+
+        if errors:
+            raise CommandError("Invariantes violados:\n  " + "\n  ".join(errors))
+        self.stdout.write(self.style.SUCCESS("OK: ningún asiento reservado dos veces."))
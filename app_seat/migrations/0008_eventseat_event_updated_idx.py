@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_seat', '0007_alter_row_order'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='eventseat',
+            index=models.Index(fields=['event', 'updated_at'], name='eventseat_event_updated_idx'),
+        ),
+    ]
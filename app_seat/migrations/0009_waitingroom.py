@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:20
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_seat', '0008_eventseat_event_updated_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitingRoom',
+            fields=[
+                ('order', models.IntegerField(default=1, verbose_name='Orden')),
+                ('active', models.BooleanField(default=True, verbose_name='Activo')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Creado el')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Actualizado el')),
+                ('id', models.CharField(default=uuid.uuid4, editable=False, max_length=150, primary_key=True, serialize=False)),
+                ('rate_per_second', models.FloatField(default=50, help_text='Usuarios admitidos por segundo.')),
+                ('burst', models.PositiveIntegerField(default=100, help_text='Posiciones que se pueden admitir de golpe cuando la cola está vacía.')),
+                ('issued', models.BigIntegerField(default=0, help_text='Última posición de cola emitida.')),
+                ('admitted', models.FloatField(default=0, help_text='Posición hasta la que se ha admitido.')),
+                ('admitted_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Momento del último avance de la cola.')),
+                ('event', models.OneToOneField(help_text='Evento protegido por esta sala de espera.', on_delete=django.db.models.deletion.CASCADE, related_name='waiting_room', to='app_seat.event')),
+            ],
+            options={
+                'verbose_name_plural': 'Waiting rooms',
+                'ordering': ['event'],
+            },
+        ),
+    ]
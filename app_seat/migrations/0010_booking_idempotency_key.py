@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_seat', '0009_waitingroom'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='idempotency_key',
+            field=models.CharField(blank=True, help_text='Clave de idempotencia de la petición que creó la reserva.', max_length=255, null=True, unique=True),
+        ),
+    ]
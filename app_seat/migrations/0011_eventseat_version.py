@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_seat', '0010_booking_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventseat',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Versión para control de concurrencia optimista; cada transición la incrementa.'),
+        ),
+    ]
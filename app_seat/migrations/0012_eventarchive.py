@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:00
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_seat', '0011_eventseat_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventArchive',
+            fields=[
+                ('order', models.IntegerField(default=1, verbose_name='Orden')),
+                ('active', models.BooleanField(default=True, verbose_name='Activo')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Creado el')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Actualizado el')),
+                ('id', models.CharField(default=uuid.uuid4, editable=False, max_length=150, primary_key=True, serialize=False)),
+                ('codec', models.CharField(choices=[('lzma', 'LZMA'), ('zlib', 'zlib')], default='lzma', help_text='Compresión del contenido.', max_length=10)),
+                ('payload', models.BinaryField(help_text='JSON columnar comprimido con asientos, retenciones y reservas.')),
+                ('raw_size', models.PositiveIntegerField(default=0, help_text='Tamaño en bytes del JSON sin comprimir.')),
+                ('seat_count', models.PositiveIntegerField(default=0)),
+                ('booked_count', models.PositiveIntegerField(default=0)),
+                ('hold_count', models.PositiveIntegerField(default=0)),
+                ('booking_count', models.PositiveIntegerField(default=0)),
+                ('event', models.OneToOneField(help_text='Evento archivado.', on_delete=django.db.models.deletion.CASCADE, related_name='archive', to='app_seat.event')),
+            ],
+            options={
+                'verbose_name_plural': 'Event archives',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
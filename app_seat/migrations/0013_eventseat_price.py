@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_seat', '0012_eventarchive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventseat',
+            name='price',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Precio propio del asiento (motor de precios); si está vacío se usa el de su categoría.', max_digits=10, null=True),
+        ),
+    ]
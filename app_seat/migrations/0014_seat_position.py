@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_seat', '0013_eventseat_price'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seat',
+            name='position',
+            field=models.PositiveIntegerField(blank=True, editable=False, help_text='Posición física en la fila (1 = extremo izquierdo); la recalcula la sincronización del plano.', null=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-19 13:30
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_seat', '0014_seat_position'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceRule',
+            fields=[
+                ('order', models.IntegerField(default=1, verbose_name='Orden')),
+                ('active', models.BooleanField(default=True, verbose_name='Activo')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Creado el')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Actualizado el')),
+                ('id', models.CharField(default=uuid.uuid4, editable=False, max_length=150, primary_key=True, serialize=False)),
+                ('row_from', models.IntegerField(blank=True, help_text='Orden de fila mínimo, inclusive (vacío = sin límite).', null=True)),
+                ('row_to', models.IntegerField(blank=True, help_text='Orden de fila máximo, inclusive (vacío = sin límite).', null=True)),
+                ('seat_type', models.CharField(blank=True, choices=[('standard', 'Standard'), ('vip', 'VIP'), ('accessible', 'Accessible')], help_text='Solo asientos de este tipo (vacío = todos).', max_length=20)),
+                ('event', models.ForeignKey(help_text='Evento al que pertenece la regla.', on_delete=django.db.models.deletion.CASCADE, related_name='price_rules', to='app_seat.event')),
+                ('price_category', models.ForeignKey(help_text='Categoría que se asigna a los asientos que encajan.', on_delete=django.db.models.deletion.CASCADE, related_name='rules', to='app_seat.pricecategory')),
+                ('section', models.ForeignKey(blank=True, help_text='Solo asientos de esta sección (vacío = todas).', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='price_rules', to='app_seat.section')),
+            ],
+            options={
+                'verbose_name_plural': 'Price rules',
+                'ordering': ['event', 'order'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_seat', '0015_pricerule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seat',
+            name='canvas_id',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Id del círculo en el diseñador; mantiene el asiento entre guardados.', max_length=64),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:30
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_seat', '0016_seat_canvas_id'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='section',
+            unique_together={('venue', 'name')},
+        ),
+    ]
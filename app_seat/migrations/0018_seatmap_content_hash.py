@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_seat', '0017_alter_section_unique_together'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seatmap',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='seatmap',
+            name='data_gzip',
+            field=models.BinaryField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='seatmap',
+            index=models.Index(fields=['venue', '-created_at'], name='seatmap_venue_latest_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-19 15:00
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_seat', '0018_seatmap_content_hash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seatmap',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='SeatMapRevision',
+            fields=[
+                ('order', models.IntegerField(default=1, verbose_name='Orden')),
+                ('active', models.BooleanField(default=True, verbose_name='Activo')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Creado el')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Actualizado el')),
+                ('id', models.CharField(default=uuid.uuid4, editable=False, max_length=150, primary_key=True, serialize=False)),
+                ('version', models.PositiveIntegerField(help_text='Versión del plano tras este cambio.')),
+                ('kind', models.CharField(choices=[('snapshot', 'Snapshot'), ('patch', 'Patch')], max_length=10)),
+                ('payload', models.JSONField(help_text='Documento completo (snapshot) o lista de operaciones (patch).')),
+                ('seatmap', models.ForeignKey(help_text='Plano al que pertenece la versión.', on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='app_seat.seatmap')),
+                ('user', models.ForeignKey(blank=True, help_text='Usuario que guardó esta versión, si aplica.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='seatmap_revisions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Seat map revisions',
+                'ordering': ['seatmap', '-version'],
+                'unique_together': {('seatmap', 'version')},
+            },
+        ),
+    ]
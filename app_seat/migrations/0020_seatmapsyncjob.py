@@ -0,0 +1,41 @@
+# Generated by Django 5.2.5 on 2026-10-19 15:20
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_seat', '0019_seatmap_version_seatmaprevision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeatMapSyncJob',
+            fields=[
+                ('order', models.IntegerField(default=1, verbose_name='Orden')),
+                ('active', models.BooleanField(default=True, verbose_name='Activo')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Creado el')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Actualizado el')),
+                ('id', models.CharField(default=uuid.uuid4, editable=False, max_length=150, primary_key=True, serialize=False)),
+                ('seatmap_version', models.PositiveIntegerField(default=0, help_text='Versión del plano encolada o, una vez ejecutado, la sincronizada.')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='queued', max_length=10)),
+                ('progress', models.PositiveSmallIntegerField(default=0, help_text='Porcentaje completado (0-100).')),
+                ('stage', models.CharField(blank=True, max_length=50)),
+                ('saves', models.PositiveIntegerField(default=1, help_text='Guardados acumulados en este trabajo.')),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('seatmap', models.ForeignKey(help_text='Plano que se sincroniza (siempre en su última versión).', on_delete=django.db.models.deletion.CASCADE, related_name='sync_jobs', to='app_seat.seatmap')),
+                ('venue', models.ForeignKey(help_text='Recinto cuyas tablas se sincronizan.', on_delete=django.db.models.deletion.CASCADE, related_name='sync_jobs', to='app_seat.venue')),
+            ],
+            options={
+                'verbose_name_plural': 'Seat map sync jobs',
+                'ordering': ['-created_at'],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status', 'queued')), fields=('venue',), name='seatmap_sync_one_queued_per_venue')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_seat', '0020_seatmapsyncjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seat',
+            name='x',
+            field=models.FloatField(blank=True, editable=False, help_text='Centro X de la butaca en el canvas del diseñador.', null=True),
+        ),
+        migrations.AddField(
+            model_name='seat',
+            name='y',
+            field=models.FloatField(blank=True, editable=False, help_text='Centro Y de la butaca en el canvas del diseñador.', null=True),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-19 16:00
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_seat', '0021_seat_x_seat_y'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeatMapTile',
+            fields=[
+                ('order', models.IntegerField(default=1, verbose_name='Orden')),
+                ('active', models.BooleanField(default=True, verbose_name='Activo')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Creado el')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Actualizado el')),
+                ('id', models.CharField(default=uuid.uuid4, editable=False, max_length=150, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('outline', 'Outline'), ('rows', 'Rows'), ('seats', 'Seats')], max_length=10)),
+                ('zoom', models.PositiveSmallIntegerField(default=0)),
+                ('tile_x', models.PositiveIntegerField(default=0)),
+                ('tile_y', models.PositiveIntegerField(default=0)),
+                ('seat_count', models.PositiveIntegerField(default=0)),
+                ('content_hash', models.CharField(help_text='sha256 del JSON sin comprimir (ETag).', max_length=64)),
+                ('data_gzip', models.BinaryField(help_text='JSON de la tesela comprimido con gzip.')),
+                ('seatmap', models.ForeignKey(help_text='Plano al que pertenece la tesela.', on_delete=django.db.models.deletion.CASCADE, related_name='tiles', to='app_seat.seatmap')),
+            ],
+            options={
+                'verbose_name_plural': 'Seat map tiles',
+                'ordering': ['seatmap', 'zoom', 'tile_y', 'tile_x'],
+                'unique_together': {('seatmap', 'zoom', 'tile_x', 'tile_y', 'kind')},
+            },
+        ),
+    ]
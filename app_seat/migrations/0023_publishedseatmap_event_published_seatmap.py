@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-19 17:00
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_seat', '0022_seatmaptile'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PublishedSeatMap',
+            fields=[
+                ('order', models.IntegerField(default=1, verbose_name='Orden')),
+                ('active', models.BooleanField(default=True, verbose_name='Activo')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Creado el')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Actualizado el')),
+                ('id', models.CharField(default=uuid.uuid4, editable=False, max_length=150, primary_key=True, serialize=False)),
+                ('seatmap_version', models.PositiveIntegerField(help_text='Versión del plano publicada.')),
+                ('content_hash', models.CharField(help_text='sha256 del JSON sin comprimir (ETag y URL).', max_length=64, unique=True)),
+                ('seats_hash', models.CharField(help_text='Hash de los ids de Seat en orden: coincide con el de los EventSeat de un evento alineado.', max_length=16)),
+                ('seat_count', models.PositiveIntegerField(default=0)),
+                ('data_gzip', models.BinaryField(help_text='JSON publicado comprimido con gzip.')),
+                ('published_by', models.ForeignKey(blank=True, help_text='Usuario que publicó, si aplica.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='published_seatmaps', to=settings.AUTH_USER_MODEL)),
+                ('seatmap', models.ForeignKey(help_text='Plano de diseño del que se publicó.', on_delete=django.db.models.deletion.CASCADE, related_name='published', to='app_seat.seatmap')),
+            ],
+            options={
+                'verbose_name_plural': 'Published seat maps',
+                'ordering': ['seatmap', '-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='published_seatmap',
+            field=models.ForeignKey(blank=True, help_text='Versión publicada del plano que ven los compradores.', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='events', to='app_seat.publishedseatmap'),
+        ),
+    ]
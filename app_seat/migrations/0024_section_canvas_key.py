@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_seat', '0023_publishedseatmap_event_published_seatmap'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='section',
+            name='canvas_key',
+            field=models.CharField(blank=True, editable=False, help_text='Clave de la sección en el diseñador; la mantiene aunque se renombre.', max_length=255),
+        ),
+    ]
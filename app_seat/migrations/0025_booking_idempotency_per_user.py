@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_seat', '0024_section_canvas_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='booking',
+            name='idempotency_key',
+            field=models.CharField(blank=True, help_text='Clave de idempotencia de la petición que creó la reserva (única por usuario).', max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='hold_ref',
+            field=models.CharField(blank=True, editable=False, help_text='Id de la retención confirmada (la retención se borra al confirmar).', max_length=150),
+        ),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=models.UniqueConstraint(fields=('user', 'idempotency_key'), name='booking_unique_user_idempotency_key'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-19 19:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def drop_design_tiles(apps, schema_editor):
+    # Las teselas pasan a ser de la versión publicada: las del diseño se
+    # descartan y se regeneran con `manage.py build_seatmap_tiles --all`
+    apps.get_model('app_seat', 'SeatMapTile').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_seat', '0025_booking_idempotency_per_user'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_design_tiles, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='seatmaptile',
+            unique_together=set(),
+        ),
+        migrations.RemoveField(
+            model_name='seatmaptile',
+            name='seatmap',
+        ),
+        migrations.AddField(
+            model_name='seatmaptile',
+            name='published',
+            field=models.ForeignKey(default='', help_text='Versión publicada del plano a la que pertenece la tesela.', on_delete=django.db.models.deletion.CASCADE, related_name='tiles', to='app_seat.publishedseatmap'),
+            preserve_default=False,
+        ),
+        migrations.AlterModelOptions(
+            name='seatmaptile',
+            options={'ordering': ['published', 'zoom', 'tile_y', 'tile_x'], 'verbose_name_plural': 'Seat map tiles'},
+        ),
+        migrations.AlterUniqueTogether(
+            name='seatmaptile',
+            unique_together={('published', 'zoom', 'tile_x', 'tile_y', 'kind')},
+        ),
+    ]
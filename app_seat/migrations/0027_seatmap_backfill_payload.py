@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-19 20:00
+
+import gzip
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import migrations
+
+
+def backfill_payload(apps, schema_editor):
+    # Planos guardados antes de precomprimir: se calcula content_hash y
+    # data_gzip igual que SeatMap.refresh_payload (el modelo histórico no
+    # tiene sus métodos), para que la lectura del plano no tenga que escribir
+    SeatMap = apps.get_model('app_seat', 'SeatMap')
+    pending = SeatMap.objects.filter(content_hash='').only('pk', 'version', 'data')
+    for seatmap in pending.iterator(chunk_size=100):
+        if not seatmap.data:
+            continue
+        body = json.dumps({'ok': True, 'version': seatmap.version, 'data': seatmap.data}, cls=DjangoJSONEncoder,
+                          separators=(',', ':')).encode('utf-8')
+        SeatMap.objects.filter(pk=seatmap.pk, content_hash='').update(
+            content_hash=hashlib.sha256(body).hexdigest(),
+            data_gzip=gzip.compress(body, compresslevel=9, mtime=0),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_seat', '0026_seatmaptile_published'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_payload, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,11 @@
+import gzip
+import hashlib
+import json
+
 from django.db.models import *
 from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 from app_core.models import AutoDateTimeIdAbstract, GeomPointIdAbstract
 
@@ -24,10 +30,18 @@ class Section(AutoDateTimeIdAbstract):
     venue = ForeignKey(Venue, on_delete=CASCADE, related_name="sections")
     name = CharField(max_length=255)
     category = CharField(max_length=100, blank=True)
+    canvas_key = CharField(
+        max_length=255,
+        blank=True,
+        editable=False,
+        help_text="Clave de la sección en el diseñador; la mantiene aunque se renombre.",
+    )
 
     class Meta:
         verbose_name_plural = "Sections"
         ordering = ["venue", "order", "name"]
+        # Clave del upsert en bloque de la sincronización del plano
+        unique_together = ["venue", "name"]
 
     def __str__(self) -> str:
         return f"{self.venue.name} – {self.name}"
@@ -61,6 +75,31 @@ class Seat(AutoDateTimeIdAbstract):
     seat_type = CharField(
         max_length=20, choices=SEAT_TYPE_CHOICES, default="standard"
     )
+    position = PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Posición física en la fila (1 = extremo izquierdo); la recalcula la sincronización del plano.",
+    )
+    canvas_id = CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text="Id del círculo en el diseñador; mantiene el asiento entre guardados.",
+    )
+    x = FloatField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Centro X de la butaca en el canvas del diseñador.",
+    )
+    y = FloatField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Centro Y de la butaca en el canvas del diseñador.",
+    )
 
     class Meta:
         verbose_name_plural = "Seats"
@@ -78,15 +117,224 @@ class SeatMap(AutoDateTimeIdAbstract):
     venue = ForeignKey(Venue, on_delete=CASCADE, related_name="seatmaps")
     name = CharField(max_length=255)
     data = JSONField(default=dict, blank=True)
+    # Respuesta de carga ya serializada y comprimida al guardar; el hash
+    # (sha256 del cuerpo sin comprimir) es el ETag del plano.
+    content_hash = CharField(max_length=64, blank=True, default="", editable=False)
+    data_gzip = BinaryField(null=True, blank=True, editable=False)
+    # Versión de `data`; cada guardado desde el diseñador la incrementa
+    version = PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         verbose_name_plural = "Seat maps"
         unique_together = ["venue", "name"]
         ordering = ["venue", "name"]
+        indexes = [
+            Index(fields=["venue", "-created_at"], name="seatmap_venue_latest_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.venue.name} – {self.name}"
 
+    def refresh_payload(self) -> None:
+        """Recalcula content_hash y data_gzip a partir de data (vacío si no hay plano)."""
+        if not self.data:
+            self.content_hash, self.data_gzip = "", None
+            return
+        body = json.dumps({"ok": True, "version": self.version, "data": self.data}, cls=DjangoJSONEncoder,
+                          separators=(",", ":")).encode("utf-8")
+        self.content_hash = hashlib.sha256(body).hexdigest()
+        self.data_gzip = gzip.compress(body, compresslevel=9, mtime=0)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "data" in update_fields:
+            self.refresh_payload()
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "version", "content_hash", "data_gzip"}
+        super().save(*args, **kwargs)
+
+
+class SeatMapRevision(AutoDateTimeIdAbstract):
+    """Entrada del historial de un plano.
+
+    Cada versión guarda o bien el documento completo (snapshot) o bien el
+    parche JSON (RFC 6902) que lleva desde la versión anterior. Se lee con
+    `app_seat.seatmap_history.data_at`.
+    """
+
+    KIND_CHOICES = [
+        ("snapshot", "Snapshot"),
+        ("patch", "Patch"),
+    ]
+
+    seatmap = ForeignKey(
+        SeatMap,
+        on_delete=CASCADE,
+        related_name="revisions",
+        help_text="Plano al que pertenece la versión.",
+    )
+    version = PositiveIntegerField(help_text="Versión del plano tras este cambio.")
+    kind = CharField(max_length=10, choices=KIND_CHOICES)
+    payload = JSONField(help_text="Documento completo (snapshot) o lista de operaciones (patch).")
+    user = ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=SET_NULL,
+        null=True,
+        blank=True,
+        related_name="seatmap_revisions",
+        help_text="Usuario que guardó esta versión, si aplica.",
+    )
+
+    class Meta:
+        verbose_name_plural = "Seat map revisions"
+        unique_together = ["seatmap", "version"]
+        ordering = ["seatmap", "-version"]
+
+    def __str__(self) -> str:
+        return f"{self.seatmap} v{self.version} ({self.kind})"
+
+
+class SeatMapTile(AutoDateTimeIdAbstract):
+    """Tesela precalculada de un plano para clientes que cargan por zona.
+
+    - outline: una por plano (zoom 0, 0/0); contornos de sección, límites y
+      lista de teselas no vacías.
+    - rows: niveles de zoom bajos; filas resumidas como polilíneas.
+    - seats: nivel de detalle; asientos individuales.
+
+    Son de una versión publicada del plano: las genera
+    `app_seat.tiles.build_tiles` al publicarla y, como ella, no cambian.
+    """
+
+    KIND_CHOICES = [
+        ("outline", "Outline"),
+        ("rows", "Rows"),
+        ("seats", "Seats"),
+    ]
+
+    published = ForeignKey(
+        "PublishedSeatMap",
+        on_delete=CASCADE,
+        related_name="tiles",
+        help_text="Versión publicada del plano a la que pertenece la tesela.",
+    )
+    kind = CharField(max_length=10, choices=KIND_CHOICES)
+    zoom = PositiveSmallIntegerField(default=0)
+    tile_x = PositiveIntegerField(default=0)
+    tile_y = PositiveIntegerField(default=0)
+    seat_count = PositiveIntegerField(default=0)
+    content_hash = CharField(max_length=64, help_text="sha256 del JSON sin comprimir (ETag).")
+    data_gzip = BinaryField(help_text="JSON de la tesela comprimido con gzip.")
+
+    class Meta:
+        verbose_name_plural = "Seat map tiles"
+        unique_together = ["published", "zoom", "tile_x", "tile_y", "kind"]
+        ordering = ["published", "zoom", "tile_y", "tile_x"]
+
+    def __str__(self) -> str:
+        return f"{self.published} {self.kind} {self.zoom}/{self.tile_x}/{self.tile_y}"
+
+
+class SeatMapSyncJob(AutoDateTimeIdAbstract):
+    """Sincronización pendiente del plano de un recinto con Section/Row/Seat.
+
+    Guardar el plano solo encola el trabajo; lo ejecuta el worker
+    `run_seatmap_sync_worker`. Hay como mucho un trabajo en cola por recinto:
+    los guardados posteriores se acumulan en él (`saves`).
+    """
+
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+
+    venue = ForeignKey(
+        Venue,
+        on_delete=CASCADE,
+        related_name="sync_jobs",
+        help_text="Recinto cuyas tablas se sincronizan.",
+    )
+    seatmap = ForeignKey(
+        SeatMap,
+        on_delete=CASCADE,
+        related_name="sync_jobs",
+        help_text="Plano que se sincroniza (siempre en su última versión).",
+    )
+    seatmap_version = PositiveIntegerField(
+        default=0,
+        help_text="Versión del plano encolada o, una vez ejecutado, la sincronizada.",
+    )
+    status = CharField(max_length=10, choices=STATUS_CHOICES, default="queued", db_index=True)
+    progress = PositiveSmallIntegerField(default=0, help_text="Porcentaje completado (0-100).")
+    stage = CharField(max_length=50, blank=True)
+    saves = PositiveIntegerField(default=1, help_text="Guardados acumulados en este trabajo.")
+    attempts = PositiveSmallIntegerField(default=0)
+    error = TextField(blank=True)
+    started_at = DateTimeField(null=True, blank=True)
+    finished_at = DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "Seat map sync jobs"
+        ordering = ["-created_at"]
+        constraints = [
+            UniqueConstraint(
+                fields=["venue"],
+                condition=Q(status="queued"),
+                name="seatmap_sync_one_queued_per_venue",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"Sync {self.venue.name} v{self.seatmap_version} ({self.status})"
+
+
+class PublishedSeatMap(AutoDateTimeIdAbstract):
+    """Versión publicada (inmutable) de un plano, la que ven los compradores.
+
+    La genera `app_seat.publishing.publish_seatmap` a partir de las tablas ya
+    sincronizadas: solo lo que necesita el comprador (contornos, filas y
+    asientos con sus ids de Seat, en el orden del manifiesto de los
+    eventos), sin las propiedades del editor. Se identifica por el sha256
+    del contenido y no se modifica una vez creada.
+    """
+
+    seatmap = ForeignKey(
+        SeatMap,
+        on_delete=CASCADE,
+        related_name="published",
+        help_text="Plano de diseño del que se publicó.",
+    )
+    seatmap_version = PositiveIntegerField(help_text="Versión del plano publicada.")
+    content_hash = CharField(max_length=64, unique=True, help_text="sha256 del JSON sin comprimir (ETag y URL).")
+    seats_hash = CharField(
+        max_length=16,
+        help_text="Hash de los ids de Seat en orden: coincide con el de los EventSeat de un evento alineado.",
+    )
+    seat_count = PositiveIntegerField(default=0)
+    data_gzip = BinaryField(help_text="JSON publicado comprimido con gzip.")
+    published_by = ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=SET_NULL,
+        null=True,
+        blank=True,
+        related_name="published_seatmaps",
+        help_text="Usuario que publicó, si aplica.",
+    )
+
+    class Meta:
+        verbose_name_plural = "Published seat maps"
+        ordering = ["seatmap", "-created_at"]
+
+    def __str__(self) -> str:
+        return f"{self.seatmap} v{self.seatmap_version} ({self.content_hash[:8]})"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Published seat maps are immutable")
+        super().save(*args, **kwargs)
+
 
 class Event(AutoDateTimeIdAbstract):
     """Evento programado en un recinto con un plano de asientos concreto."""
@@ -95,6 +343,15 @@ class Event(AutoDateTimeIdAbstract):
     slug = SlugField(max_length=255, unique=True)
     venue = ForeignKey(Venue, on_delete=CASCADE, related_name="events")
     seatmap = ForeignKey(SeatMap, on_delete=CASCADE, related_name="events")
+    # Lo que se sirve a los compradores; `seatmap` sigue siendo el diseño editable
+    published_seatmap = ForeignKey(
+        PublishedSeatMap,
+        on_delete=PROTECT,
+        null=True,
+        blank=True,
+        related_name="events",
+        help_text="Versión publicada del plano que ven los compradores.",
+    )
     start_datetime = DateTimeField()
     end_datetime = DateTimeField(null=True, blank=True)
     description = TextField(blank=True)
@@ -125,6 +382,76 @@ class PriceCategory(AutoDateTimeIdAbstract):
         return f"{self.name} – {self.price} ({self.event.name})"
 
 
+class PriceRule(AutoDateTimeIdAbstract):
+    """Regla declarativa para asignar categorías de precio en bloque.
+
+    Las reglas activas de un evento se evalúan por `order`: cada asiento
+    recibe la categoría de la primera regla que encaja. Los criterios vacíos
+    encajan con todo. Se aplican con `app_seat.price_rules.apply_rules`.
+    """
+
+    event = ForeignKey(
+        Event,
+        on_delete=CASCADE,
+        related_name="price_rules",
+        help_text="Evento al que pertenece la regla.",
+    )
+    price_category = ForeignKey(
+        PriceCategory,
+        on_delete=CASCADE,
+        related_name="rules",
+        help_text="Categoría que se asigna a los asientos que encajan.",
+    )
+    section = ForeignKey(
+        Section,
+        on_delete=CASCADE,
+        null=True,
+        blank=True,
+        related_name="price_rules",
+        help_text="Solo asientos de esta sección (vacío = todas).",
+    )
+    row_from = IntegerField(
+        null=True,
+        blank=True,
+        help_text="Orden de fila mínimo, inclusive (vacío = sin límite).",
+    )
+    row_to = IntegerField(
+        null=True,
+        blank=True,
+        help_text="Orden de fila máximo, inclusive (vacío = sin límite).",
+    )
+    seat_type = CharField(
+        max_length=20,
+        choices=Seat.SEAT_TYPE_CHOICES,
+        blank=True,
+        help_text="Solo asientos de este tipo (vacío = todos).",
+    )
+
+    class Meta:
+        verbose_name_plural = "Price rules"
+        ordering = ["event", "order"]
+
+    def __str__(self) -> str:
+        return f"{self.event.name}: {self.price_category.name} (#{self.order})"
+
+    def scope_errors(self) -> dict:
+        """Campos que apuntan fuera del evento: categoría de otro evento o sección de otro recinto."""
+        errors = {}
+        if self.event_id is None:
+            return errors
+        if self.price_category_id and self.price_category.event_id != self.event_id:
+            errors["price_category"] = "La categoría de precio pertenece a otro evento."
+        if self.section_id and self.section.venue_id != self.event.venue_id:
+            errors["section"] = "La sección pertenece a otro recinto."
+        return errors
+
+    def clean(self):
+        super().clean()
+        errors = self.scope_errors()
+        if errors:
+            raise ValidationError(errors)
+
+
 class EventSeat(AutoDateTimeIdAbstract):
     """Estado de un asiento para un evento concreto."""
 
@@ -147,16 +474,75 @@ class EventSeat(AutoDateTimeIdAbstract):
         PriceCategory, on_delete=SET_NULL, null=True, blank=True
     )
     hold_expires_at = DateTimeField(null=True, blank=True)
+    price = DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text="Precio propio del asiento (motor de precios); si está vacío se usa el de su categoría.",
+    )
+    version = PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Versión para control de concurrencia optimista; cada transición la incrementa.",
+    )
 
     class Meta:
         verbose_name_plural = "Event seats"
         unique_together = ["event", "seat"]
         ordering = ["event", "seat__row__section", "seat__row", "seat__number"]
+        indexes = [
+            # Deltas de disponibilidad: cambios de un evento desde una marca de tiempo
+            Index(fields=["event", "updated_at"], name="eventseat_event_updated_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.event.name} – {self.seat} [{self.status}]"
 
 
+class WaitingRoom(AutoDateTimeIdAbstract):
+    """Sala de espera virtual de un evento (control de admisión en on-sales).
+
+    Mientras `active` sea True, las rutas de selección y retención exigen un
+    pase de admisión. Los usuarios se admiten a `rate_per_second`, con una
+    ráfaga inicial de hasta `burst` posiciones.
+    """
+
+    event = OneToOneField(
+        Event,
+        on_delete=CASCADE,
+        related_name="waiting_room",
+        help_text="Evento protegido por esta sala de espera.",
+    )
+    rate_per_second = FloatField(
+        default=50,
+        help_text="Usuarios admitidos por segundo.",
+    )
+    burst = PositiveIntegerField(
+        default=100,
+        help_text="Posiciones que se pueden admitir de golpe cuando la cola está vacía.",
+    )
+    issued = BigIntegerField(
+        default=0,
+        help_text="Última posición de cola emitida.",
+    )
+    admitted = FloatField(
+        default=0,
+        help_text="Posición hasta la que se ha admitido.",
+    )
+    admitted_at = DateTimeField(
+        default=timezone.now,
+        help_text="Momento del último avance de la cola.",
+    )
+
+    class Meta:
+        verbose_name_plural = "Waiting rooms"
+        ordering = ["event"]
+
+    def __str__(self) -> str:
+        return f"Waiting room – {self.event.name}"
+
+
 class Hold(AutoDateTimeIdAbstract):
     """Retención temporal de uno o varios asientos para un evento.
 
@@ -244,10 +630,74 @@ class Booking(AutoDateTimeIdAbstract):
         default="pending",
         help_text="Estado actual de la reserva.",
     )
+    idempotency_key = CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        help_text="Clave de idempotencia de la petición que creó la reserva (única por usuario).",
+    )
+    hold_ref = CharField(
+        max_length=150,
+        blank=True,
+        editable=False,
+        help_text="Id de la retención confirmada (la retención se borra al confirmar).",
+    )
 
     class Meta:
         verbose_name_plural = "Bookings"
         ordering = ["-created_at"]
+        constraints = [
+            UniqueConstraint(
+                fields=["user", "idempotency_key"],
+                name="booking_unique_user_idempotency_key",
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"Booking #{self.pk} for {self.event.name}"
+
+
+class EventArchive(AutoDateTimeIdAbstract):
+    """Inventario comprimido de un evento terminado.
+
+    Guarda en una sola fila el estado final de los asientos, el historial de
+    retenciones y los asientos de cada reserva (JSON columnar comprimido),
+    para poder borrar sus filas de EventSeat/Hold. Se lee con
+    `app_seat.archive.load_archive`.
+    """
+
+    CODEC_CHOICES = [
+        ("lzma", "LZMA"),
+        ("zlib", "zlib"),
+    ]
+
+    event = OneToOneField(
+        Event,
+        on_delete=CASCADE,
+        related_name="archive",
+        help_text="Evento archivado.",
+    )
+    codec = CharField(
+        max_length=10,
+        choices=CODEC_CHOICES,
+        default="lzma",
+        help_text="Compresión del contenido.",
+    )
+    payload = BinaryField(
+        help_text="JSON columnar comprimido con asientos, retenciones y reservas.",
+    )
+    raw_size = PositiveIntegerField(
+        default=0,
+        help_text="Tamaño en bytes del JSON sin comprimir.",
+    )
+    seat_count = PositiveIntegerField(default=0)
+    booked_count = PositiveIntegerField(default=0)
+    hold_count = PositiveIntegerField(default=0)
+    booking_count = PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "Event archives"
+        ordering = ["-created_at"]
+
+    def __str__(self) -> str:
+        return f"Archive – {self.event.name}"
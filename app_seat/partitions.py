@@ -0,0 +1,198 @@
+# app_seat/partitions.py
+"""
+Particionado LIST de EventSeat por evento (PostgreSQL).
+
+Tras `convert_to_partitioned()` la tabla de EventSeat queda particionada por
+event_id: una partición por evento más una DEFAULT para eventos sin
+partición propia. Las consultas filtradas por evento solo tocan su
+partición (partition pruning), y los eventos pasados se pueden desenganchar
+(DETACH) sin reescribir la tabla principal.
+
+Restricciones de PostgreSQL que impone el particionado:
+  - La clave primaria pasa a ser (id, event_id).
+  - Las tablas intermedias Hold.seats / Booking.seats no pueden tener FK a
+    una tabla particionada por solo `id`: la conversión elimina esas FK a
+    nivel de BD (el ORM sigue manejando el borrado en cascada).
+
+Una partición desenganchada deja de existir para el ORM. Por eso solo se
+desengancha la de un evento ya archivado (EventArchive), y en la misma
+transacción se borran sus enlaces de Hold.seats / Booking.seats, que sin
+FK quedarían apuntando a asientos inexistentes.
+"""
+import re
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Booking, EventArchive, EventSeat, Hold
+from .services import SeatServiceError
+
+TABLE = EventSeat._meta.db_table
+DEFAULT_PARTITION = f"{TABLE}_default"
+
+
+class EventNotArchived(SeatServiceError):
+    status_code = 409
+
+
+def parse_cutoff(value: Optional[str]) -> datetime:
+    """Fecha de corte de `--before` (YYYY-MM-DD o ISO); ahora si no se indica.
+
+    Lanza ValueError si el texto no es una fecha válida.
+    """
+    if not value:
+        return timezone.now()
+    cutoff = parse_datetime(value)
+    if cutoff is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError("--before no es una fecha válida")
+        return timezone.make_aware(datetime(day.year, day.month, day.day))
+    return timezone.make_aware(cutoff) if timezone.is_naive(cutoff) else cutoff
+
+
+def partition_name(event_id) -> str:
+    return f"{TABLE}_p_{re.sub(r'[^0-9a-zA-Z]', '', str(event_id)).lower()[:40]}"
+
+
+def _qn(name: str) -> str:
+    return connection.ops.quote_name(name)
+
+
+def _table_exists(cur, name: str) -> bool:
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL", [name])
+    return cur.fetchone()[0]
+
+
+def is_partitioned() -> bool:
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cur:
+        cur.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))",
+            [TABLE],
+        )
+        return cur.fetchone()[0]
+
+
+def list_partitions() -> List[str]:
+    with connection.cursor() as cur:
+        cur.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s) ORDER BY c.relname",
+            [TABLE],
+        )
+        return [row[0] for row in cur.fetchall()]
+
+
+@transaction.atomic
+def ensure_event_partition(event_id) -> bool:
+    """
+    Crea la partición del evento si la tabla está particionada y aún no
+    existe. Si la DEFAULT ya tenía filas del evento, las mueve antes de
+    enganchar la partición. Devuelve True si creó algo.
+    """
+    if not is_partitioned():
+        return False
+    name = partition_name(event_id)
+    with connection.cursor() as cur:
+        if _table_exists(cur, name):
+            return False
+        cur.execute(f"CREATE TABLE {_qn(name)} (LIKE {_qn(TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        cur.execute(
+            f"WITH moved AS (DELETE FROM {_qn(DEFAULT_PARTITION)} WHERE event_id = %s RETURNING *) "
+            f"INSERT INTO {_qn(name)} SELECT * FROM moved",
+            [str(event_id)],
+        )
+        cur.execute(
+            f"ALTER TABLE {_qn(TABLE)} ATTACH PARTITION {_qn(name)} FOR VALUES IN (%s)",
+            [str(event_id)],
+        )
+    return True
+
+
+@transaction.atomic
+def detach_event_partition(event_id, drop: bool = False) -> bool:
+    """
+    Desengancha (y opcionalmente borra) la partición de un evento archivado,
+    junto con los enlaces de retenciones y reservas a sus asientos.
+    EventNotArchived si el evento no tiene EventArchive.
+    """
+    name = partition_name(event_id)
+    with connection.cursor() as cur:
+        if not _table_exists(cur, name):
+            return False
+        if not EventArchive.objects.filter(event_id=event_id).exists():
+            raise EventNotArchived("Archive the event before detaching its seat partition", event=str(event_id))
+        for through in (Hold.seats.through, Booking.seats.through):
+            cur.execute(
+                f"DELETE FROM {_qn(through._meta.db_table)} WHERE eventseat_id IN (SELECT id FROM {_qn(name)})"
+            )
+        cur.execute(f"ALTER TABLE {_qn(TABLE)} DETACH PARTITION {_qn(name)}")
+        if drop:
+            cur.execute(f"DROP TABLE {_qn(name)}")
+    return True
+
+
+def _link_table_fks(cur, referenced: str) -> Iterable[tuple]:
+    cur.execute(
+        "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+        "WHERE contype = 'f' AND confrelid = to_regclass(%s)",
+        [referenced],
+    )
+    return cur.fetchall()
+
+
+@transaction.atomic
+def convert_to_partitioned(event_ids: Iterable) -> None:
+    """
+    Conversión única de la tabla existente a una tabla particionada.
+    Bloquea la tabla mientras copia los datos: ejecutar en una ventana
+    de mantenimiento.
+    """
+    if is_partitioned():
+        return
+    legacy = f"{TABLE}_legacy"
+    link_tables = {Hold.seats.through._meta.db_table, Booking.seats.through._meta.db_table}
+    with connection.cursor() as cur:
+        cur.execute(f"LOCK TABLE {_qn(TABLE)} IN ACCESS EXCLUSIVE MODE")
+
+        # Las FK de las tablas intermedias apuntan a `id` a secas
+        for rel, conname in _link_table_fks(cur, TABLE):
+            if rel.strip('"') in link_tables:
+                cur.execute(f"ALTER TABLE {rel} DROP CONSTRAINT {_qn(conname)}")
+
+        cur.execute(f"ALTER TABLE {_qn(TABLE)} RENAME TO {_qn(legacy)}")
+        cur.execute(
+            f"CREATE TABLE {_qn(TABLE)} (LIKE {_qn(legacy)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f"PARTITION BY LIST (event_id)"
+        )
+        # Nombres nuevos: los originales siguen en uso por la tabla legacy
+        statements = [
+            "ALTER TABLE {t} ADD CONSTRAINT {t_}_pk_part PRIMARY KEY (id, event_id)",
+            "ALTER TABLE {t} ADD CONSTRAINT {t_}_event_seat_part UNIQUE (event_id, seat_id)",
+            "CREATE INDEX {t_}_seat_part ON {t} (seat_id)",
+            "CREATE INDEX {t_}_price_category_part ON {t} (price_category_id)",
+            "CREATE INDEX {t_}_event_updated_part ON {t} (event_id, updated_at)",
+        ]
+        for sql in statements:
+            cur.execute(sql.format(t=_qn(TABLE), t_=TABLE))
+        # Igual que las FK de Django: sin ON DELETE (el ORM resuelve el cascade)
+        for field in ("event", "seat", "price_category"):
+            f = EventSeat._meta.get_field(field)
+            cur.execute(
+                f"ALTER TABLE {_qn(TABLE)} ADD CONSTRAINT {_qn(f'{TABLE}_{field}_fk_part')} "
+                f"FOREIGN KEY ({f.column}) REFERENCES {_qn(f.related_model._meta.db_table)} (id) "
+                f"DEFERRABLE INITIALLY DEFERRED"
+            )
+        cur.execute(f"CREATE TABLE {_qn(DEFAULT_PARTITION)} PARTITION OF {_qn(TABLE)} DEFAULT")
+        for event_id in event_ids:
+            cur.execute(
+                f"CREATE TABLE {_qn(partition_name(event_id))} PARTITION OF {_qn(TABLE)} FOR VALUES IN (%s)",
+                [str(event_id)],
+            )
+        cur.execute(f"INSERT INTO {_qn(TABLE)} SELECT * FROM {_qn(legacy)}")
+        cur.execute(f"DROP TABLE {_qn(legacy)}")
@@ -0,0 +1,120 @@
+# app_seat/price_rules.py
+"""
+Asignación de categorías de precio por reglas (PriceRule).
+
+Las reglas activas de un evento se compilan a una única expresión CASE
+(la primera regla que encaja gana) que se evalúa en SQL sobre
+EventSeat ⨝ Seat ⨝ Row:
+
+- preview_rules(): SELECT ... GROUP BY con el recuento por categoría.
+- apply_rules(): un UPDATE ... FROM que solo toca los asientos cuya
+  categoría cambia. Los asientos retenidos o vendidos no se modifican.
+
+Al cambiar de categoría se borra el precio propio del asiento
+(EventSeat.price) para que rija el de la nueva categoría.
+
+Una regla con la categoría de otro evento o la sección de otro recinto
+(PriceRule.scope_errors) hace fallar la compilación con InvalidPriceRules.
+"""
+from typing import Dict, List, Tuple
+
+from django.db import connection, transaction
+
+from .models import EventSeat, PriceCategory, PriceRule, Row, Seat
+from .services import SeatServiceError
+
+
+class InvalidPriceRules(SeatServiceError):
+    status_code = 422
+
+
+def _qn(name: str) -> str:
+    return connection.ops.quote_name(name)
+
+
+def compile_rules(event_id) -> Tuple[str, List]:
+    """CASE que devuelve el price_category_id de la primera regla que encaja (o NULL)."""
+    rules = list(
+        PriceRule.objects.filter(event_id=event_id, active=True)
+        .select_related("event", "price_category", "section")
+        .order_by("order", "created_at")
+    )
+    invalid = {rule.pk: errors for rule in rules if (errors := rule.scope_errors())}
+    if invalid:
+        raise InvalidPriceRules("Some price rules point outside the event", rules=invalid)
+    whens, params = [], []
+    for rule in rules:
+        conditions, cond_params = [], []
+        if rule.section_id:
+            conditions.append("r.section_id = %s")
+            cond_params.append(rule.section_id)
+        if rule.row_from is not None:
+            conditions.append(f"r.{_qn('order')} >= %s")
+            cond_params.append(rule.row_from)
+        if rule.row_to is not None:
+            conditions.append(f"r.{_qn('order')} <= %s")
+            cond_params.append(rule.row_to)
+        if rule.seat_type:
+            conditions.append("s.seat_type = %s")
+            cond_params.append(rule.seat_type)
+        whens.append(f"WHEN {' AND '.join(conditions) or 'TRUE'} THEN %s")
+        params.extend(cond_params + [rule.price_category_id])
+    if not whens:
+        return "NULL", []
+    return f"(CASE {' '.join(whens)} END)", params
+
+
+def _joins() -> str:
+    return (
+        f"FROM {_qn(EventSeat._meta.db_table)} es "
+        f"JOIN {_qn(Seat._meta.db_table)} s ON s.id = es.seat_id "
+        f"JOIN {_qn(Row._meta.db_table)} r ON r.id = s.row_id"
+    )
+
+
+def preview_rules(event_id) -> Dict:
+    """
+    Simulación sin escribir: {"categories": {nombre: asientos}, "changed": n,
+    "unmatched": n, "locked": n} (locked = retenidos/vendidos que no cambian).
+    """
+    case_sql, params = compile_rules(event_id)
+    sql = (
+        f"SELECT {case_sql} AS target, "
+        f"COUNT(*) FILTER (WHERE es.status = 'available' AND es.price_category_id IS DISTINCT FROM {case_sql}), "
+        f"COUNT(*) FILTER (WHERE es.status <> 'available'), COUNT(*) "
+        f"{_joins()} WHERE es.event_id = %s GROUP BY 1"
+    )
+    with connection.cursor() as cur:
+        cur.execute(sql, params + params + [str(event_id)])
+        rows = cur.fetchall()
+
+    names = dict(PriceCategory.objects.filter(event_id=event_id).values_list("pk", "name"))
+    result = {"categories": {}, "changed": 0, "unmatched": 0, "locked": 0}
+    for target, changed, locked, total in rows:
+        result["locked"] += locked
+        if target is None:
+            result["unmatched"] += total
+            continue
+        result["categories"][names.get(target, target)] = total
+        result["changed"] += changed
+    return result
+
+
+@transaction.atomic
+def apply_rules(event_id) -> int:
+    """Aplica las reglas a los asientos disponibles. Devuelve cuántos cambió."""
+    case_sql, params = compile_rules(event_id)
+    if not params:
+        return 0
+    table = _qn(EventSeat._meta.db_table)
+    sql = (
+        f"UPDATE {table} AS t SET price_category_id = m.target, price = NULL, "
+        f"version = t.version + 1, updated_at = now() "
+        f"FROM (SELECT es.id, {case_sql} AS target {_joins()} "
+        f"      WHERE es.event_id = %s AND es.status = 'available') AS m "
+        f"WHERE t.id = m.id AND t.event_id = %s AND m.target IS NOT NULL "
+        f"AND t.price_category_id IS DISTINCT FROM m.target"
+    )
+    with connection.cursor() as cur:
+        cur.execute(sql, params + [str(event_id), str(event_id)])
+        return cur.rowcount
@@ -0,0 +1,178 @@
+# app_seat/pricing.py
+"""
+Motor de precios dinámicos por asiento.
+
+Carga los asientos de un evento en arrays de NumPy (sección, orden de fila,
+tipo de asiento, estado, precio base de su categoría) y calcula el precio
+de todos a la vez:
+
+    precio = base × factor_fila × factor_tipo × factor_demanda
+
+- factor_fila: decae con la distancia a la primera fila de la sección.
+- factor_tipo: multiplicador por Seat.seat_type.
+- factor_demanda: interpolado sobre la curva DEMAND_CURVE a partir de la
+  ocupación (held + booked) de la sección o de la categoría.
+
+El resultado se acota a [MIN_FACTOR, MAX_FACTOR] × base, se redondea a
+ROUND_TO y se escribe en EventSeat.price con un único UPDATE ... FROM
+unnest(...). Solo se reprecian asientos disponibles; el precio base
+(PriceCategory.price) no se toca, así que ejecutar varias veces no acumula.
+"""
+from decimal import Decimal
+from time import perf_counter
+from typing import Dict, Optional
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import EventSeat, Seat
+
+DEFAULT_RULES = {
+    "ROW_DECAY": 0.02,        # -2 % por fila desde la primera
+    "ROW_FLOOR": 0.7,         # nunca por debajo del 70 % por posición
+    "SEAT_TYPE_FACTORS": {"standard": 1.0, "vip": 1.5, "accessible": 1.0},
+    # (ocupación, factor): se interpola linealmente entre puntos
+    "DEMAND_CURVE": [(0.0, 0.9), (0.5, 1.0), (0.8, 1.2), (1.0, 1.5)],
+    "DEMAND_SCOPE": "section",  # "section" o "category"
+    "MIN_FACTOR": 0.5,
+    "MAX_FACTOR": 3.0,
+    "ROUND_TO": 0.5,
+}
+
+SEAT_TYPES = [value for value, _ in Seat.SEAT_TYPE_CHOICES]
+STATUSES = [value for value, _ in EventSeat.STATUS_CHOICES]
+
+
+def get_rules(overrides: Optional[Dict] = None) -> Dict:
+    rules = {**DEFAULT_RULES, **(getattr(settings, "SEAT_PRICING", {}) or {})}
+    if overrides:
+        rules.update(overrides)
+    return rules
+
+
+def load_event_arrays(event_id) -> Dict[str, np.ndarray]:
+    """Columnas de los asientos del evento que tienen categoría de precio."""
+    rows = list(
+        EventSeat.objects.filter(event_id=event_id, price_category__isnull=False)
+        .order_by()
+        .values_list(
+            "id", "seat__row__section_id", "seat__row__order", "seat__seat_type",
+            "status", "price_category_id", "price_category__price", "price",
+        )
+    )
+    n = len(rows)
+    if not n:
+        return {"n": 0}
+    ids, sections, row_order, seat_types, statuses, categories, base, current = zip(*rows)
+    _, section_idx = np.unique(np.array(sections, dtype=object).astype(str), return_inverse=True)
+    _, category_idx = np.unique(np.array(categories, dtype=object).astype(str), return_inverse=True)
+    type_code = {t: i for i, t in enumerate(SEAT_TYPES)}
+    status_code = {s: i for i, s in enumerate(STATUSES)}
+    return {
+        "n": n,
+        "ids": np.array(ids, dtype=object),
+        "section": section_idx,
+        "row_order": np.fromiter(row_order, dtype=np.int64, count=n),
+        "seat_type": np.fromiter((type_code.get(t, 0) for t in seat_types), dtype=np.int8, count=n),
+        "status": np.fromiter((status_code[s] for s in statuses), dtype=np.int8, count=n),
+        "category": category_idx,
+        "base": np.fromiter(base, dtype=np.float64, count=n),
+        "current": np.fromiter((np.nan if p is None else p for p in current), dtype=np.float64, count=n),
+    }
+
+
+def _occupancy(group: np.ndarray, sold: np.ndarray) -> np.ndarray:
+    """Ocupación de cada grupo, repartida a cada asiento de ese grupo."""
+    totals = np.bincount(group)
+    taken = np.bincount(group, weights=sold, minlength=len(totals))
+    return (taken / np.maximum(totals, 1))[group]
+
+
+def compute_prices(arrays: Dict[str, np.ndarray], rules: Dict, mode: str = "seat") -> np.ndarray:
+    """
+    Precios nuevos (float64, mismo orden que `arrays["ids"]`).
+    mode="category": un precio uniforme por categoría (base × demanda).
+    """
+    base = arrays["base"]
+    sold = (arrays["status"] != STATUSES.index("available")).astype(np.float64)
+    curve = np.asarray(rules["DEMAND_CURVE"], dtype=np.float64)
+
+    if mode == "category":
+        demand = np.interp(_occupancy(arrays["category"], sold), curve[:, 0], curve[:, 1])
+        factor = demand
+    else:
+        scope = arrays["category"] if rules["DEMAND_SCOPE"] == "category" else arrays["section"]
+        demand = np.interp(_occupancy(scope, sold), curve[:, 0], curve[:, 1])
+
+        # Fila relativa a la primera fila de su sección
+        section = arrays["section"]
+        first_row = np.full(section.max() + 1, np.iinfo(np.int64).max)
+        np.minimum.at(first_row, section, arrays["row_order"])
+        rank = arrays["row_order"] - first_row[section]
+        row_factor = np.maximum(1.0 - rules["ROW_DECAY"] * rank, rules["ROW_FLOOR"])
+
+        type_factors = np.array(
+            [rules["SEAT_TYPE_FACTORS"].get(t, 1.0) for t in SEAT_TYPES], dtype=np.float64
+        )
+        factor = row_factor * type_factors[arrays["seat_type"]] * demand
+
+    factor = np.clip(factor, rules["MIN_FACTOR"], rules["MAX_FACTOR"])
+    step = rules["ROUND_TO"] or 0.01
+    return np.round(base * factor / step) * step
+
+
+def _write_prices(event_id, ids, prices) -> int:
+    table = connection.ops.quote_name(EventSeat._meta.db_table)
+    sql = (
+        f"UPDATE {table} AS es SET price = v.price, version = es.version + 1, updated_at = now() "
+        f"FROM unnest(%s::varchar[], %s::numeric[]) AS v(id, price) "
+        f"WHERE es.id = v.id AND es.event_id = %s AND es.status = 'available' "
+        f"AND es.price IS DISTINCT FROM v.price"
+    )
+    with connection.cursor() as cur:
+        cur.execute(sql, [list(ids), [Decimal(f"{p:.2f}") for p in prices], str(event_id)])
+        return cur.rowcount
+
+
+def reprice_event(event_id, *, mode: str = "seat", rules: Optional[Dict] = None, dry_run: bool = False) -> Dict:
+    """
+    Recalcula y guarda los precios de los asientos disponibles del evento.
+    Devuelve un resumen con recuentos, estadísticas y tiempos (ms).
+    """
+    if mode not in ("seat", "category"):
+        raise ValueError(f"Unknown pricing mode '{mode}'")
+    rules = get_rules(rules)
+    timings = {}
+
+    start = perf_counter()
+    arrays = load_event_arrays(event_id)
+    timings["load_ms"] = round((perf_counter() - start) * 1000, 1)
+    if not arrays["n"]:
+        return {"event": str(event_id), "seats": 0, "changed": 0, "updated": 0, **timings}
+
+    start = perf_counter()
+    prices = compute_prices(arrays, rules, mode)
+    available = arrays["status"] == STATUSES.index("available")
+    changed = available & ~np.isclose(prices, arrays["current"], atol=0.005)  # NaN (sin precio) cuenta como cambio
+    timings["compute_ms"] = round((perf_counter() - start) * 1000, 1)
+
+    updated = 0
+    if changed.any() and not dry_run:
+        start = perf_counter()
+        with transaction.atomic():
+            updated = _write_prices(event_id, arrays["ids"][changed], prices[changed])
+        timings["write_ms"] = round((perf_counter() - start) * 1000, 1)
+
+    return {
+        "event": str(event_id),
+        "mode": mode,
+        "seats": int(arrays["n"]),
+        "available": int(available.sum()),
+        "changed": int(changed.sum()),
+        "updated": updated,
+        "min": float(prices[available].min()) if available.any() else None,
+        "mean": round(float(prices[available].mean()), 2) if available.any() else None,
+        "max": float(prices[available].max()) if available.any() else None,
+        **timings,
+    }
@@ -0,0 +1,173 @@
+# app_seat/publishing.py
+"""
+Publicación de planos: versiones inmutables para compradores.
+
+El diseñador edita SeatMap.data (y la sincronización lo lleva a
+Section/Row/Seat); los compradores no deben ver ese documento a medio
+editar. `publish_seatmap()` congela el estado ya sincronizado en un
+PublishedSeatMap:
+
+- Solo lo que dibuja el comprador: límites, leyenda, contornos de sección,
+  filas y asientos en columnas (id de Seat, x, y, número, tipo, fila). Nada
+  de propiedades del editor (estilos de Fabric, claves de sección, ui...).
+- Los asientos van en el orden del manifiesto de disponibilidad
+  (availability.MANIFEST_ORDER): en un evento alineado, el asiento i del
+  plano publicado es el i del snapshot de estados.
+- JSON compacto, comprimido con gzip e identificado por su sha256: la URL
+  lleva el hash, así que se sirve con caché de larga duración.
+- Sus teselas (app_seat.tiles) se generan a la vez y tampoco cambian.
+
+`assign_published()` apunta un evento a una versión publicada tras
+comprobar que sus EventSeat están alineados con ella (seats_hash).
+"""
+import hashlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+
+from .availability import MANIFEST_ORDER
+from .models import Event, EventSeat, PublishedSeatMap, Seat, SeatMap, Section
+from .services import SeatServiceError
+from .tiles import build_tiles, encode_json, section_polygons
+
+PUBLISHED_FORMAT = 1
+# Mismo orden que el manifiesto, visto desde Seat
+SEAT_ORDER = tuple(field.removeprefix("seat__") for field in MANIFEST_ORDER)
+
+
+class SeatMapNotSynced(SeatServiceError):
+    status_code = 409
+
+
+class SeatMapMismatch(SeatServiceError):
+    status_code = 409
+
+
+def seats_hash(seat_ids: Iterable) -> str:
+    """Huella de una secuencia de ids de Seat (orden incluido)."""
+    h = hashlib.sha1()
+    for pk in seat_ids:
+        h.update(str(pk).encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()[:16]
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 1)
+
+
+def _legend(data: Dict) -> List[Dict]:
+    # Solo lo que pinta el comprador
+    return [
+        {k: item[k] for k in ("key", "label", "color") if k in item}
+        for item in (data or {}).get("legend") or [] if isinstance(item, dict)
+    ]
+
+
+def build_published_document(seatmap: SeatMap) -> Tuple[Dict, List[str]]:
+    """(documento para compradores, ids de Seat en orden) del estado sincronizado del plano."""
+    seats = list(
+        Seat.objects.filter(row__section__venue_id=seatmap.venue_id)
+        .order_by(*SEAT_ORDER)
+        .values_list("pk", "x", "y", "number", "seat_type", "row_id", "row__name", "row__section_id")
+    )
+    sections = list(
+        Section.objects.filter(venue_id=seatmap.venue_id)
+        .order_by("order", "name")
+        .values_list("pk", "name", "category", "order")
+    )
+    polygons = section_polygons(seatmap.data)
+    section_index = {pk: i for i, (pk, *_) in enumerate(sections)}
+
+    rows: Dict[str, int] = {}
+    row_list = []
+    for seat in seats:
+        if seat[5] not in rows:
+            rows[seat[5]] = len(row_list)
+            row_list.append({"id": seat[5], "name": seat[6], "section": section_index[seat[7]]})
+
+    placed = [(s[1], s[2]) for s in seats if s[1] is not None and s[2] is not None]
+    xs = [p[0] for p in placed] + [pt[0] for poly in polygons.values() for pt in poly]
+    ys = [p[1] for p in placed] + [pt[1] for poly in polygons.values() for pt in poly]
+    bounds = [_round(min(xs)), _round(min(ys)), _round(max(xs)), _round(max(ys))] if xs else None
+
+    ui = (seatmap.data or {}).get("ui") or {}
+    radius = ui.get("seatRadius") if isinstance(ui, dict) else None
+    doc = {
+        "format": PUBLISHED_FORMAT,
+        "seatmap": seatmap.pk,
+        "version": seatmap.version,
+        "bounds": bounds,
+        "seat_radius": radius if isinstance(radius, (int, float)) else 10,
+        "legend": _legend(seatmap.data),
+        "sections": [
+            {"id": pk, "name": name, "category": category, "order": order_val, "polygon": polygons.get(name)}
+            for pk, name, category, order_val in sections
+        ],
+        "rows": row_list,
+        "seats": {
+            "id": [s[0] for s in seats],
+            "x": [_round(s[1]) for s in seats],
+            "y": [_round(s[2]) for s in seats],
+            "number": [s[3] for s in seats],
+            "type": [s[4] for s in seats],
+            "row": [rows[s[5]] for s in seats],
+        },
+    }
+    return doc, [s[0] for s in seats]
+
+
+def publish_seatmap(seatmap: SeatMap, user=None) -> PublishedSeatMap:
+    """
+    Publica el estado sincronizado del plano y genera sus teselas. Si el
+    contenido no cambió desde la última publicación, devuelve esa misma
+    versión.
+    """
+    pending = seatmap.venue.sync_jobs.filter(status__in=["queued", "running"]).exists()
+    if pending:
+        raise SeatMapNotSynced("The seat map is still being synchronised; publish when the sync finishes")
+    doc, seat_ids = build_published_document(seatmap)
+    content_hash, data_gzip = encode_json(doc)
+    with transaction.atomic():
+        published, created = PublishedSeatMap.objects.get_or_create(
+            content_hash=content_hash,
+            defaults={
+                "seatmap": seatmap,
+                "seatmap_version": seatmap.version,
+                "seats_hash": seats_hash(seat_ids),
+                "seat_count": len(seat_ids),
+                "data_gzip": data_gzip,
+                "published_by": user if getattr(user, "is_authenticated", False) else None,
+            },
+        )
+        if created:
+            build_tiles(published)
+    return published
+
+
+def event_seats_hash(event_id) -> str:
+    """seats_hash de los asientos del evento en el orden de su manifiesto."""
+    return seats_hash(
+        EventSeat.objects.filter(event_id=event_id).order_by(*MANIFEST_ORDER).values_list("seat_id", flat=True)
+    )
+
+
+def assign_published(event: Event, published: PublishedSeatMap) -> Event:
+    """Sirve `published` a los compradores del evento (mismo recinto y asientos alineados)."""
+    if published.seatmap.venue_id != event.venue_id:
+        raise SeatMapMismatch("The published seat map belongs to another venue")
+    if event_seats_hash(event.pk) != published.seats_hash:
+        raise SeatMapMismatch(
+            "The event seats do not match the published seat map",
+            published=published.pk,
+        )
+    event.published_seatmap = published
+    event.save(update_fields=["published_seatmap", "updated_at"])
+    return event
+
+
+def publish_for_event(event: Event, user=None) -> PublishedSeatMap:
+    """Publica el plano de diseño del evento y lo asigna al evento."""
+    published = publish_seatmap(event.seatmap, user=user)
+    assign_published(event, published)
+    return published
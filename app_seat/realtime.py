@@ -0,0 +1,91 @@
+# app_seat/realtime.py
+"""
+Difusión en tiempo real del estado de los asientos (Socket.IO).
+
+Los cambios de estado de EventSeat se acumulan en memoria por evento y se
+emiten agrupados: un único mensaje por sala cada SEAT_BROADCAST_INTERVAL
+segundos, en lugar de un emit por asiento.
+
+El buffer es local al proceso: los publicadores (vistas Django en el
+threadpool, servicios, señales) y el bucle de envío deben vivir en el mismo
+proceso ASGI.
+
+El mismo bucle libera cada HOLD_SWEEP_INTERVAL segundos las retenciones
+vencidas (services.release_expired_holds): nada más las devuelve a
+'available', y sin ese paso los clientes las verían ocupadas para siempre.
+"""
+import logging
+import threading
+import time
+from typing import Dict, Mapping
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+SEAT_STATUS_EVENT = "seat_status"
+FLUSH_INTERVAL = float(getattr(settings, "SEAT_BROADCAST_INTERVAL", 0.1))
+HOLD_SWEEP_INTERVAL = float(getattr(settings, "SEAT_HOLD_SWEEP_INTERVAL", 5.0))
+
+_lock = threading.Lock()
+_pending: Dict[str, Dict[str, str]] = {}
+
+
+def room_for_event(event_id) -> str:
+    """Nombre de la sala Socket.IO de un evento."""
+    return f"event:{event_id}"
+
+
+def publish_seat_changes(event_id, changes: Mapping) -> None:
+    """
+    Encola cambios {event_seat_id: status} para el evento.
+    Si un asiento cambia varias veces dentro del intervalo solo se envía
+    su último estado.
+    """
+    if not changes:
+        return
+    with _lock:
+        bucket = _pending.setdefault(str(event_id), {})
+        for seat_id, status in changes.items():
+            bucket[str(seat_id)] = status
+
+
+def publish_on_commit(event_id, changes: Mapping) -> None:
+    """Publica los cambios solo si la transacción en curso hace commit."""
+    changes = dict(changes)
+    transaction.on_commit(lambda: publish_seat_changes(event_id, changes))
+
+
+def _drain() -> Dict[str, Dict[str, str]]:
+    global _pending
+    with _lock:
+        batch, _pending = _pending, {}
+    return batch
+
+
+async def flush_loop(sio, interval: float = FLUSH_INTERVAL) -> None:
+    """Bucle de fondo: libera retenciones vencidas, vacía el buffer y emite un mensaje por sala."""
+    # Import diferido: services publica a través de este módulo
+    from .services import release_expired_holds
+
+    last_sweep = 0.0
+    while True:
+        await sio.sleep(interval)
+        if time.monotonic() - last_sweep >= HOLD_SWEEP_INTERVAL:
+            last_sweep = time.monotonic()
+            try:
+                await sync_to_async(release_expired_holds, thread_sensitive=False)()
+            except Exception:
+                logger.exception("No se pudieron liberar las retenciones vencidas")
+        batch = _drain()
+        for event_id, seats in batch.items():
+            try:
+                await sio.emit(
+                    SEAT_STATUS_EVENT,
+                    {"event": event_id, "seats": seats},
+                    room=room_for_event(event_id),
+                )
+            except Exception:
+                logger.exception("No se pudo emitir el estado de asientos del evento %s", event_id)
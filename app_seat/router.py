@@ -0,0 +1,499 @@
+# app_seat/router.py
+from datetime import datetime
+from decimal import Decimal
+from typing import List, Optional
+
+import gzip
+import json
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from django.contrib.auth import get_user_model
+
+from web.auth_jwt import get_current_user
+
+from .admission import issue_ticket, queue_status, require_admission, user_key
+from .allocation import allocate_group
+from .availability import build_delta, build_snapshot, get_manifest, snapshot_as_json
+from .locks import lock_stats
+from .models import Booking, Event, EventSeat, PublishedSeatMap
+from .services import SeatServiceError, confirm_hold, create_hold, release_hold, transition_seat
+from .spatial import get_spatial_index
+from .tiles import accepts_gzip, get_tile, manifest_positions, resolve_tile
+
+router = APIRouter(tags=["Seats"])
+User = get_user_model()
+
+
+class HoldIn(BaseModel):
+    seats: List[str]
+
+
+class GroupHoldIn(BaseModel):
+    size: int
+    sections: Optional[List[str]] = None
+    seat_types: Optional[List[str]] = None
+    max_rows: Optional[int] = None
+    focal_row: int = 0
+    focal_offset: float = 0.0
+
+
+class LassoIn(BaseModel):
+    polygon: List[List[float]]
+    status: Optional[List[str]] = None
+
+
+class SeatTransitionIn(BaseModel):
+    expected_version: int
+    status: Optional[str] = None
+    price_category: Optional[str] = None
+    price: Optional[Decimal] = None
+    hold_expires_at: Optional[datetime] = None
+
+
+def _ensure_event(event_id: str) -> None:
+    if not Event.objects.filter(pk=event_id).exists():
+        raise HTTPException(status_code=404, detail="Event not found")
+
+
+def _user_from_jwt(current_user: dict):
+    user_id = current_user.get("user_id") or current_user.get("sub")
+    user = User.objects.filter(pk=user_id).first() if user_id else None
+    if user is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    return user
+
+
+def require_staff(current_user: dict = Depends(get_current_user)):
+    """Dependencia de las rutas de inventario: solo personal (is_staff)."""
+    user = _user_from_jwt(current_user)
+    if not user.is_staff:
+        raise HTTPException(status_code=403, detail="Staff only")
+    return user
+
+
+def _service_error(exc: SeatServiceError) -> HTTPException:
+    return HTTPException(status_code=exc.status_code, detail={"error": str(exc), **exc.extra})
+
+
+def _booking_out(booking: Booking) -> dict:
+    return {
+        "id": booking.pk,
+        "event": booking.event_id,
+        "seats": list(booking.seats.values_list("pk", flat=True)),
+        "total_price": float(booking.total_price),
+        "status": booking.status,
+    }
+
+
+# --------------------------
+# Disponibilidad compacta
+# --------------------------
+@router.get("/events/{event_id}/manifest", summary="Seat manifest (stable order)")
+def event_manifest(event_id: str):
+    """
+    Orden estable de los EventSeat del evento. El índice de cada id es su
+    posición en los snapshots/deltas de disponibilidad.
+    """
+    _ensure_event(event_id)
+    manifest = get_manifest(event_id)
+    return {"event": event_id, "manifest_version": manifest["version"], "seats": manifest["seats"]}
+
+
+@router.get("/events/{event_id}/availability", summary="Seat availability (2 bits per seat)")
+def event_availability(
+    event_id: str,
+    since: Optional[int] = Query(None, description="Versión (ms) del último snapshot/delta recibido"),
+    manifest_version: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|binary)$"),
+):
+    """
+    Sin 'since': snapshot completo (0=available, 1=held, 2=booked).
+    Con 'since': solo los cambios [[índice, código], ...] desde esa versión;
+    si el manifiesto cambió responde un snapshot con "reset": true.
+    """
+    _ensure_event(event_id)
+    if since is not None:
+        return build_delta(event_id, since, manifest_version)
+
+    snapshot = build_snapshot(event_id)
+    if format == "binary":
+        return Response(
+            content=snapshot["packed"],
+            media_type="application/octet-stream",
+            headers={
+                "X-Manifest-Version": snapshot["manifest_version"],
+                "X-Snapshot-Version": str(snapshot["version"]),
+                "X-Seat-Count": str(snapshot["count"]),
+            },
+        )
+    return snapshot_as_json(snapshot)
+
+
+# --------------------------
+# Sala de espera
+# --------------------------
+@router.post("/events/{event_id}/queue", summary="Join the waiting room")
+def queue_join(event_id: str, current_user: dict = Depends(get_current_user)):
+    """
+    Entrega un ticket de cola firmado para el usuario. Si el evento no tiene
+    sala activa responde "admitted": true y no hace falta pase.
+    """
+    _ensure_event(event_id)
+    user = user_key(current_user)
+    ticket = issue_ticket(event_id, user)
+    if ticket is None:
+        return {"admitted": True, "token": None, "pass": None}
+    return {**queue_status(event_id, ticket["token"], user), "token": ticket["token"]}
+
+
+@router.get("/events/{event_id}/queue", summary="Waiting room position")
+def queue_position(
+    event_id: str,
+    x_queue_token: str = Header(...),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Posición en la cola del ticket (cabecera X-Queue-Token). Cuando le toca,
+    "pass" trae el pase a enviar en X-Queue-Token a las rutas protegidas;
+    ticket y pase solo valen para el usuario que entró en la cola.
+    """
+    return queue_status(event_id, x_queue_token, user_key(current_user))
+
+
+# --------------------------
+# Retenciones
+# --------------------------
+@router.post(
+    "/events/{event_id}/holds",
+    status_code=201,
+    summary="Hold seats",
+    dependencies=[Depends(require_admission)],
+)
+def hold_create(event_id: str, body: HoldIn, current_user: dict = Depends(get_current_user)):
+    """
+    Retiene los EventSeat indicados (todos o ninguno). 409 si alguno no está
+    disponible; detail.seats lista los que fallaron.
+    """
+    user = _user_from_jwt(current_user)
+    try:
+        hold = create_hold(event_id, body.seats, user=user)
+    except SeatServiceError as exc:
+        raise _service_error(exc)
+    return {"id": hold.pk, "event": hold.event_id, "seats": body.seats, "expires_at": hold.expires_at}
+
+
+@router.post(
+    "/events/{event_id}/group-holds",
+    status_code=201,
+    summary="Allocate and hold a block of seats for a group",
+    dependencies=[Depends(require_admission)],
+)
+def group_hold_create(event_id: str, body: GroupHoldIn, current_user: dict = Depends(get_current_user)):
+    """
+    Elige un bloque compacto de `size` asientos en filas contiguas de una
+    sección (cerca de focal_row/focal_offset) y lo retiene de una vez.
+    409 si no hay bloque que cumpla las restricciones.
+    """
+    user = _user_from_jwt(current_user)
+    _ensure_event(event_id)
+    try:
+        hold, block = allocate_group(
+            event_id, body.size, user=user, **body.model_dump(exclude={"size"}, exclude_none=True)
+        )
+    except SeatServiceError as exc:
+        raise _service_error(exc)
+    return {
+        "id": hold.pk,
+        "event": hold.event_id,
+        "section": block["section"],
+        "rows": block["rows"],
+        "seats": block["seats"],
+        "expires_at": hold.expires_at,
+    }
+
+
+@router.delete("/holds/{hold_id}", summary="Release a hold")
+def hold_release(hold_id: str, current_user: dict = Depends(get_current_user)):
+    user = _user_from_jwt(current_user)
+    try:
+        released = release_hold(hold_id, user=user)
+    except SeatServiceError as exc:
+        raise _service_error(exc)
+    return {"released": released}
+
+
+@router.get("/metrics/locks", summary="Hold lock-wait metrics (this process)")
+def metrics_locks():
+    return lock_stats.snapshot()
+
+
+# --------------------------
+# Plano por teselas (contorno + zonas visibles) del plano publicado
+# --------------------------
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def _event_published(event_id: str) -> str:
+    """content_hash del plano publicado que ven los compradores del evento."""
+    row = Event.objects.filter(pk=event_id).values_list("pk", "published_seatmap__content_hash").first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    if row[1] is None:
+        raise HTTPException(status_code=404, detail="The event has no published seat map")
+    return row[1]
+
+
+def _tile_response(request: Request, tile, cache_control: str = "public, no-cache") -> Response:
+    """JSON precomprimido con ETag: 304 si coincide, gzip tal cual si el cliente lo acepta."""
+    content_hash, body = tile
+    etag = f'"{content_hash}"'
+    headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": cache_control}
+    if etag in [t.strip().removeprefix("W/") for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    if accepts_gzip(request.headers.get("accept-encoding", "")):
+        headers["Content-Encoding"] = "gzip"
+    else:
+        body = gzip.decompress(body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _outline(content_hash: str):
+    tile = get_tile(content_hash, "outline")
+    if tile is None:
+        raise HTTPException(status_code=404, detail="Seat map tiles not built")
+    return tile
+
+
+def _zoom_tile(content_hash: str, z: int, x: int, y: int):
+    if z < 0 or z > 30:
+        raise HTTPException(status_code=422, detail="Invalid zoom")
+    return resolve_tile(content_hash, z, x, y)
+
+
+@router.get("/events/{event_id}/map", summary="Seat map outline (sections and tile list)")
+def event_map_outline(event_id: str, request: Request):
+    """
+    Lo primero que carga el cliente: límites del plano (origin, size),
+    contornos de sección, `seat_zoom` y las teselas no vacías de cada zoom
+    del plano publicado del evento. Trae su `content_hash`: las teselas de
+    /seatmaps/published/{content_hash}/tiles/... no cambian nunca.
+    """
+    return _tile_response(request, _outline(_event_published(event_id)))
+
+
+@router.get("/events/{event_id}/map/tiles/{z}/{x}/{y}", summary="Seat map tile")
+def event_map_tile(event_id: str, z: int, x: int, y: int, request: Request):
+    """
+    Tesela z/x/y (2^z × 2^z sobre el cuadrado del contorno) del plano
+    publicado del evento: filas resumidas por debajo de seat_zoom, asientos
+    a partir de él. 204 si está vacía.
+    """
+    tile = _zoom_tile(_event_published(event_id), z, x, y)
+    if tile is None:
+        return Response(status_code=204)
+    return _tile_response(request, tile)
+
+
+@router.get("/events/{event_id}/map/tiles/{z}/{x}/{y}/index", summary="Manifest positions of a tile's seats")
+def event_map_tile_index(event_id: str, z: int, x: int, y: int):
+    """
+    Para cada asiento de la tesela (en su orden), su posición en el
+    manifiesto del evento: con ella se lee su estado en los snapshots de
+    /availability. Solo para teselas de asientos (z >= seat_zoom).
+    """
+    tile = _zoom_tile(_event_published(event_id), z, x, y)
+    if tile is None:
+        return {"manifest_version": None, "index": []}
+    doc = json.loads(gzip.decompress(tile[1]))
+    if "seats" not in doc:
+        raise HTTPException(status_code=422, detail="Tile has no individual seats at this zoom")
+    return manifest_positions(event_id, doc["seats"]["id"])
+
+
+@router.get("/seatmaps/published/{content_hash}/tiles/outline", summary="Published seat map outline (immutable)")
+def published_map_outline(content_hash: str, request: Request):
+    """Contorno de una versión publicada: el contenido de la URL no cambia, se cachea un año."""
+    return _tile_response(request, _outline(content_hash), IMMUTABLE)
+
+
+@router.get("/seatmaps/published/{content_hash}/tiles/{z}/{x}/{y}", summary="Published seat map tile (immutable)")
+def published_map_tile(content_hash: str, z: int, x: int, y: int, request: Request):
+    """Tesela z/x/y de una versión publicada; 204 si está vacía. Se cachea un año."""
+    tile = _zoom_tile(content_hash, z, x, y)
+    if tile is None:
+        return Response(status_code=204, headers={"Cache-Control": IMMUTABLE})
+    return _tile_response(request, tile, IMMUTABLE)
+
+
+# --------------------------
+# Plano publicado (inmutable, por hash de contenido)
+# --------------------------
+@router.get("/events/{event_id}/map/published", summary="Published seat map of an event")
+def event_published_map(event_id: str, request: Request):
+    """
+    Qué versión publicada del plano ve el comprador. Respuesta pequeña y sin
+    caché; el plano en sí se descarga de `url`, que no cambia nunca.
+    """
+    row = Event.objects.filter(pk=event_id).values_list(
+        "published_seatmap_id", "published_seatmap__content_hash",
+        "published_seatmap__seatmap_version", "published_seatmap__seat_count",
+    ).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    if row[0] is None:
+        raise HTTPException(status_code=404, detail="The event has no published seat map")
+    return Response(
+        content=json.dumps({
+            "id": row[0],
+            "content_hash": row[1],
+            "seatmap_version": row[2],
+            "seats": row[3],
+            "url": str(request.url_for("published_seatmap", content_hash=row[1])),
+        }),
+        media_type="application/json",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+@router.get("/seatmaps/published/{content_hash}", name="published_seatmap", summary="Published seat map (immutable)")
+def published_seatmap(content_hash: str, request: Request):
+    """Plano publicado: el contenido de una URL no cambia, se cachea un año."""
+    data_gzip = (
+        PublishedSeatMap.objects.filter(content_hash=content_hash).values_list("data_gzip", flat=True).first()
+    )
+    if data_gzip is None:
+        raise HTTPException(status_code=404, detail="Published seat map not found")
+    return _tile_response(request, (content_hash, bytes(data_gzip)), IMMUTABLE)
+
+
+# --------------------------
+# Consultas espaciales (índice en rejilla por recinto)
+# --------------------------
+def _event_venue(event_id: str):
+    venue_id = Event.objects.filter(pk=event_id).values_list("venue_id", flat=True).first()
+    if venue_id is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    return venue_id
+
+
+@router.post("/events/{event_id}/seats/lasso", summary="Event seats inside a polygon")
+def event_seats_lasso(event_id: str, body: LassoIn):
+    """
+    Asientos del evento cuyo centro cae dentro de `polygon` ([[x, y], ...]
+    en coordenadas del canvas), opcionalmente filtrados por estado.
+    """
+    index = get_spatial_index(_event_venue(event_id))
+    try:
+        seat_ids = index.in_polygon(body.polygon)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    qs = EventSeat.objects.filter(event_id=event_id, seat_id__in=seat_ids)
+    if body.status:
+        qs = qs.filter(status__in=body.status)
+    seats = [
+        {"id": pk, "seat": seat_id, "status": status}
+        for pk, seat_id, status in qs.order_by().values_list("pk", "seat_id", "status")
+    ]
+    return {"count": len(seats), "seats": seats}
+
+
+@router.get("/events/{event_id}/seats/nearest", summary="Event seats nearest to a point")
+def event_seats_nearest(
+    event_id: str,
+    x: float,
+    y: float,
+    k: int = Query(1, ge=1, le=100),
+    max_distance: Optional[float] = Query(None, gt=0),
+):
+    """Los `k` asientos del evento más cercanos a (x, y), del más cercano al más lejano."""
+    index = get_spatial_index(_event_venue(event_id))
+    found = index.nearest(x, y, k=k, max_distance=max_distance)
+    rows = {
+        seat_id: (pk, status)
+        for pk, seat_id, status in EventSeat.objects.filter(
+            event_id=event_id, seat_id__in=[seat_id for seat_id, _ in found]
+        ).values_list("pk", "seat_id", "status")
+    }
+    return {
+        "seats": [
+            {"id": rows[seat_id][0], "seat": seat_id, "status": rows[seat_id][1], "distance": round(distance, 3)}
+            for seat_id, distance in found
+            if seat_id in rows
+        ]
+    }
+
+
+# --------------------------
+# Checkout
+# --------------------------
+@router.post("/holds/{hold_id}/confirm", summary="Confirm a hold into a booking")
+def hold_confirm(
+    hold_id: str,
+    idempotency_key: str = Header(..., alias="Idempotency-Key"),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Convierte la retención en una reserva en una sola transacción.
+    Reintentos con la misma Idempotency-Key devuelven la reserva original
+    ("replayed": true) sin volver a ejecutar la conversión; la clave es por
+    usuario y reutilizarla con otra retención responde 409.
+    """
+    user = _user_from_jwt(current_user)
+    try:
+        booking, replayed = confirm_hold(hold_id, idempotency_key, user=user)
+    except SeatServiceError as exc:
+        raise _service_error(exc)
+    return {"booking": _booking_out(booking), "replayed": replayed}
+
+
+# --------------------------
+# Transiciones de EventSeat (compare-and-swap)
+# --------------------------
+@router.post(
+    "/event-seats/{event_seat_id}/transition",
+    summary="Compare-and-swap seat transition",
+    dependencies=[Depends(require_staff)],
+)
+def event_seat_transition(event_seat_id: str, body: SeatTransitionIn):
+    """
+    Aplica el cambio solo si `expected_version` coincide con la versión
+    actual. Si no, responde 409 con el estado actual en detail.current.
+    Solo personal: los compradores pasan por retenciones y confirmación.
+    """
+    changes = body.model_dump(exclude_unset=True, exclude={"expected_version"})
+    try:
+        return transition_seat(event_seat_id, body.expected_version, **changes)
+    except SeatServiceError as exc:
+        raise _service_error(exc)
+
+
+def update_event_seat(pk, payload: dict, if_match: Optional[str]) -> EventSeat:
+    """
+    update_handler del CRUD genérico de EventSeat (ver GENERIC_API):
+    PUT/PATCH exigen If-Match con la versión esperada. Solo personal: la
+    ruta lleva require_staff en sus dependencias.
+    """
+    if not if_match:
+        raise HTTPException(status_code=428, detail="If-Match header with the seat version is required")
+    try:
+        expected = int(if_match.strip().removeprefix("W/").strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid If-Match header")
+
+    # event/seat identifican el asiento: no se reasignan, se exige que coincidan
+    match = {}
+    if payload.get("event") is not None:
+        match["event_id"] = payload.pop("event")
+    if payload.get("seat") is not None:
+        match["seat_id"] = payload.pop("seat")
+    payload.pop("event", None)
+    payload.pop("seat", None)
+
+    try:
+        transition_seat(pk, expected, match=match, **payload)
+    except SeatServiceError as exc:
+        raise _service_error(exc)
+    return EventSeat.objects.get(pk=pk)
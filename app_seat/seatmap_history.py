@@ -0,0 +1,227 @@
+# app_seat/seatmap_history.py
+"""
+Guardado por parches e historial de versiones de SeatMap.data.
+
+El diseñador envía, junto a la versión sobre la que trabaja, o bien el
+documento completo o bien una lista de operaciones JSON Patch (RFC 6902:
+add, remove, replace, move, copy, test). `save_seatmap()` bloquea la fila,
+rechaza el cambio si otra edición ya movió la versión (409) y aplica el
+parche en el servidor.
+
+Historial (SeatMapRevision): cada versión guarda el parche recibido y, cada
+SNAPSHOT_EVERY versiones (o cuando llega el documento completo), un
+snapshot. `data_at()` reconstruye cualquier versión desde el snapshot
+anterior más cercano. Se conservan las versiones desde el KEEP_SNAPSHOTS-ésimo
+snapshot más reciente; las anteriores se borran.
+"""
+import copy
+from typing import Any, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import SeatMap, SeatMapRevision
+from .services import SeatServiceError
+
+SNAPSHOT_EVERY = getattr(settings, "SEAT_MAP_SNAPSHOT_EVERY", 20)
+KEEP_SNAPSHOTS = getattr(settings, "SEAT_MAP_KEEP_SNAPSHOTS", 5)
+
+_MISSING = object()
+
+
+class PatchError(SeatServiceError):
+    status_code = 400
+
+
+class VersionConflict(SeatServiceError):
+    status_code = 409
+
+
+# --------- JSON Pointer / JSON Patch ----------
+def _pointer(path: str) -> List[str]:
+    if path == "":
+        return []
+    if not isinstance(path, str) or not path.startswith("/"):
+        raise PatchError(f"Invalid JSON pointer: {path!r}")
+    return [part.replace("~1", "/").replace("~0", "~") for part in path[1:].split("/")]
+
+
+def _index(container: list, token: str, *, allow_end: bool = False) -> int:
+    if allow_end and token == "-":
+        return len(container)
+    if not token.isdigit() or (token != "0" and token.startswith("0")):
+        raise PatchError(f"Invalid array index: {token!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise PatchError(f"Array index out of range: {token}")
+    return index
+
+
+def _parent(doc: Any, tokens: List[str]):
+    """Contenedor del último token de la ruta."""
+    node = doc
+    for token in tokens[:-1]:
+        if isinstance(node, dict):
+            if token not in node:
+                raise PatchError(f"Path not found: /{'/'.join(tokens)}")
+            node = node[token]
+        elif isinstance(node, list):
+            node = node[_index(node, token)]
+        else:
+            raise PatchError(f"Path not found: /{'/'.join(tokens)}")
+    return node
+
+
+def _get(doc: Any, tokens: List[str]) -> Any:
+    if not tokens:
+        return doc
+    node = _parent(doc, tokens)
+    token = tokens[-1]
+    if isinstance(node, dict):
+        value = node.get(token, _MISSING)
+        if value is _MISSING:
+            raise PatchError(f"Path not found: /{'/'.join(tokens)}")
+        return value
+    if isinstance(node, list):
+        return node[_index(node, token)]
+    raise PatchError(f"Path not found: /{'/'.join(tokens)}")
+
+
+def _add(doc: Any, tokens: List[str], value: Any) -> Any:
+    if not tokens:
+        return value
+    node = _parent(doc, tokens)
+    token = tokens[-1]
+    if isinstance(node, dict):
+        node[token] = value
+    elif isinstance(node, list):
+        node.insert(_index(node, token, allow_end=True), value)
+    else:
+        raise PatchError(f"Path not found: /{'/'.join(tokens)}")
+    return doc
+
+
+def _remove(doc: Any, tokens: List[str]) -> Any:
+    if not tokens:
+        raise PatchError("Cannot remove the document root")
+    value = _get(doc, tokens)
+    node = _parent(doc, tokens)
+    if isinstance(node, dict):
+        del node[tokens[-1]]
+    else:
+        del node[_index(node, tokens[-1])]
+    return value
+
+
+def apply_patch(doc: Any, ops: List[dict]) -> Any:
+    """
+    Aplica `ops` (RFC 6902) sobre una copia de `doc` y la devuelve.
+    Es atómico: si una operación falla se lanza PatchError y `doc` no cambia.
+    """
+    if not isinstance(ops, list):
+        raise PatchError("Patch must be a list of operations")
+    doc = copy.deepcopy(doc)
+    for i, op in enumerate(ops):
+        if not isinstance(op, dict) or "op" not in op or "path" not in op:
+            raise PatchError(f"Malformed operation at index {i}")
+        kind, tokens = op["op"], _pointer(op["path"])
+        if kind in ("add", "replace", "test") and "value" not in op:
+            raise PatchError(f"Operation {i} ({kind}) requires 'value'")
+        if kind == "add":
+            doc = _add(doc, tokens, copy.deepcopy(op["value"]))
+        elif kind == "remove":
+            _remove(doc, tokens)
+        elif kind == "replace":
+            if tokens:
+                _remove(doc, tokens)
+            doc = _add(doc, tokens, copy.deepcopy(op["value"]))
+        elif kind in ("move", "copy"):
+            source = _pointer(op.get("from", ""))
+            if kind == "move" and tokens[:len(source)] == source and tokens != source:
+                raise PatchError(f"Operation {i}: cannot move a value into itself")
+            value = _remove(doc, source) if kind == "move" else copy.deepcopy(_get(doc, source))
+            doc = _add(doc, tokens, value)
+        elif kind == "test":
+            if _get(doc, tokens) != op["value"]:
+                raise PatchError(f"Test failed at {op['path']}")
+        else:
+            raise PatchError(f"Unknown operation: {kind!r}")
+    return doc
+
+
+# --------- versiones ----------
+def _prune(seatmap: SeatMap) -> None:
+    keep_from = list(
+        seatmap.revisions.filter(kind="snapshot")
+        .order_by("-version")
+        .values_list("version", flat=True)[:KEEP_SNAPSHOTS]
+    )
+    if len(keep_from) == KEEP_SNAPSHOTS:
+        seatmap.revisions.filter(version__lt=keep_from[-1]).delete()
+
+
+@transaction.atomic
+def save_seatmap(seatmap: SeatMap, *, base_version: Optional[int], data: Any = None,
+                 patch: Optional[List[dict]] = None, user=None) -> SeatMap:
+    """
+    Guarda una nueva versión del plano a partir de `data` (documento completo)
+    o `patch` (operaciones sobre la versión `base_version`). Con
+    `base_version=None` solo se admite `data` y se sobrescribe sin comprobar.
+    """
+    if (data is None) == (patch is None):
+        raise PatchError("Send either 'data' or 'patch'")
+    seatmap = SeatMap.objects.select_for_update().get(pk=seatmap.pk)
+    if base_version is None:
+        if patch is not None:
+            raise PatchError("A patch requires 'base_version'")
+    elif base_version != seatmap.version:
+        raise VersionConflict(
+            "The seat map was modified by another save",
+            version=seatmap.version,
+            base_version=base_version,
+        )
+
+    if patch is not None:
+        data = apply_patch(seatmap.data, patch)
+        if not isinstance(data, dict):
+            raise PatchError("The patched document must be an object")
+        # Sin cambios: no hay versión nueva
+        if data == seatmap.data:
+            return seatmap
+
+    seatmap.data = data
+    seatmap.version += 1
+    user = user if getattr(user, "is_authenticated", False) else None
+    snapshot = patch is None or seatmap.version % SNAPSHOT_EVERY == 1 or not seatmap.revisions.exists()
+    SeatMapRevision.objects.create(
+        seatmap=seatmap,
+        version=seatmap.version,
+        kind="snapshot" if snapshot else "patch",
+        payload=data if snapshot else patch,
+        user=user,
+    )
+    seatmap.save(update_fields=["data", "updated_at"])
+    if snapshot:
+        _prune(seatmap)
+    return seatmap
+
+
+def data_at(seatmap: SeatMap, version: int) -> Any:
+    """Documento del plano en `version` (snapshot previo + parches)."""
+    if version == seatmap.version:
+        return seatmap.data
+    base = (
+        seatmap.revisions.filter(kind="snapshot", version__lte=version)
+        .order_by("-version")
+        .first()
+    )
+    if base is None:
+        raise SeatServiceError("Version not available", version=version)
+    doc = base.payload
+    for ops in (
+        seatmap.revisions.filter(version__gt=base.version, version__lte=version)
+        .order_by("version")
+        .values_list("payload", flat=True)
+    ):
+        doc = apply_patch(doc, ops)
+    return doc
@@ -0,0 +1,357 @@
+# app_seat/services.py
+"""
+Operaciones de negocio sobre asientos, retenciones y reservas.
+
+Cada operación se ejecuta en una sola transacción y con sentencias de
+conjunto (UPDATE/INSERT masivos), en lugar de encadenar llamadas CRUD.
+Los errores se señalan con SeatServiceError y subclases; `status_code`
+indica el código HTTP con el que deben exponerse.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .adjacency import find_orphans, get_adjacency, neighbourhood
+from .locks import acquire_seat_locks, shard_of
+from .models import Booking, EventSeat, Hold
+from .realtime import publish_on_commit
+
+HOLD_TTL = getattr(settings, "SEAT_HOLD_TTL", 10 * 60)
+HOLD_MAX_SEATS = getattr(settings, "SEAT_HOLD_MAX_SEATS", 500)
+# Rechaza retenciones que dejarían un asiento suelto en la fila
+HOLD_NO_ORPHANS = getattr(settings, "SEAT_HOLD_NO_ORPHANS", True)
+# Asientos liberados por pasada del barrido de retenciones vencidas
+HOLD_SWEEP_BATCH = getattr(settings, "SEAT_HOLD_SWEEP_BATCH", 5000)
+
+
+class SeatServiceError(Exception):
+    status_code = 400
+
+    def __init__(self, message: str, **extra):
+        super().__init__(message)
+        self.extra = extra
+
+
+class HoldNotFound(SeatServiceError):
+    status_code = 404
+
+
+class HoldExpired(SeatServiceError):
+    status_code = 410
+
+
+class SeatConflict(SeatServiceError):
+    status_code = 409
+
+
+class SeatNotFound(SeatServiceError):
+    status_code = 404
+
+
+class OrphanSeats(SeatServiceError):
+    """La selección dejaría asientos sueltos; `extra["seats"]` los enumera."""
+    status_code = 422
+
+
+class SeatVersionConflict(SeatConflict):
+    """La versión esperada no coincide; `extra["current"]` trae el estado actual."""
+
+
+class SeatsInUse(SeatConflict):
+    """El plano quitaría asientos retenidos o vendidos; `extra["seats"]` los enumera."""
+
+
+class IdempotencyKeyReused(SeatServiceError):
+    """La clave de idempotencia ya creó una reserva para otra retención."""
+    status_code = 409
+
+
+# ============================================================
+# Transiciones con control de concurrencia optimista
+# ============================================================
+
+SEAT_STATE_FIELDS = (
+    "id", "event_id", "seat_id", "status", "price_category_id", "price", "hold_expires_at", "version",
+)
+TRANSITION_FIELDS = {"status", "price_category", "price", "hold_expires_at"}
+SEAT_STATUSES = {value for value, _ in EventSeat.STATUS_CHOICES}
+
+
+def seat_state(event_seat_id) -> Optional[Dict]:
+    """Estado actual serializable de un EventSeat (o None si no existe)."""
+    state = EventSeat.objects.filter(pk=event_seat_id).values(*SEAT_STATE_FIELDS).first()
+    if state and state["hold_expires_at"] is not None:
+        state["hold_expires_at"] = state["hold_expires_at"].isoformat()
+    if state and state["price"] is not None:
+        state["price"] = str(state["price"])
+    return state
+
+
+def transition_seat(event_seat_id, expected_version: int, *, match: Optional[Dict] = None, **changes) -> Dict:
+    """
+    Compare-and-swap sobre un EventSeat:
+        UPDATE ... SET ..., version = version + 1 WHERE id = %s AND version = %s
+
+    Sin SELECT FOR UPDATE: en el caso sin contención es una sola sentencia.
+    Si otra escritura ganó, lanza SeatVersionConflict con el estado actual.
+    `match` añade condiciones de identidad (p. ej. {"event_id": ...}).
+    """
+    unknown = set(changes) - TRANSITION_FIELDS
+    if unknown:
+        raise SeatServiceError(f"Fields not updatable: {', '.join(sorted(unknown))}")
+    if "status" in changes and changes["status"] not in SEAT_STATUSES:
+        raise SeatServiceError(f"Invalid status '{changes['status']}'")
+
+    fields = {}
+    for name, value in changes.items():
+        fields["price_category_id" if name == "price_category" else name] = value
+    if fields.get("status") == "available":
+        fields.setdefault("hold_expires_at", None)
+
+    updated = EventSeat.objects.filter(
+        pk=event_seat_id, version=expected_version, **(match or {})
+    ).update(**fields, version=F("version") + 1, updated_at=timezone.now())
+
+    if not updated:
+        current = seat_state(event_seat_id)
+        if current is None:
+            raise SeatNotFound("Event seat not found")
+        raise SeatVersionConflict("Event seat was modified concurrently", current=current)
+
+    state = seat_state(event_seat_id)
+    if "status" in fields:
+        publish_on_commit(state["event_id"], {state["id"]: state["status"]})
+    return state
+
+
+# ============================================================
+# Retenciones
+# ============================================================
+
+def _lock_seats(event_id, seat_rows: Iterable[tuple]) -> None:
+    """seat_rows: (event_seat_id, row_id, section_id)."""
+    acquire_seat_locks(event_id, {shard_of(row_id, section_id) for _, row_id, section_id in seat_rows})
+
+
+def _seat_rows(event_id, event_seat_ids) -> list:
+    return list(
+        EventSeat.objects.filter(pk__in=event_seat_ids, event_id=event_id)
+        .values_list("pk", "seat__row_id", "seat__row__section_id")
+    )
+
+
+def create_hold(event_id, event_seat_ids: Iterable, *, user=None, ttl: Optional[int] = None) -> Hold:
+    """
+    Retiene asientos disponibles (o con retención vencida) en una transacción.
+    Serializa por advisory locks de sección/fila, sin SELECT FOR UPDATE.
+    Fila y vecinos salen del índice de adyacencia cacheado, sin consultas.
+    """
+    ids = list(dict.fromkeys(str(pk) for pk in event_seat_ids))
+    if not ids:
+        raise SeatServiceError("No seats selected")
+    if len(ids) > HOLD_MAX_SEATS:
+        raise SeatServiceError(f"At most {HOLD_MAX_SEATS} seats per hold")
+
+    index = get_adjacency(event_id)
+    missing = [sid for sid in ids if sid not in index]
+    if missing:
+        # Asientos creados con bulk_create no invalidan el índice: se reconstruye una vez
+        index = get_adjacency(event_id, refresh=True)
+        missing = [sid for sid in ids if sid not in index]
+    if missing:
+        raise SeatNotFound("Event seats not found", seats=missing)
+
+    with transaction.atomic():
+        _lock_seats(event_id, [(sid, index[sid][0], index[sid][1]) for sid in ids])
+
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=ttl or HOLD_TTL)
+        takeable = Q(status="available") | Q(status="held", hold_expires_at__lt=now)
+        if HOLD_NO_ORPHANS:
+            # Selección + 2 vecinos por lado: una sola lectura, ya con los locks tomados
+            free = {
+                str(pk) for pk in EventSeat.objects.filter(pk__in=neighbourhood(index, ids))
+                .filter(takeable).values_list("pk", flat=True)
+            }
+            orphans = find_orphans(index, set(ids), free)
+            if orphans:
+                raise OrphanSeats("Selection would leave single seats stranded", seats=orphans)
+        updated = EventSeat.objects.filter(pk__in=ids).filter(takeable).update(
+            status="held", hold_expires_at=expires_at, version=F("version") + 1, updated_at=now
+        )
+        if updated != len(ids):
+            # Se deshace el UPDATE parcial al salir del atomic
+            taken = EventSeat.objects.filter(pk__in=ids).exclude(hold_expires_at=expires_at)
+            raise SeatConflict("Some seats are not available", seats=[str(pk) for pk in taken.values_list("pk", flat=True)])
+
+        HoldSeat = Hold.seats.through
+        # Enlaces de retenciones vencidas que acabamos de reemplazar
+        HoldSeat.objects.filter(eventseat_id__in=ids).delete()
+        hold = Hold.objects.create(user=user, event_id=event_id, expires_at=expires_at)
+        HoldSeat.objects.bulk_create([HoldSeat(hold_id=hold.pk, eventseat_id=sid) for sid in ids])
+
+        publish_on_commit(event_id, {sid: "held" for sid in ids})
+    return hold
+
+
+def release_hold(hold_id, *, user=None) -> int:
+    """Libera una retención: sus asientos vuelven a 'available'. Devuelve cuántos."""
+    with transaction.atomic():
+        hold = Hold.objects.select_for_update().filter(pk=hold_id).first()
+        if hold is None:
+            raise HoldNotFound("Hold not found")
+        if user is not None and hold.user_id and hold.user_id != user.pk:
+            raise SeatServiceError("Hold belongs to another user")
+
+        ids = list(Hold.seats.through.objects.filter(hold_id=hold.pk).values_list("eventseat_id", flat=True))
+        rows = _seat_rows(hold.event_id, ids)
+        _lock_seats(hold.event_id, rows)
+
+        # Solo los asientos que siguen retenidos por esta retención
+        released = list(
+            EventSeat.objects.filter(pk__in=ids, status="held", hold_expires_at=hold.expires_at)
+            .values_list("pk", flat=True)
+        )
+        EventSeat.objects.filter(pk__in=released).update(
+            status="available", hold_expires_at=None, version=F("version") + 1, updated_at=timezone.now()
+        )
+        hold.delete()
+        publish_on_commit(hold.event_id, {sid: "available" for sid in released})
+    return len(released)
+
+
+def release_expired_holds(batch: int = HOLD_SWEEP_BATCH) -> int:
+    """
+    Devuelve a 'available' hasta `batch` asientos con la retención vencida y
+    publica el cambio, así snapshots, deltas y clientes dejan de verlos
+    retenidos. Lo llama periódicamente realtime.flush_loop. Devuelve cuántos.
+    """
+    table = connection.ops.quote_name(EventSeat._meta.db_table)
+    with transaction.atomic():
+        with connection.cursor() as cur:
+            cur.execute(
+                f"UPDATE {table} SET status = 'available', hold_expires_at = NULL, "
+                f"version = version + 1, updated_at = now() "
+                f"WHERE id IN (SELECT id FROM {table} WHERE status = 'held' AND hold_expires_at < now() "
+                f"             LIMIT %s FOR UPDATE SKIP LOCKED) "
+                f"AND status = 'held' AND hold_expires_at < now() "
+                f"RETURNING id, event_id",
+                [batch],
+            )
+            released = cur.fetchall()
+        by_event: Dict[str, Dict[str, str]] = {}
+        for seat_id, event_id in released:
+            by_event.setdefault(str(event_id), {})[str(seat_id)] = "available"
+        for event_id, changes in by_event.items():
+            publish_on_commit(event_id, changes)
+    return len(released)
+
+
+# ============================================================
+# Retención -> reserva
+# ============================================================
+
+def confirm_hold(hold_id, idempotency_key: str, *, user=None) -> Tuple[Booking, bool]:
+    """
+    Convierte una retención en una reserva confirmada en una sola transacción.
+
+    Devuelve (booking, replayed). La clave de idempotencia es por usuario: si
+    ya se usó para esta retención, devuelve la reserva original sin volver a
+    ejecutar nada; si se usó para otra, IdempotencyKeyReused (409).
+    """
+    if not idempotency_key:
+        raise SeatServiceError("Idempotency key required")
+
+    existing = _replayed_booking(hold_id, idempotency_key, user)
+    if existing is not None:
+        return existing, True
+
+    try:
+        with transaction.atomic():
+            return _confirm_hold(hold_id, idempotency_key, user)
+    except IntegrityError:
+        # Otra petición con la misma clave llegó a insertar antes
+        existing = _replayed_booking(hold_id, idempotency_key, user)
+        if existing is None:
+            raise IdempotencyKeyReused("Idempotency key was already used for another hold")
+        return existing, True
+
+
+def _replayed_booking(hold_id, idempotency_key: str, user) -> Optional[Booking]:
+    """Reserva ya creada con esta clave por este usuario (o para esta retención si no hay usuario)."""
+    bookings = Booking.objects.filter(idempotency_key=idempotency_key)
+    if user is not None:
+        bookings = bookings.filter(user=user)
+    else:
+        bookings = bookings.filter(hold_ref=str(hold_id))
+    existing = bookings.first()
+    # Las reservas anteriores a hold_ref no lo tienen: se aceptan como repetición
+    if existing is not None and existing.hold_ref and existing.hold_ref != str(hold_id):
+        raise IdempotencyKeyReused(
+            "Idempotency key was already used for another hold", booking=existing.pk,
+        )
+    return existing
+
+
+def _confirm_hold(hold_id, idempotency_key: str, user) -> Tuple[Booking, bool]:
+    now = timezone.now()
+
+    hold = Hold.objects.select_for_update().filter(pk=hold_id).first()
+    if hold is None:
+        # Un reintento concurrente pudo haberla consumido mientras esperábamos el lock
+        existing = _replayed_booking(hold_id, idempotency_key, user)
+        if existing is not None:
+            return existing, True
+        raise HoldNotFound("Hold not found")
+    if hold.expires_at <= now:
+        raise HoldExpired("Hold expired", expires_at=hold.expires_at.isoformat())
+    if user is not None and hold.user_id and hold.user_id != user.pk:
+        raise SeatServiceError("Hold belongs to another user")
+
+    seat_ids = list(
+        Hold.seats.through.objects.filter(hold_id=hold.pk).values_list("eventseat_id", flat=True)
+    )
+    if not seat_ids:
+        raise SeatServiceError("Hold has no seats")
+
+    _lock_seats(hold.event_id, _seat_rows(hold.event_id, seat_ids))
+
+    seats = EventSeat.objects.filter(pk__in=seat_ids, event_id=hold.event_id)
+    # hold_expires_at identifica los asientos que siguen siendo de esta retención
+    updated = seats.filter(status="held", hold_expires_at=hold.expires_at).update(
+        status="booked", hold_expires_at=None, version=F("version") + 1, updated_at=now
+    )
+    if updated != len(seat_ids):
+        raise SeatConflict("Some seats in the hold are no longer held")
+
+    total = seats.aggregate(
+        total=Coalesce(
+            # Precio propio del asiento (motor de precios) o el de su categoría
+            Sum(Coalesce("price", "price_category__price")),
+            Value(Decimal("0")),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        )
+    )["total"]
+
+    booking = Booking.objects.create(
+        user=user or hold.user,
+        event_id=hold.event_id,
+        total_price=total,
+        status="confirmed",
+        idempotency_key=idempotency_key,
+        hold_ref=str(hold.pk),
+    )
+    BookingSeat = Booking.seats.through
+    BookingSeat.objects.bulk_create(
+        [BookingSeat(booking_id=booking.pk, eventseat_id=sid) for sid in seat_ids]
+    )
+    hold.delete()
+
+    publish_on_commit(hold.event_id, {sid: "booked" for sid in seat_ids})
+    return booking, False
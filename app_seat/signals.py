@@ -0,0 +1,46 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .models import Event, EventSeat
+from .adjacency import invalidate_adjacency
+from .availability import invalidate_manifest
+from .partitions import ensure_event_partition
+from .realtime import publish_on_commit
+
+
+@receiver(post_init, sender=EventSeat)
+def remember_event_seat_status(sender, instance, **kwargs):
+    # Sin tocar el descriptor: si 'status' está diferido no dispara una query
+    instance._loaded_status = instance.__dict__.get("status")
+
+
+@receiver(post_save, sender=EventSeat)
+def broadcast_event_seat_status(sender, instance, created, **kwargs):
+    """
+    Difunde el nuevo estado del asiento a la sala del evento.
+    Las actualizaciones masivas (queryset.update) no pasan por aquí:
+    quien las haga debe llamar a publish_on_commit explícitamente.
+    """
+    if created:
+        invalidate_manifest(instance.event_id)
+        invalidate_adjacency([instance.event_id])
+    status = instance.__dict__.get("status")
+    if status is None:
+        return
+    if not created and status == getattr(instance, "_loaded_status", None):
+        return
+    instance._loaded_status = status
+    publish_on_commit(instance.event_id, {instance.pk: status})
+
+
+@receiver(post_delete, sender=EventSeat)
+def drop_event_seat_manifest(sender, instance, **kwargs):
+    invalidate_manifest(instance.event_id)
+    invalidate_adjacency([instance.event_id])
+
+
+@receiver(post_save, sender=Event)
+def create_event_seat_partition(sender, instance, created, **kwargs):
+    # No hace nada mientras EventSeat no esté particionada
+    if created:
+        ensure_event_partition(instance.pk)
@@ -0,0 +1,149 @@
+# app_seat/spatial.py
+"""
+Índice espacial (rejilla uniforme) de los asientos de un recinto.
+
+Seat.x / Seat.y guardan el centro de cada butaca en coordenadas del canvas
+(las fija la sincronización del plano). Con ellos se construye, una vez por
+recinto y en caché, una rejilla de celdas de CELL_SIZE unidades: los puntos
+se ordenan por celda (fila de celdas mayor, columna menor) y cada consulta
+solo mira el tramo contiguo de cada fila de celdas que toca.
+
+- `in_polygon()`: asientos dentro de un polígono (selección con lazo).
+- `nearest()`: los k asientos más cercanos a un punto (clic en el plano).
+"""
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Seat
+
+SPATIAL_TTL = getattr(settings, "SEAT_SPATIAL_TTL", 60 * 60)
+CELL_SIZE = float(getattr(settings, "SEAT_SPATIAL_CELL_SIZE", 64.0))
+
+
+def _spatial_key(venue_id) -> str:
+    return f"seat-spatial:{venue_id}"
+
+
+def invalidate_spatial(venue_id) -> None:
+    cache.delete(_spatial_key(venue_id))
+
+
+@dataclass
+class SpatialIndex:
+    ids: np.ndarray      # pks de Seat, ordenados por celda
+    x: np.ndarray
+    y: np.ndarray
+    cells: np.ndarray    # celda de cada punto (gy * width + gx), ascendente
+    origin: Tuple[float, float]
+    cell: float
+    width: int
+    height: int
+
+    @classmethod
+    def build(cls, ids: Sequence[str], x: Sequence[float], y: Sequence[float], cell: float = CELL_SIZE) -> "SpatialIndex":
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        origin = (float(x.min()), float(y.min())) if len(x) else (0.0, 0.0)
+        gx = ((x - origin[0]) // cell).astype(np.int64)
+        gy = ((y - origin[1]) // cell).astype(np.int64)
+        width = int(gx.max()) + 1 if len(x) else 1
+        height = int(gy.max()) + 1 if len(y) else 1
+        cells = gy * width + gx
+        order = np.argsort(cells, kind="stable")
+        return cls(
+            ids=np.asarray(ids, dtype=object)[order],
+            x=x[order],
+            y=y[order],
+            cells=cells[order],
+            origin=origin,
+            cell=cell,
+            width=width,
+            height=height,
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _grid(self, value: float, axis: int) -> int:
+        return int((value - self.origin[axis]) // self.cell)
+
+    def candidates(self, x0: float, y0: float, x1: float, y1: float) -> np.ndarray:
+        """Índices de los puntos en las celdas que cubren el rectángulo."""
+        gx0 = max(self._grid(x0, 0), 0)
+        gx1 = min(self._grid(x1, 0), self.width - 1)
+        gy0 = max(self._grid(y0, 1), 0)
+        gy1 = min(self._grid(y1, 1), self.height - 1)
+        if gx0 > gx1 or gy0 > gy1:
+            return np.empty(0, dtype=np.int64)
+        base = np.arange(gy0, gy1 + 1, dtype=np.int64) * self.width
+        starts = np.searchsorted(self.cells, base + gx0, side="left")
+        ends = np.searchsorted(self.cells, base + gx1, side="right")
+        if not len(starts):
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+
+    def in_polygon(self, polygon: Sequence[Sequence[float]]) -> List[str]:
+        """Pks de los asientos cuyo centro cae dentro del polígono (par-impar)."""
+        poly = np.asarray(polygon, dtype=np.float64)
+        if poly.ndim != 2 or poly.shape[0] < 3 or poly.shape[1] != 2:
+            raise ValueError("Polygon needs at least 3 [x, y] points")
+        idx = self.candidates(poly[:, 0].min(), poly[:, 1].min(), poly[:, 0].max(), poly[:, 1].max())
+        if not len(idx):
+            return []
+        px, py = self.x[idx], self.y[idx]
+        inside = np.zeros(len(idx), dtype=bool)
+        xj, yj = poly[-1]
+        for xi, yi in poly:
+            crosses = (yi > py) != (yj > py)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                at = (xj - xi) * (py - yi) / (yj - yi) + xi
+            inside ^= crosses & (px < at)
+            xj, yj = xi, yi
+        return self.ids[idx[inside]].tolist()
+
+    def nearest(self, x: float, y: float, k: int = 1,
+                max_distance: Optional[float] = None) -> List[Tuple[str, float]]:
+        """
+        Los `k` asientos más cercanos a (x, y) como [(pk, distancia), ...].
+        Amplía el cuadrado de búsqueda celda a celda hasta que los k mejores
+        quedan más cerca que el borde no explorado.
+        """
+        if not len(self.ids) or k < 1:
+            return []
+        limit = max_distance if max_distance is not None else np.inf
+        # Desde el borde de la rejilla si el punto cae fuera; después se duplica
+        outside = max(
+            self.origin[0] - x, x - self.origin[0] - self.width * self.cell,
+            self.origin[1] - y, y - self.origin[1] - self.height * self.cell, 0.0,
+        )
+        half = outside + self.cell
+        while True:
+            idx = self.candidates(x - half, y - half, x + half, y + half)
+            dist = np.hypot(self.x[idx] - x, self.y[idx] - y)
+            # Lo no explorado está a más de `half` del punto
+            if len(idx) == len(self.ids) or half >= limit or np.count_nonzero(dist <= half) >= k:
+                break
+            half *= 2
+        keep = dist <= limit
+        idx, dist = idx[keep], dist[keep]
+        best = np.argsort(dist, kind="stable")[:k]
+        return [(self.ids[idx[i]], float(dist[i])) for i in best]
+
+
+def get_spatial_index(venue_id) -> SpatialIndex:
+    """Índice del recinto (cacheado hasta la próxima sincronización del plano)."""
+    index = cache.get(_spatial_key(venue_id))
+    if index is not None:
+        return index
+    rows = list(
+        Seat.objects.filter(row__section__venue_id=venue_id, x__isnull=False, y__isnull=False)
+        .order_by()
+        .values_list("pk", "x", "y")
+    )
+    index = SpatialIndex.build([r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows])
+    cache.set(_spatial_key(venue_id), index, SPATIAL_TTL)
+    return index
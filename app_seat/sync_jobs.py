@@ -0,0 +1,175 @@
+# app_seat/sync_jobs.py
+"""
+Cola (en base de datos) de sincronizaciones plano -> Section/Row/Seat.
+
+Guardar el plano persiste el JSON y llama a `enqueue_sync()`, que deja un
+SeatMapSyncJob en cola por recinto: si ya hay uno esperando, el guardado se
+acumula en él en lugar de crear otro. El worker
+(`manage.py run_seatmap_sync_worker`) reclama trabajos con
+SELECT ... FOR UPDATE SKIP LOCKED y ejecuta `_sync_canvas_to_models` con la
+última versión del plano, bloqueando la fila del recinto para que dos
+workers no sincronicen el mismo recinto a la vez. `sync_now()` hace lo
+mismo dentro de la petición. Las teselas son del plano publicado
+(app_seat.publishing), no del diseño: la sincronización no las toca.
+
+El progreso de un trabajo en marcha vive en la caché (la transacción de la
+sincronización no es visible hasta el commit); `job_status()` lo combina
+con la fila del trabajo.
+"""
+import logging
+from datetime import timedelta
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import SeatMap, SeatMapSyncJob, Venue
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_TTL = 60 * 60
+# Trabajos "running" sin terminar tras este tiempo se consideran de un worker caído
+STALE_AFTER = getattr(settings, "SEAT_MAP_SYNC_STALE_AFTER", 15 * 60)
+MAX_ATTEMPTS = getattr(settings, "SEAT_MAP_SYNC_MAX_ATTEMPTS", 3)
+
+
+def _progress_key(job_id) -> str:
+    return f"seatmap-sync:{job_id}"
+
+
+def enqueue_sync(seatmap: SeatMap) -> SeatMapSyncJob:
+    """
+    Encola (o acumula en el trabajo en cola del recinto) la sincronización
+    de `seatmap`. Llamar dentro de la transacción del guardado: el trabajo
+    solo es visible para el worker tras el commit.
+    """
+    with transaction.atomic():
+        job = (
+            SeatMapSyncJob.objects.select_for_update()
+            .filter(venue_id=seatmap.venue_id, status="queued")
+            .first()
+        )
+        if job is not None:
+            job.seatmap = seatmap
+            job.seatmap_version = seatmap.version
+            job.saves = F("saves") + 1
+            job.save(update_fields=["seatmap", "seatmap_version", "saves", "updated_at"])
+            job.refresh_from_db(fields=["saves"])
+            return job
+        return SeatMapSyncJob.objects.create(
+            venue_id=seatmap.venue_id,
+            seatmap=seatmap,
+            seatmap_version=seatmap.version,
+        )
+
+
+def requeue_stale() -> int:
+    """Devuelve a la cola (o da por fallidos) los trabajos de workers caídos."""
+    cutoff = timezone.now() - timedelta(seconds=STALE_AFTER)
+    count = 0
+    with transaction.atomic():
+        for job in SeatMapSyncJob.objects.select_for_update(skip_locked=True).filter(
+            status="running", started_at__lt=cutoff
+        ):
+            superseded = SeatMapSyncJob.objects.filter(venue_id=job.venue_id, status="queued").exists()
+            if superseded or job.attempts >= MAX_ATTEMPTS:
+                job.status = "failed"
+                job.error = "Worker lost" + (" (superseded by a newer save)" if superseded else "")
+                job.finished_at = timezone.now()
+            else:
+                job.status = "queued"
+            job.save(update_fields=["status", "error", "finished_at", "updated_at"])
+            count += 1
+    return count
+
+
+def claim_job() -> Optional[SeatMapSyncJob]:
+    """Reclama el trabajo en cola más antiguo de un recinto que no se esté sincronizando."""
+    busy = SeatMapSyncJob.objects.filter(status="running").values("venue_id")
+    with transaction.atomic():
+        job = (
+            SeatMapSyncJob.objects.select_for_update(skip_locked=True)
+            .filter(status="queued")
+            .exclude(venue_id__in=busy)
+            .order_by("created_at")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = "running"
+        job.progress = 0
+        job.stage = ""
+        job.attempts += 1
+        job.started_at = timezone.now()
+        job.save(update_fields=["status", "progress", "stage", "attempts", "started_at", "updated_at"])
+    return job
+
+
+def run_job(job: SeatMapSyncJob) -> SeatMapSyncJob:
+    """Ejecuta la sincronización del trabajo (ya reclamado) y registra el resultado."""
+    from .views import _sync_canvas_to_models
+
+    def report(percent: int, stage: str) -> None:
+        cache.set(_progress_key(job.pk), {"progress": percent, "stage": stage}, PROGRESS_TTL)
+
+    try:
+        with transaction.atomic():
+            venue = Venue.objects.select_for_update().get(pk=job.venue_id)
+            # La última versión: los guardados acumulados mientras esperaba van incluidos
+            seatmap = SeatMap.objects.get(pk=job.seatmap_id)
+            _sync_canvas_to_models(venue, seatmap.data, progress=report)
+        job.status, job.progress, job.stage, job.error = "done", 100, "done", ""
+        job.seatmap_version = seatmap.version
+    except Exception as exc:
+        logger.exception("Falló la sincronización del plano del recinto %s", job.venue_id)
+        job.status, job.error = "failed", str(exc) or exc.__class__.__name__
+    finally:
+        cache.delete(_progress_key(job.pk))
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "progress", "stage", "error", "seatmap_version", "finished_at", "updated_at"])
+    return job
+
+
+def sync_now(seatmap: SeatMap) -> SeatMapSyncJob:
+    """
+    Sincroniza `seatmap` en la propia petición, sin pasar por la cola (p. ej.
+    planos generados, ver app_seat.generator). Queda registrado como un
+    trabajo más, así que el estado de sincronización del recinto lo refleja.
+    """
+    job = SeatMapSyncJob.objects.create(
+        venue_id=seatmap.venue_id,
+        seatmap=seatmap,
+        seatmap_version=seatmap.version,
+        status="running",
+        attempts=1,
+        started_at=timezone.now(),
+    )
+    return run_job(job)
+
+
+def run_next() -> Optional[SeatMapSyncJob]:
+    job = claim_job()
+    return run_job(job) if job is not None else None
+
+
+def job_status(job: SeatMapSyncJob) -> Dict:
+    """Estado serializable del trabajo, con el progreso en vivo si está en marcha."""
+    progress, stage = job.progress, job.stage
+    if job.status == "running":
+        live = cache.get(_progress_key(job.pk)) or {}
+        progress, stage = live.get("progress", progress), live.get("stage", stage)
+    return {
+        "id": job.pk,
+        "status": job.status,
+        "progress": progress,
+        "stage": stage,
+        "seatmap_version": job.seatmap_version,
+        "saves": job.saves,
+        "error": job.error or None,
+        "queued_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
@@ -1,3 +1,588 @@
-from django.test import TestCase
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from . import allocation, json_body, seatmap_history, tiles
+from .adjacency import find_orphans
+from .availability import pack_statuses, status_code, unpack_statuses
+from .clustering import assign_rows, cluster_rows
+from .generator import GeneratorError, generate_section, merge_generated, row_labels, seat_numbers
+from .json_body import BodyTooLarge, JSONBodyError, parse_json_stream
+from .models import Booking, Event, EventSeat, Hold, PriceCategory, PriceRule, Row, Seat, SeatMap, Section, Venue
+from .price_rules import InvalidPriceRules, compile_rules
+from .pricing import DEFAULT_RULES, compute_prices
+from .seatmap_history import PatchError, VersionConflict, apply_patch, data_at, save_seatmap
+from .services import HoldExpired, SeatConflict, confirm_hold
+from .spatial import SpatialIndex
+from .validation import overlapping_pairs, validate_seatmap
+
+
+class _Chunks:
+    """Stream que entrega el cuerpo en los trozos indicados."""
+
+    def __init__(self, *parts: bytes):
+        self.parts = list(parts)
+
+    def read(self, size: int = -1) -> bytes:
+        return self.parts.pop(0) if self.parts else b""
+
+
+class JSONBodyStreamTests(SimpleTestCase):
+    def test_every_split_point(self):
+        body = json.dumps({
+            "base_version": 3,
+            "patch": [{"op": "add", "path": "/fabric/objects/-",
+                       "value": {"left": 123.45, "top": -1.5e-3, "n": 1234567, "ok": True, "x": None,
+                                 "number": "ñ12"}}],
+        }, ensure_ascii=False).encode("utf-8")
+        expected = json.loads(body)
+        for cut in range(1, len(body)):
+            with self.subTest(cut=cut):
+                self.assertEqual(parse_json_stream(_Chunks(body[:cut], body[cut:])), expected)
+
+    def test_small_chunks_at_every_offset(self):
+        doc = {"data": {"fabric": {"objects": [
+            {"type": "circle", "left": i * 24.125, "top": 10.5, "radius": 10, "id": f"seat-{i}"}
+            for i in range(200)
+        ]}}}
+        raw = json.dumps(doc).encode("utf-8")
+        with mock.patch.object(json_body, "CHUNK_SIZE", 7):
+            for offset in range(8):
+                with self.subTest(offset=offset):
+                    self.assertEqual(parse_json_stream(io.BytesIO(b" " * offset + raw)), doc)
+
+    def test_error_reports_position(self):
+        with self.assertRaises(JSONBodyError) as ctx:
+            parse_json_stream(io.BytesIO(b'{"a":\n[1,2 3]}'))
+        self.assertEqual(ctx.exception.extra, {"line": 2, "column": 6, "position": 11})
+
+    def test_trailing_data_and_bad_utf8(self):
+        for body in (b'{"a":1} x', b'{"a":"\xff"}', b'{"a":', b'{"a":1,}'):
+            with self.subTest(body=body), self.assertRaises(JSONBodyError):
+                parse_json_stream(io.BytesIO(body))
+
+    def test_size_limit(self):
+        with self.assertRaises(BodyTooLarge):
+            parse_json_stream(io.BytesIO(b'{"a":"' + b"x" * 1000 + b'"}'), limit=100)
+
+
+class ProtectedSeatValidationTests(SimpleTestCase):
+    def _doc(self, *seats):
+        section = {"type": "polygon", "kind": "section", "section_key": "a", "section_name": "A",
+                   "points": [{"x": 0, "y": 0}, {"x": 200, "y": 0}, {"x": 200, "y": 100}, {"x": 0, "y": 100}]}
+        return {"fabric": {"objects": [section, *(
+            {"type": "circle", "kind": "seat", "section_key": "a", "left": 10 + 30 * i, "top": 10,
+             "radius": 10, "id": seat_id, "number": str(i + 1), "row_name": "A"}
+            for i, seat_id in enumerate(seats)
+        )]}}
+
+    def test_removing_a_protected_seat_is_an_error(self):
+        protected = [{"canvas_id": "s2", "section": "A", "row": "A", "number": "2"}]
+        report = validate_seatmap(self._doc("s1"), protected=protected)
+        self.assertEqual([e["code"] for e in report["errors"]], ["seat_in_use"])
+
+    def test_protected_seat_kept_by_id_or_number(self):
+        protected = [{"canvas_id": "s2", "section": "A", "row": "A", "number": "2"}]
+        self.assertEqual(validate_seatmap(self._doc("s1", "s2"), protected=protected)["errors"], [])
+        self.assertEqual(validate_seatmap(self._doc("x1", "x2"), protected=protected)["errors"], [])
+
+
+class OverlappingPairsTests(SimpleTestCase):
+    def test_matches_brute_force_with_oversized_circles(self):
+        rng = np.random.default_rng(7)
+        x, y = rng.uniform(0, 500, 300), rng.uniform(0, 300, 300)
+        r = np.where(rng.random(300) < 0.05, rng.uniform(20, 120, 300), rng.uniform(5, 12, 300))
+        expected = {
+            (i, j) for i in range(300) for j in range(i + 1, 300)
+            if np.hypot(x[i] - x[j], y[i] - y[j]) < (r[i] + r[j]) * 0.9
+        }
+        got = overlapping_pairs(x, y, r, 0.9)
+        self.assertEqual({tuple(p) for p in got.tolist()}, expected)
+        self.assertEqual(len(got), len(expected))
+
+    def test_limit_stops_on_stacked_seats(self):
+        x = y = np.zeros(5000)
+        self.assertEqual(len(overlapping_pairs(x, y, np.full(5000, 10.0), limit=10)), 10)
+
+
+class StraightRowClusteringTests(SimpleTestCase):
+    def test_half_row_offset_stays_one_row(self):
+        points = [{"cx": 10 + 24 * i, "cy": 10 + (9 if i >= 10 else 0)} for i in range(20)]
+        self.assertEqual(len(cluster_rows(points, 15.6)), 1)
+
+    def test_sloped_rows_do_not_chain(self):
+        points = [{"cx": 10 + 24 * i, "cy": 10 + 26 * j + 0.6 * i} for j in range(8) for i in range(30)]
+        rows = cluster_rows(points, 15.6)
+        self.assertEqual([len(row["items"]) for row in rows], [30] * 8)
+
+
+class ApplyPatchTests(SimpleTestCase):
+    def test_every_operation(self):
+        doc = {"a": 1, "items": [1, 2], "nested": {"x": "y"}}
+        ops = [
+            {"op": "add", "path": "/items/-", "value": 3},
+            {"op": "add", "path": "/items/0", "value": 0},
+            {"op": "remove", "path": "/a"},
+            {"op": "replace", "path": "/nested/x", "value": "z"},
+            {"op": "copy", "from": "/nested", "path": "/copied"},
+            {"op": "move", "from": "/items/3", "path": "/last"},
+            {"op": "test", "path": "/items", "value": [0, 1, 2]},
+        ]
+        self.assertEqual(apply_patch(doc, ops), {
+            "items": [0, 1, 2], "nested": {"x": "z"}, "copied": {"x": "z"}, "last": 3,
+        })
+        self.assertEqual(doc, {"a": 1, "items": [1, 2], "nested": {"x": "y"}})
+
+    def test_pointer_escapes(self):
+        doc = {"a/b": 1, "m~n": 2}
+        ops = [{"op": "replace", "path": "/a~1b", "value": 10}, {"op": "remove", "path": "/m~0n"}]
+        self.assertEqual(apply_patch(doc, ops), {"a/b": 10})
+
+    def test_move_into_itself_is_rejected(self):
+        with self.assertRaises(PatchError):
+            apply_patch({"a": {"b": {}}}, [{"op": "move", "from": "/a", "path": "/a/b/c"}])
+
+    def test_failed_test_leaves_document_unchanged(self):
+        doc = {"a": 1, "items": []}
+        with self.assertRaises(PatchError):
+            apply_patch(doc, [
+                {"op": "add", "path": "/items/-", "value": 1},
+                {"op": "test", "path": "/a", "value": 2},
+            ])
+        self.assertEqual(doc, {"a": 1, "items": []})
+
+    def test_invalid_operations(self):
+        for ops in (
+            [{"op": "add", "path": "/items/5", "value": 1}],
+            [{"op": "add", "path": "/items/01", "value": 1}],
+            [{"op": "remove", "path": "/missing"}],
+            [{"op": "replace", "path": "/a"}],
+            [{"op": "frobnicate", "path": "/a"}],
+            [{"op": "remove", "path": ""}],
+            {"op": "add"},
+        ):
+            with self.subTest(ops=ops), self.assertRaises(PatchError):
+                apply_patch({"a": 1, "items": []}, ops)
+
+
+class SeatMapHistoryTests(TestCase):
+    def setUp(self):
+        venue = Venue.objects.create(name="Teatro", slug="teatro")
+        self.seatmap = SeatMap.objects.create(venue=venue, name="Principal")
+
+    def _patch(self, *ops):
+        return save_seatmap(self.seatmap, base_version=self.seatmap.version, patch=list(ops))
+
+    def test_stale_base_version_conflicts(self):
+        self.seatmap = save_seatmap(self.seatmap, base_version=None, data={"items": []})
+        self.seatmap = self._patch({"op": "add", "path": "/items/-", "value": 1})
+        with self.assertRaises(VersionConflict) as ctx:
+            save_seatmap(self.seatmap, base_version=1, patch=[{"op": "add", "path": "/items/-", "value": 2}])
+        self.assertEqual(ctx.exception.status_code, 409)
+        self.assertEqual(ctx.exception.extra["version"], 2)
+        self.seatmap.refresh_from_db()
+        self.assertEqual(self.seatmap.data, {"items": [1]})
+
+    def test_data_at_rebuilds_patch_versions(self):
+        self.seatmap = save_seatmap(self.seatmap, base_version=None, data={"a": 1, "items": []})
+        self.seatmap = self._patch({"op": "add", "path": "/items/-", "value": 1})
+        self.seatmap = self._patch({"op": "replace", "path": "/a", "value": 2})
+        kinds = dict(self.seatmap.revisions.values_list("version", "kind"))
+        self.assertEqual(kinds, {1: "snapshot", 2: "patch", 3: "patch"})
+        self.assertEqual(data_at(self.seatmap, 1), {"a": 1, "items": []})
+        self.assertEqual(data_at(self.seatmap, 2), {"a": 1, "items": [1]})
+        self.assertEqual(data_at(self.seatmap, 3), {"a": 2, "items": [1]})
+
+    def test_prune_keeps_latest_snapshots(self):
+        with mock.patch.object(seatmap_history, "KEEP_SNAPSHOTS", 2):
+            for i in range(3):
+                self.seatmap = save_seatmap(self.seatmap, base_version=self.seatmap.version, data={"n": i})
+                self.seatmap = self._patch({"op": "add", "path": "/p", "value": i})
+        # Snapshots en v1, v3 y v5: se conserva desde v3
+        versions = sorted(self.seatmap.revisions.values_list("version", flat=True))
+        self.assertEqual(versions, [3, 4, 5, 6])
+        self.assertEqual(data_at(self.seatmap, 4), {"n": 1, "p": 1})
+
+
+class GeneratorLabelTests(SimpleTestCase):
+    def test_row_labels_skip_and_rollover(self):
+        self.assertEqual(row_labels(4, first=7, skip=["i"]), ["G", "H", "J", "K"])
+        self.assertEqual(row_labels(3, first=26), ["Z", "AA", "AB"])
+        self.assertEqual(row_labels(3, "numbers", skip=["2"]), ["1", "3", "4"])
+
+    def test_seat_numbers(self):
+        cases = [
+            (("sequential", "ltr"), [1, 2, 3, 4, 5]),
+            (("sequential", "rtl"), [5, 4, 3, 2, 1]),
+            (("odd", "ltr"), [1, 3, 5, 7, 9]),
+            (("even", "rtl"), [10, 8, 6, 4, 2]),
+            (("center_out", "ltr"), [4, 2, 1, 3, 5]),
+            (("center_out", "rtl"), [5, 3, 1, 2, 4]),
+        ]
+        for args, expected in cases:
+            with self.subTest(args=args):
+                self.assertEqual(seat_numbers(5, *args).tolist(), expected)
+        self.assertEqual(seat_numbers(3, "sequential", "ltr", 101).tolist(), [101, 102, 103])
+
+
+class GeneratorGeometryTests(SimpleTestCase):
+    def _points(self, generated):
+        return [
+            {"cx": s["left"] + s["radius"], "cy": s["top"] + s["radius"], "number": s["number"],
+             "row": s["row_name"], "row_index": s["row_index"]}
+            for s in generated["seats"]
+        ]
+
+    def test_arc_rejections(self):
+        with self.assertRaises(GeneratorError) as ctx:
+            generate_section({"name": "A", "layout": "arc", "rows": 2, "start_angle": 0, "end_angle": 200})
+        self.assertEqual(ctx.exception.extra["field"], "end_angle")
+        with self.assertRaises(GeneratorError) as ctx:
+            generate_section({"name": "A", "layout": "arc", "rows": 2, "seats": 100, "radius": 200})
+        self.assertEqual(ctx.exception.extra["field"], "seats")
+
+    def test_generated_rows_survive_the_sync_grouping(self):
+        specs = [
+            {"name": "Platea", "rows": 6, "seats": 12, "angle": 15, "numbering": "center_out"},
+            {"name": "Anfiteatro", "layout": "arc", "rows": 5, "seats": 10, "seats_increment": 2, "radius": 300},
+            {"name": "Grada", "layout": "rake", "rows": 4, "seats": 8, "seats_increment": 1, "direction": "rtl"},
+        ]
+        for spec in specs:
+            with self.subTest(section=spec["name"]):
+                generated = generate_section(spec)
+                expected = [
+                    (row["name"], [seat["number"] for seat in row["seats"]]) for row in generated["model"]["rows"]
+                ]
+                points = self._points(generated)
+                rows = assign_rows(points[::-1], 15.6)
+                self.assertEqual([(name, [p["number"] for p in items]) for name, items in rows], expected)
+
+    def test_straight_rows_cluster_without_labels(self):
+        generated = generate_section({"name": "Platea", "rows": 5, "seats": 10})
+        points = [{**p, "row": None} for p in self._points(generated)]
+        rows = cluster_rows(points, 15.6)
+        self.assertEqual(
+            [[p["number"] for p in row["items"]] for row in rows],
+            [[seat["number"] for seat in row["seats"]] for row in generated["model"]["rows"]],
+        )
+
+
+class MergeGeneratedTests(SimpleTestCase):
+    def test_same_name_section_is_replaced_keeping_its_key(self):
+        data = {
+            "ui": {"gapX": 24, "gapY": 26},
+            "fabric": {"objects": [
+                {"kind": "section", "section_name": "A", "section_key": "a-key", "section_order": 1},
+                {"kind": "seat", "type": "circle", "section_key": "a-key", "id": "old"},
+                {"kind": "section", "section_name": "B", "section_key": "b-key", "section_order": 2},
+                {"kind": "seat", "type": "circle", "section_key": "b-key", "id": "kept"},
+            ]},
+            "sections": [{"name": "A", "key": "a-key"}, {"name": "B", "key": "b-key"}],
+        }
+        doc, summary = merge_generated(data, [{"name": "A", "rows": 2, "seats": 3}])
+        objects = doc["fabric"]["objects"]
+        self.assertEqual(summary, [{"name": "A", "key": "a-key", "rows": 2, "seats": 6}])
+        self.assertNotIn("old", [o.get("id") for o in objects])
+        self.assertIn("kept", [o.get("id") for o in objects])
+        self.assertEqual(
+            [o["section_key"] for o in objects if o["kind"] == "section"], ["b-key", "a-key"]
+        )
+        self.assertEqual(sum(o["kind"] == "seat" and o["section_key"] == "a-key" for o in objects), 6)
+        self.assertEqual([s["name"] for s in doc["sections"]], ["B", "A"])
+        # Con replace solo queda lo generado, pero con la clave de la sección existente
+        doc, summary = merge_generated(data, [{"name": "A", "rows": 1, "seats": 2}], replace=True)
+        self.assertEqual(summary[0]["key"], "a-key")
+        self.assertEqual({o["section_key"] for o in doc["fabric"]["objects"]}, {"a-key"})
+
+
+class ConfirmHoldTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.buyer = User.objects.create_user("buyer@example.com", "secret")
+        self.other = User.objects.create_user("other@example.com", "secret")
+        venue = Venue.objects.create(name="Teatro", slug="teatro")
+        row = Row.objects.create(section=Section.objects.create(venue=venue, name="Platea"), name="A")
+        self.event = Event.objects.create(
+            name="Concierto", slug="concierto", venue=venue,
+            seatmap=SeatMap.objects.create(venue=venue, name="Principal"),
+            start_datetime=timezone.now() + timedelta(days=1),
+        )
+        category = PriceCategory.objects.create(event=self.event, name="General", price=Decimal("20.00"))
+        self.seats = [
+            EventSeat.objects.create(
+                event=self.event, seat=Seat.objects.create(row=row, number=str(i)), price_category=category
+            )
+            for i in range(1, 5)
+        ]
+
+    def _hold(self, seats, user, expires_in=600):
+        expires_at = timezone.now() + timedelta(seconds=expires_in)
+        hold = Hold.objects.create(user=user, event=self.event, expires_at=expires_at)
+        hold.seats.set(seats)
+        EventSeat.objects.filter(pk__in=[s.pk for s in seats]).update(status="held", hold_expires_at=expires_at)
+        return hold
+
+    def _statuses(self):
+        return list(EventSeat.objects.filter(pk__in=[s.pk for s in self.seats]).order_by("seat__number")
+                    .values_list("status", flat=True))
+
+    def test_retry_with_same_key_replays(self):
+        hold = self._hold(self.seats[:2], self.buyer)
+        booking, replayed = confirm_hold(hold.pk, "key-1", user=self.buyer)
+        self.assertFalse(replayed)
+        self.assertEqual(booking.total_price, Decimal("40.00"))
+        self.assertEqual(self._statuses(), ["booked", "booked", "available", "available"])
+        with self.assertNumQueries(1):
+            again, replayed = confirm_hold(hold.pk, "key-1", user=self.buyer)
+        self.assertTrue(replayed)
+        self.assertEqual(str(again.pk), str(booking.pk))
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_same_key_from_another_user_books_separately(self):
+        first, _ = confirm_hold(self._hold(self.seats[:1], self.buyer).pk, "shared", user=self.buyer)
+        second, replayed = confirm_hold(self._hold(self.seats[1:2], self.other).pk, "shared", user=self.other)
+        self.assertFalse(replayed)
+        self.assertNotEqual(str(second.pk), str(first.pk))
+        self.assertEqual(second.user, self.other)
+
+    def test_seat_price_overrides_category(self):
+        EventSeat.objects.filter(pk=self.seats[0].pk).update(price=Decimal("55.50"))
+        booking, _ = confirm_hold(self._hold(self.seats[:2], self.buyer).pk, "key-1", user=self.buyer)
+        self.assertEqual(booking.total_price, Decimal("75.50"))
+
+    def test_expired_hold_books_nothing(self):
+        hold = self._hold(self.seats[:2], self.buyer, expires_in=-1)
+        with self.assertRaises(HoldExpired):
+            confirm_hold(hold.pk, "key-1", user=self.buyer)
+        self.assertFalse(Booking.objects.exists())
+        self.assertEqual(self._statuses(), ["held", "held", "available", "available"])
+
+    def test_partly_taken_hold_books_nothing(self):
+        hold = self._hold(self.seats[:3], self.buyer)
+        # Un asiento vencido y retomado por otra retención ya no es de esta
+        EventSeat.objects.filter(pk=self.seats[1].pk).update(hold_expires_at=timezone.now() + timedelta(hours=1))
+        with self.assertRaises(SeatConflict):
+            confirm_hold(hold.pk, "key-1", user=self.buyer)
+        self.assertFalse(Booking.objects.exists())
+        self.assertEqual(self._statuses(), ["held", "held", "held", "available"])
+        self.assertTrue(Hold.objects.filter(pk=hold.pk).exists())
+
+
+class FindBlockTests(SimpleTestCase):
+    """find_block sobre un índice de adyacencia construido a mano: {fila: número de asientos}."""
+
+    def _venue(self, rows):
+        self.index, self.rows = {}, {}
+        for row_id, count in rows.items():
+            ids = [f"{row_id}-{i}" for i in range(count)]
+            self.rows[row_id] = ids
+            for i, sid in enumerate(ids):
+                left = ids[i - 1] if i else None
+                right = ids[i + 1] if i + 1 < count else None
+                self.index[sid] = (row_id, "S", left, right)
+        row_model = mock.Mock()
+        row_model.objects.filter.return_value.values_list.return_value = [
+            (row_id, order, row_id) for order, row_id in enumerate(rows)
+        ]
+        for target, value in (("get_adjacency", lambda event_id: self.index), ("Row", row_model)):
+            patcher = mock.patch.object(allocation, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _find(self, size, free, types=None, **kwargs):
+        types = types or {}
+
+        def free_seats(event_id, sections, seat_types):
+            return {sid for sid in free if not seat_types or types.get(sid, "standard") in seat_types}
+
+        with mock.patch.object(allocation, "_free_seats", free_seats):
+            return allocation.find_block("event", size, **kwargs)
+
+    def _assert_contiguous(self, seats):
+        for row_id, ids in self.rows.items():
+            positions = sorted(ids.index(sid) for sid in seats if sid in ids)
+            if positions:
+                self.assertEqual(positions, list(range(positions[0], positions[-1] + 1)))
+
+    def test_block_spans_contiguous_rows(self):
+        self._venue({"A": 6, "B": 6, "C": 6})
+        block = self._find(8, set(self.index))
+        self.assertEqual((len(block["seats"]), block["rows"]), (8, 2))
+        self.assertEqual({self.index[sid][0] for sid in block["seats"]}, {"A", "B"})
+        self._assert_contiguous(block["seats"])
+
+    def test_block_leaves_no_single_seat(self):
+        self._venue({"A": 5, "B": 6})
+        free = set(self.index) - {"A-0"}
+        block = self._find(3, free)
+        self.assertEqual(len(block["seats"]), 3)
+        self._assert_contiguous(block["seats"])
+        self.assertEqual(find_orphans(self.index, set(block["seats"]), free), [])
+        # Con una sola fila de 4 libres no hay bloque de 3 sin dejar un asiento suelto
+        self._venue({"A": 5})
+        self.assertIsNone(self._find(3, set(self.index) - {"A-0"}))
+
+    def test_seat_type_filter_keeps_other_types_in_the_gap_rule(self):
+        self._venue({"A": 6})
+        types = {sid: "vip" for sid in self.index}
+        types["A-0"] = "standard"
+        block = self._find(3, set(self.index), types, seat_types=["vip"])
+        self.assertEqual(block["seats"], ["A-3", "A-4", "A-5"])
+        self.assertIsNone(self._find(6, set(self.index), types, seat_types=["vip"]))
+
+
+class CompileRulesTests(SimpleTestCase):
+    def setUp(self):
+        self.venue = Venue(pk="v1")
+        self.event = Event(pk="e1", venue=self.venue)
+        self.vip = PriceCategory(pk="vip", event=self.event)
+        self.general = PriceCategory(pk="general", event=self.event)
+        self.stalls = Section(pk="s1", venue=self.venue)
+
+    def _compile(self, *rules):
+        queryset = mock.Mock()
+        queryset.select_related.return_value.order_by.return_value = list(rules)
+        with mock.patch.object(PriceRule.objects, "filter", return_value=queryset):
+            return compile_rules("e1")
+
+    def test_first_matching_rule_wins(self):
+        sql, params = self._compile(
+            PriceRule(event=self.event, price_category=self.vip, section=self.stalls, row_from=0, row_to=4),
+            PriceRule(event=self.event, price_category=self.general, seat_type="accessible"),
+            PriceRule(event=self.event, price_category=self.general),
+        )
+        # Un CASE evalúa las ramas en orden: la primera regla que encaja gana
+        self.assertEqual(sql.count("WHEN"), 3)
+        self.assertLess(sql.index("r.section_id"), sql.index("s.seat_type"))
+        self.assertTrue(sql.rstrip(") ").endswith("WHEN TRUE THEN %s END"))
+        self.assertEqual(params, ["s1", 0, 4, "vip", "accessible", "general", "general"])
+        self.assertEqual(self._compile(), ("NULL", []))
+
+    def test_rules_outside_the_event_are_rejected(self):
+        other_event = Event(pk="e2", venue=self.venue)
+        other_venue_section = Section(pk="s9", venue=Venue(pk="v2"))
+        rules = (
+            PriceRule(pk="r1", event=self.event, price_category=PriceCategory(pk="c9", event=other_event)),
+            PriceRule(pk="r2", event=self.event, price_category=self.vip, section=other_venue_section),
+            PriceRule(pk="r3", event=self.event, price_category=self.vip, section=self.stalls),
+        )
+        with self.assertRaises(InvalidPriceRules) as ctx:
+            self._compile(*rules)
+        self.assertEqual(ctx.exception.status_code, 422)
+        self.assertEqual(set(ctx.exception.extra["rules"]), {"r1", "r2"})
+        self.assertEqual(set(ctx.exception.extra["rules"]["r1"]), {"price_category"})
+        self.assertEqual(set(ctx.exception.extra["rules"]["r2"]), {"section"})
+
+
+class ComputePricesTests(SimpleTestCase):
+    FLAT = {**DEFAULT_RULES, "DEMAND_CURVE": [(0.0, 1.0), (1.0, 1.0)]}
+
+    def _arrays(self, base, row_order, seat_type=None, status=None, section=None, category=None):
+        n = len(base)
+        return {
+            "n": n,
+            "base": np.asarray(base, dtype=np.float64),
+            "row_order": np.asarray(row_order, dtype=np.int64),
+            "seat_type": np.asarray(seat_type or [0] * n, dtype=np.int8),
+            "status": np.asarray(status or [0] * n, dtype=np.int8),
+            "section": np.asarray(section or [0] * n, dtype=np.int64),
+            "category": np.asarray(category or [0] * n, dtype=np.int64),
+        }
+
+    def test_row_decay_floor_and_seat_type(self):
+        # Fila relativa a la primera de cada sección; tipo 1 = vip (x1.5)
+        arrays = self._arrays([100] * 5, [3, 4, 40, 7, 8], seat_type=[0, 0, 0, 1, 0], section=[0, 0, 0, 1, 1])
+        self.assertEqual(compute_prices(arrays, self.FLAT).tolist(), [100.0, 98.0, 70.0, 150.0, 98.0])
+
+    def test_factor_is_clamped(self):
+        arrays = self._arrays([10, 10], [0, 1], seat_type=[1, 0])
+        rules = {**self.FLAT, "SEAT_TYPE_FACTORS": {"vip": 10.0}, "ROW_DECAY": 0.9, "ROW_FLOOR": 0.0}
+        self.assertEqual(compute_prices(arrays, rules).tolist(), [30.0, 5.0])
+
+    def test_rounding_step(self):
+        arrays = self._arrays([33.33, 33.1], [0, 0])
+        self.assertEqual(compute_prices(arrays, self.FLAT).tolist(), [33.5, 33.0])
+        prices = compute_prices(arrays, {**self.FLAT, "ROUND_TO": 0})
+        self.assertEqual(np.round(prices, 2).tolist(), [33.33, 33.1])
+
+    def test_demand_by_occupancy(self):
+        # Sección 0 medio llena (factor 1.0), sección 1 vacía (0.9); 1 = held
+        arrays = self._arrays([100] * 4, [0] * 4, status=[1, 0, 0, 0], section=[0, 0, 1, 1], category=[0, 0, 0, 0])
+        self.assertEqual(compute_prices(arrays, DEFAULT_RULES).tolist(), [100.0, 100.0, 90.0, 90.0])
+        # Por categoría, un precio uniforme: ocupación 1/4 -> 0.9 + 0.1 * 0.5
+        self.assertEqual(compute_prices(arrays, DEFAULT_RULES, mode="category").tolist(), [95.0] * 4)
+
+
+class SpatialIndexTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.x, self.y = rng.uniform(0, 1000, 2000), rng.uniform(0, 600, 2000)
+        self.ids = [f"s{i}" for i in range(2000)]
+        self.index = SpatialIndex.build(self.ids, self.x, self.y, cell=32.0)
+
+    def _brute(self, qx, qy, k, max_distance=None):
+        dist = np.hypot(self.x - qx, self.y - qy)
+        order = [i for i in np.argsort(dist, kind="stable") if max_distance is None or dist[i] <= max_distance]
+        return [self.ids[i] for i in order[:k]]
+
+    def test_nearest_matches_brute_force(self):
+        queries = [(500, 300), (0, 0), (-400, -250), (1500, 300), (480, 2000), (999.5, 0.5)]
+        for qx, qy in queries:
+            for k, max_distance in ((1, None), (7, None), (5, 40.0), (3, 1.0)):
+                with self.subTest(point=(qx, qy), k=k, max_distance=max_distance):
+                    got = self.index.nearest(qx, qy, k=k, max_distance=max_distance)
+                    self.assertEqual([pk for pk, _ in got], self._brute(qx, qy, k, max_distance))
+                    self.assertTrue(all(max_distance is None or d <= max_distance for _, d in got))
+
+    def test_in_polygon_matches_brute_force(self):
+        square = [[100, 100], [400, 100], [400, 350], [100, 350]]
+        expected = {pk for pk, px, py in zip(self.ids, self.x, self.y) if 100 < px < 400 and 100 < py < 350}
+        self.assertEqual(set(self.index.in_polygon(square)), expected)
+        self.assertEqual(self.index.in_polygon([[-50, -50], [-10, -50], [-10, -10]]), [])
+
+
+class StatusPackingTests(SimpleTestCase):
+    def test_round_trip(self):
+        rng = np.random.default_rng(5)
+        for count in range(0, 11):
+            codes = rng.integers(0, 4, count).tolist()
+            with self.subTest(count=count):
+                packed = pack_statuses(codes)
+                self.assertEqual(len(packed), (count + 3) // 4)
+                self.assertEqual(unpack_statuses(packed, count), codes)
+        # El primer asiento en los bits menos significativos
+        self.assertEqual(pack_statuses([1, 2, 0, 3, 2]), bytes([0b11001001, 0b10]))
+
+    def test_expired_hold_is_available(self):
+        now = timezone.now()
+        self.assertEqual(status_code("held", now - timedelta(seconds=1), now), 0)
+        self.assertEqual(status_code("held", now + timedelta(seconds=1), now), 1)
+        self.assertEqual(status_code("booked", None, now), 2)
+
+
+class ResolveTileTests(SimpleTestCase):
+    def _resolve(self, zoom, x, y, seat_zoom=3):
+        with mock.patch.object(tiles, "seat_zoom_of", return_value=seat_zoom), \
+                mock.patch.object(tiles, "get_tile", side_effect=lambda h, *args: args) as get_tile:
+            return tiles.resolve_tile("hash", zoom, x, y), get_tile
+
+    def test_above_seat_zoom_maps_to_the_containing_seats_tile(self):
+        self.assertEqual(self._resolve(5, 13, 22)[0], ("seats", 3, 3, 5))
+        self.assertEqual(self._resolve(3, 7, 0)[0], ("seats", 3, 7, 0))
+        self.assertEqual(self._resolve(2, 1, 3)[0], ("rows", 2, 1, 3))
+
+    def test_out_of_range_tiles(self):
+        for zoom, x, y in ((2, 4, 0), (0, 0, 1), (3, -1, 0)):
+            with self.subTest(tile=(zoom, x, y)):
+                result, get_tile = self._resolve(zoom, x, y)
+                self.assertIsNone(result)
+                get_tile.assert_not_called()
+        self.assertIsNone(self._resolve(4, 1, 1, seat_zoom=None)[0])
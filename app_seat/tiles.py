@@ -0,0 +1,316 @@
+# app_seat/tiles.py
+"""
+Teselas del plano por zona y nivel de detalle (para estadios grandes).
+
+Las teselas son de un plano publicado (PublishedSeatMap), no del diseño en
+edición: `build_tiles()` se ejecuta al publicar y recorta los asientos del
+documento publicado en una pirámide de teselas cuadradas sobre sus
+límites: en el zoom z hay 2^z × 2^z teselas. `seat_zoom` es el primer zoom
+en el que ninguna tesela supera TILE_MAX_SEATS asientos (máximo MAX_ZOOM):
+
+- outline (una): límites, contornos de sección, leyenda y lista de
+  teselas no vacías por zoom. Es lo primero que carga el cliente.
+- rows (z < seat_zoom): cada fila como polilínea de 3 puntos
+  (extremos y centro) con su número de asientos.
+- seats (z = seat_zoom): asientos individuales en columnas. Zooms mayores
+  se sirven con la tesela de seat_zoom que los contiene.
+
+Cada tesela se guarda como JSON comprimido con gzip y su sha256 (ETag) en
+SeatMapTile. Como la versión publicada no cambia, sus teselas tampoco: se
+identifican por el content_hash del plano publicado y se cachean sin
+invalidación. El estado de los asientos no va en la tesela:
+`manifest_positions()` da, para los asientos de una tesela, su índice en
+el manifiesto del evento (el de los snapshots de disponibilidad).
+"""
+import gzip
+import hashlib
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+
+from .availability import get_manifest
+from .models import EventSeat, PublishedSeatMap, SeatMapTile
+
+TILES_FORMAT = 1
+TILE_MAX_SEATS = getattr(settings, "SEAT_TILE_MAX_SEATS", 2000)
+MAX_ZOOM = getattr(settings, "SEAT_TILE_MAX_ZOOM", 6)
+TILE_TTL = getattr(settings, "SEAT_TILE_TTL", 60 * 60)
+
+_ACCEPTS_GZIP = re.compile(r"\bgzip\b(?!\s*;\s*q=0(?:\.0*)?(?![\d.]))")
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """True si la cabecera Accept-Encoding admite gzip (y no con q=0)."""
+    return bool(_ACCEPTS_GZIP.search(accept_encoding or ""))
+
+
+def _tile_key(content_hash: str, kind: str, zoom: int, x: int, y: int) -> str:
+    return f"seatmap-tile:{content_hash}:{kind}:{zoom}:{x}:{y}"
+
+
+def _levels_key(content_hash: str) -> str:
+    return f"seatmap-tile-levels:{content_hash}"
+
+
+def encode_json(doc: Dict) -> Tuple[str, bytes]:
+    body = json.dumps(doc, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(body).hexdigest(), gzip.compress(body, compresslevel=9, mtime=0)
+
+
+def _round(values: np.ndarray) -> List[float]:
+    return np.round(values, 1).tolist()
+
+
+def _cells(x: np.ndarray, y: np.ndarray, origin: Tuple[float, float], size: float, zoom: int):
+    n = 1 << zoom
+    tx = np.clip(((x - origin[0]) / size * n).astype(np.int64), 0, n - 1)
+    ty = np.clip(((y - origin[1]) / size * n).astype(np.int64), 0, n - 1)
+    return tx, ty
+
+
+def _seat_zoom(x, y, origin, size) -> int:
+    for zoom in range(MAX_ZOOM + 1):
+        tx, ty = _cells(x, y, origin, size, zoom)
+        if not len(x) or np.bincount(ty * (1 << zoom) + tx).max() <= TILE_MAX_SEATS:
+            return zoom
+    return MAX_ZOOM
+
+
+def section_polygons(data: Dict) -> Dict[str, List[List[float]]]:
+    """Contornos {nombre: [[x, y], ...]} del modelo de secciones que guarda el diseñador."""
+    out = {}
+    for sec in (data or {}).get("sections") or []:
+        points = [
+            [round(float(p["x"]), 1), round(float(p["y"]), 1)]
+            for p in sec.get("polygon") or []
+            if isinstance(p, dict) and isinstance(p.get("x"), (int, float)) and isinstance(p.get("y"), (int, float))
+        ]
+        if len(points) >= 3 and sec.get("name"):
+            out[str(sec["name"]).strip()] = points
+    return out
+
+
+def build_tiles(published: PublishedSeatMap) -> Dict:
+    """(Re)genera todas las teselas de un plano publicado. Devuelve un resumen."""
+    doc = json.loads(gzip.decompress(bytes(published.data_gzip)))
+    columns = doc["seats"]
+    sections = doc["sections"]
+    doc_rows = doc["rows"]
+    # Solo asientos con posición; en el orden del documento publicado
+    placed = [i for i, (sx, sy) in enumerate(zip(columns["x"], columns["y"])) if sx is not None and sy is not None]
+    seats = [
+        (columns["id"][i], columns["x"][i], columns["y"][i], columns["number"][i], columns["type"][i],
+         doc_rows[columns["row"][i]]["id"], doc_rows[columns["row"][i]]["name"],
+         sections[doc_rows[columns["row"][i]]["section"]]["id"])
+        for i in placed
+    ]
+    polygons = {sec["name"]: sec["polygon"] for sec in sections if sec.get("polygon")}
+
+    n = len(seats)
+    x = np.fromiter((s[1] for s in seats), dtype=np.float64, count=n)
+    y = np.fromiter((s[2] for s in seats), dtype=np.float64, count=n)
+    section_of = np.array([s[7] for s in seats], dtype=object)
+    xs = np.concatenate([x] + [np.array(p)[:, 0] for p in polygons.values()])
+    ys = np.concatenate([y] + [np.array(p)[:, 1] for p in polygons.values()])
+    if len(xs):
+        origin = (float(xs.min()), float(ys.min()))
+        size = max(float(xs.max()) - origin[0], float(ys.max()) - origin[1], 1.0)
+    else:
+        origin, size = (0.0, 0.0), 1.0
+    seat_zoom = _seat_zoom(x, y, origin, size)
+
+    tiles: List[SeatMapTile] = []
+
+    def add(kind, zoom, tx, ty, count, doc):
+        content_hash, data_gzip = encode_json(doc)
+        tiles.append(SeatMapTile(
+            published=published, kind=kind, zoom=zoom, tile_x=tx, tile_y=ty,
+            seat_count=count, content_hash=content_hash, data_gzip=data_gzip,
+        ))
+
+    # --- filas (para los zooms de resumen) ---
+    rows: Dict[str, List[int]] = {}
+    for i, seat in enumerate(seats):
+        rows.setdefault(seat[5], []).append(i)
+    # El documento ordena por número: la polilínea sigue la fila por su eje más largo
+    for row_id, idx in rows.items():
+        along = x[idx] if np.ptp(x[idx]) >= np.ptp(y[idx]) else y[idx]
+        rows[row_id] = [idx[k] for k in np.argsort(along, kind="stable").tolist()]
+    row_ids = list(rows)
+    row_mid = np.array([rows[r][len(rows[r]) // 2] for r in row_ids], dtype=np.int64)
+
+    levels: Dict[int, List[List[int]]] = {}
+    for zoom in range(seat_zoom):
+        rtx, rty = _cells(x[row_mid], y[row_mid], origin, size, zoom)
+        by_tile: Dict[Tuple[int, int], List[int]] = {}
+        for j, key in enumerate(zip(rtx.tolist(), rty.tolist())):
+            by_tile.setdefault(key, []).append(j)
+        levels[zoom] = []
+        for (tx, ty), members in sorted(by_tile.items()):
+            out, count = [], 0
+            for j in members:
+                idx = rows[row_ids[j]]
+                ends = [idx[0], idx[len(idx) // 2], idx[-1]]
+                count += len(idx)
+                out.append({
+                    "id": row_ids[j],
+                    "name": seats[idx[0]][6],
+                    "section": seats[idx[0]][7],
+                    "seats": len(idx),
+                    "line": [[round(x[k], 1), round(y[k], 1)] for k in ends],
+                })
+            add("rows", zoom, tx, ty, count, {"format": TILES_FORMAT, "z": zoom, "x": tx, "y": ty, "rows": out})
+            levels[zoom].append([tx, ty, count])
+
+    # --- asientos (nivel de detalle) ---
+    tx, ty = _cells(x, y, origin, size, seat_zoom)
+    order = np.lexsort((np.arange(n), tx, ty))
+    bounds = np.flatnonzero(np.diff(ty[order] * (1 << seat_zoom) + tx[order])) + 1
+    levels[seat_zoom] = []
+    for group in (np.split(order, bounds) if n else []):
+        group = np.sort(group)  # orden de filas/posiciones dentro de la tesela
+        gx, gy = int(tx[group[0]]), int(ty[group[0]])
+        tile_rows: Dict[str, int] = {}
+        for k in group.tolist():
+            tile_rows.setdefault(seats[k][5], len(tile_rows))
+        add("seats", seat_zoom, gx, gy, len(group), {
+            "format": TILES_FORMAT,
+            "z": seat_zoom,
+            "x": gx,
+            "y": gy,
+            "rows": [
+                {"id": row_id, "name": seats[rows[row_id][0]][6], "section": seats[rows[row_id][0]][7]}
+                for row_id in tile_rows
+            ],
+            "seats": {
+                "id": [seats[k][0] for k in group.tolist()],
+                "x": _round(x[group]),
+                "y": _round(y[group]),
+                "number": [seats[k][3] for k in group.tolist()],
+                "type": [seats[k][4] for k in group.tolist()],
+                "row": [tile_rows[seats[k][5]] for k in group.tolist()],
+            },
+        })
+        levels[seat_zoom].append([gx, gy, len(group)])
+
+    # --- contorno ---
+    outline_sections = []
+    for sec in sections:
+        pk, name, category, order_val = sec["id"], sec["name"], sec["category"], sec["order"]
+        mask = section_of == pk
+        polygon = sec.get("polygon")
+        if polygon is None and mask.any():
+            # Sin contorno en el plano: el rectángulo de sus asientos
+            x0, y0, x1, y1 = x[mask].min(), y[mask].min(), x[mask].max(), y[mask].max()
+            polygon = [[round(x0, 1), round(y0, 1)], [round(x1, 1), round(y0, 1)],
+                       [round(x1, 1), round(y1, 1)], [round(x0, 1), round(y1, 1)]]
+        if polygon is None:
+            continue
+        outline_sections.append({
+            "id": pk,
+            "name": name,
+            "category": category,
+            "order": order_val,
+            "seats": int(mask.sum()),
+            "polygon": polygon,
+        })
+    outline_sections.sort(key=lambda s: (s["order"], s["name"]))
+    add("outline", 0, 0, 0, n, {
+        "format": TILES_FORMAT,
+        "seatmap": published.seatmap_id,
+        "version": published.seatmap_version,
+        "content_hash": published.content_hash,
+        "origin": [round(origin[0], 1), round(origin[1], 1)],
+        "size": round(size, 1),
+        "seat_zoom": seat_zoom,
+        "seats": n,
+        "legend": doc.get("legend") or [],
+        "sections": outline_sections,
+        "tiles": {str(zoom): tiles_at for zoom, tiles_at in levels.items()},
+    })
+
+    # Solo se regeneran si cambian TILE_MAX_SEATS / MAX_ZOOM (o el formato)
+    content_hash = published.content_hash
+    with transaction.atomic():
+        stale = [
+            _tile_key(content_hash, *key)
+            for key in published.tiles.values_list("kind", "zoom", "tile_x", "tile_y")
+        ]
+        published.tiles.all().delete()
+        SeatMapTile.objects.bulk_create(tiles, batch_size=500)
+        stale += [_tile_key(content_hash, t.kind, t.zoom, t.tile_x, t.tile_y) for t in tiles]
+        stale.append(_levels_key(content_hash))
+        transaction.on_commit(lambda: cache.delete_many(stale))
+    return {
+        "seats": n,
+        "seat_zoom": seat_zoom,
+        "tiles": len(tiles),
+        "bytes": sum(len(t.data_gzip) for t in tiles),
+    }
+
+
+def get_tile(content_hash: str, kind: str, zoom: int = 0, x: int = 0, y: int = 0) -> Optional[Tuple[str, bytes]]:
+    """(content_hash de la tesela, gzip) de una tesela del plano publicado, o None si no existe."""
+    key = _tile_key(content_hash, kind, zoom, x, y)
+    hit = cache.get(key)
+    if hit is None:
+        row = (
+            SeatMapTile.objects.filter(
+                published__content_hash=content_hash, kind=kind, zoom=zoom, tile_x=x, tile_y=y
+            )
+            .values_list("content_hash", "data_gzip")
+            .first()
+        )
+        # Las teselas vacías también se cachean, como hash vacío
+        hit = (row[0], bytes(row[1])) if row else ("", b"")
+        cache.set(key, hit, TILE_TTL)
+    return hit if hit[0] else None
+
+
+def seat_zoom_of(content_hash: str) -> Optional[int]:
+    """Zoom de detalle del plano publicado, o None si no tiene teselas."""
+    zoom = cache.get(_levels_key(content_hash))
+    if zoom is None:
+        tiles = SeatMapTile.objects.filter(published__content_hash=content_hash)
+        zoom = tiles.filter(kind="seats").aggregate(z=Max("zoom"))["z"]
+        if zoom is None and tiles.filter(kind="outline").exists():
+            zoom = 0  # plano sin asientos
+        cache.set(_levels_key(content_hash), -1 if zoom is None else zoom, TILE_TTL)
+    return None if zoom == -1 else zoom
+
+
+def resolve_tile(content_hash: str, zoom: int, x: int, y: int) -> Optional[Tuple[str, bytes]]:
+    """Tesela que cubre z/x/y: de filas por debajo de seat_zoom, de asientos a partir de él."""
+    if not (0 <= x < (1 << zoom) and 0 <= y < (1 << zoom)):
+        return None
+    seat_zoom = seat_zoom_of(content_hash)
+    if seat_zoom is None:
+        return None
+    if zoom < seat_zoom:
+        return get_tile(content_hash, "rows", zoom, x, y)
+    shift = zoom - seat_zoom
+    return get_tile(content_hash, "seats", seat_zoom, x >> shift, y >> shift)
+
+
+def manifest_positions(event_id, seat_ids: List[str]) -> Dict:
+    """
+    {"manifest_version", "index": [...]}: posición en el manifiesto del
+    evento de cada Seat de `seat_ids` (None si el evento no lo incluye).
+    """
+    manifest = get_manifest(event_id)
+    key = f"seat-tile-index:{event_id}:{manifest['version']}"
+    lookup = cache.get(key)
+    if lookup is None:
+        seat_of = dict(EventSeat.objects.filter(event_id=event_id).order_by().values_list("pk", "seat_id"))
+        lookup = {seat_of[pk]: i for i, pk in enumerate(manifest["seats"]) if pk in seat_of}
+        cache.set(key, lookup, TILE_TTL)
+    return {
+        "manifest_version": manifest["version"],
+        "index": [lookup.get(seat_id) for seat_id in seat_ids],
+    }
@@ -1,10 +1,12 @@
 # urls.py
 from django.urls import path
-from .views import seatmap_load, seatmap_save
+from .views import seatmap_generate, seatmap_load, seatmap_save, seatmap_sync_status
 
 app_name = "designer"
 
 urlpatterns = [
     path("venues/<int:venue_id>/seatmap/load/", seatmap_load, name="seatmap_load"),
     path("venues/<int:venue_id>/seatmap/save/", seatmap_save, name="seatmap_save"),
+    path("venues/<int:venue_id>/seatmap/generate/", seatmap_generate, name="seatmap_generate"),
+    path("venues/<int:venue_id>/seatmap/sync/", seatmap_sync_status, name="seatmap_sync_status"),
 ]
@@ -0,0 +1,343 @@
+# app_seat/validation.py
+"""
+Validación del plano antes de guardarlo (sin tocar la base de datos).
+
+`validate_seatmap(data)` reproduce lo que hará la sincronización (mismas
+secciones, mismo agrupado en filas, misma numeración) y devuelve errores
+estructurados para lo que la rompería o dejaría datos incoherentes:
+
+- seat_overlap: círculos que se solapan. Hash espacial: celdas del tamaño
+  de un diámetro típico (percentil 95), cada asiento solo se compara con su
+  celda y las vecinas (pares generados por bloques con NumPy), O(n)
+  esperado; los círculos mayores se comparan aparte con las celdas a su
+  alcance. Se deja de buscar al pasar de MAX_ISSUES errores.
+- duplicate_number: dos asientos con el mismo número en la misma fila
+  (violaría unique (row, number)).
+- outside_section: centro del asiento fuera del contorno de su sección
+  (data["sections"][*].polygon, en coordenadas del canvas).
+- invalid_seat / invalid_section / number_too_long / name_too_long
+  (sección o fila).
+
+Los asientos sin sección conocida no se sincronizan: se avisan (warnings)
+pero no bloquean el guardado.
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+from django.conf import settings
+
+from .clustering import assign_rows, row_params
+from .models import Row, Seat, Section
+
+# Solape: distancia entre centros < (r1 + r2) * OVERLAP_RATIO
+OVERLAP_RATIO = getattr(settings, "SEAT_MAP_OVERLAP_RATIO", 0.9)
+MAX_ISSUES = getattr(settings, "SEAT_MAP_MAX_ISSUES", 200)
+# Las celdas del hash espacial se dimensionan con este percentil del radio
+CELL_PERCENTILE = 95
+# Pares candidatos comparados por bloque
+CANDIDATE_CHUNK = 1 << 20
+
+_NUMBER_MAX = Seat._meta.get_field("number").max_length
+_SECTION_NAME_MAX = Section._meta.get_field("name").max_length
+_ROW_NAME_MAX = Row._meta.get_field("name").max_length
+
+
+def _number(value) -> Optional[float]:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value) if np.isfinite(value) else None
+
+
+class _Report:
+    def __init__(self):
+        self.errors: List[Dict] = []
+        self.warnings: List[Dict] = []
+        self.truncated = False
+
+    def add(self, bucket: List[Dict], code: str, message: str, **extra) -> None:
+        if len(bucket) >= MAX_ISSUES:
+            self.truncated = True
+            return
+        bucket.append({"code": code, "message": message, **extra})
+
+    def error(self, code: str, message: str, **extra) -> None:
+        self.add(self.errors, code, message, **extra)
+
+    def warning(self, code: str, message: str, **extra) -> None:
+        self.add(self.warnings, code, message, **extra)
+
+    def as_dict(self) -> Dict:
+        return {"errors": self.errors, "warnings": self.warnings, "truncated": self.truncated}
+
+
+def _grid(x: np.ndarray, y: np.ndarray, cell: float):
+    """Rejilla de celdas `cell` x `cell`: (x0, y0, span, orden por celda, celdas, inicios, tamaños)."""
+    x0, y0 = float(x.min()), float(y.min())
+    gx = ((x - x0) // cell).astype(np.int64)
+    gy = ((y - y0) // cell).astype(np.int64) + 1  # margen para dy = -1
+    span = int(gy.max()) + 2
+    keys = gx * span + gy
+    order = np.argsort(keys, kind="stable")
+    cells, starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+    return x0, y0, span, order, cells, starts, counts
+
+
+def _grid_pairs(x, y, r, ratio, grid, limit) -> List[np.ndarray]:
+    """Solapes entre círculos de la rejilla (todos con r <= celda / (2 * ratio))."""
+    _, _, span, order, cells, starts, counts = grid
+    pairs, found = [], 0
+    # Celda propia y la mitad de las vecinas: cada par se visita una vez
+    for dx, dy in ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1)):
+        target = cells + dx * span + dy
+        pos = np.minimum(np.searchsorted(cells, target), len(cells) - 1)
+        has = cells[pos] == target
+        a = np.flatnonzero(has)
+        if not len(a):
+            continue
+        b = pos[has]
+        ca, cb = counts[a], counts[b]
+        sizes = ca * cb
+        ends = np.cumsum(sizes)
+        # Por bloques: una celda con miles de asientos apilados no genera todos sus pares de golpe
+        for lo in range(0, int(ends[-1]), CANDIDATE_CHUNK):
+            k = np.arange(lo, min(lo + CANDIDATE_CHUNK, int(ends[-1])))
+            owner = np.searchsorted(ends, k, side="right")
+            offset = k - (ends - sizes)[owner]
+            i = order[starts[a][owner] + offset // cb[owner]]
+            j = order[starts[b][owner] + offset % cb[owner]]
+            if (dx, dy) == (0, 0):
+                keep = i < j
+                i, j = i[keep], j[keep]
+            close = np.hypot(x[i] - x[j], y[i] - y[j]) < (r[i] + r[j]) * ratio
+            pairs.append(np.column_stack((np.minimum(i, j), np.maximum(i, j)))[close])
+            found += len(pairs[-1])
+            if limit is not None and found >= limit:
+                return pairs
+    return pairs
+
+
+def _large_pairs(x, y, r, ratio, large, small, grid, cell, small_r, limit) -> List[np.ndarray]:
+    """Solapes de cada círculo grande con los pequeños de las celdas a su alcance."""
+    x0, y0, span, order, cells, starts, counts = grid
+    gx_max = int(cells.max() // span)
+    pairs, found = [], 0
+    for i in large.tolist():
+        reach = (r[i] + small_r) * ratio
+        gy_lo = int((y[i] - reach - y0) // cell) + 1
+        gy_hi = int((y[i] + reach - y0) // cell) + 1
+        if gy_hi < 0 or gy_lo >= span:
+            continue
+        gy_lo, gy_hi = max(gy_lo, 0), min(gy_hi, span - 1)
+        members = []
+        for gx in range(max(int((x[i] - reach - x0) // cell), 0), min(int((x[i] + reach - x0) // cell), gx_max) + 1):
+            lo = np.searchsorted(cells, gx * span + gy_lo)
+            hi = np.searchsorted(cells, gx * span + gy_hi, side="right")
+            if lo < hi:
+                members.append(order[starts[lo]:starts[hi - 1] + counts[hi - 1]])
+        if not members:
+            continue
+        j = small[np.concatenate(members)]
+        j = j[np.hypot(x[j] - x[i], y[j] - y[i]) < (r[j] + r[i]) * ratio]
+        if len(j):
+            pairs.append(np.column_stack((np.minimum(i, j), np.maximum(i, j))))
+            found += len(j)
+            if limit is not None and found >= limit:
+                break
+    return pairs
+
+
+def overlapping_pairs(x: np.ndarray, y: np.ndarray, r: np.ndarray, ratio: float = OVERLAP_RATIO,
+                      limit: Optional[int] = None) -> np.ndarray:
+    """
+    Pares (i, j), i < j, de círculos que se solapan. Array (k, 2); con
+    `limit`, deja de buscar en cuanto tiene ese número de pares.
+    """
+    empty = np.empty((0, 2), dtype=np.int64)
+    n = len(x)
+    if n < 2 or limit == 0:
+        return empty
+    # Celdas del tamaño de un radio típico: unos pocos círculos enormes no
+    # agrandan todas las celdas; se comparan aparte
+    small_r = float(np.percentile(r, CELL_PERCENTILE))
+    is_large = r > small_r
+    small, large = np.flatnonzero(~is_large), np.flatnonzero(is_large)
+    pairs = []
+
+    def remaining():
+        return None if limit is None else limit - sum(len(p) for p in pairs)
+
+    cell = max(2 * small_r * ratio, 1e-6)
+    xs, ys, rs = x[small], y[small], r[small]
+    grid = _grid(xs, ys, cell)
+    pairs += [small[p] for p in _grid_pairs(xs, ys, rs, ratio, grid, remaining())]
+    if len(large) and remaining() != 0:
+        pairs += _large_pairs(x, y, r, ratio, large, small, grid, cell, small_r, remaining())
+    # Grandes entre sí: mismo método sobre el subconjunto (su percentil excluye al menos al menor)
+    if len(large) >= 2 and remaining() != 0:
+        pairs.append(large[overlapping_pairs(x[large], y[large], r[large], ratio, remaining())])
+    out = np.concatenate(pairs) if pairs else empty
+    return out if limit is None else out[:limit]
+
+
+def points_in_polygon(x: np.ndarray, y: np.ndarray, polygon: np.ndarray) -> np.ndarray:
+    """Máscara de puntos dentro del polígono (regla par-impar)."""
+    inside = np.zeros(len(x), dtype=bool)
+    xj, yj = polygon[-1]
+    for xi, yi in polygon:
+        crosses = (yi > y) != (yj > y)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            at = (xj - xi) * (y - yi) / (yj - yi) + xi
+        inside ^= crosses & (x < at)
+        xj, yj = xi, yi
+    return inside
+
+
+def _polygons_by_key(data: Dict) -> Dict[str, np.ndarray]:
+    out = {}
+    for sec in data.get("sections") or []:
+        if not isinstance(sec, dict):
+            continue
+        points = [
+            (_number(p.get("x")), _number(p.get("y")))
+            for p in sec.get("polygon") or [] if isinstance(p, dict)
+        ]
+        if len(points) >= 3 and all(px is not None and py is not None for px, py in points):
+            key = sec.get("key") or str(sec.get("name") or "").strip().lower()
+            out[key] = np.array(points, dtype=np.float64)
+    return out
+
+
+def _check_protected(report: "_Report", protected: List[Dict], ids: set, seen: Dict[tuple, int]) -> None:
+    # La sincronización conserva un asiento si sigue su id del canvas o su (sección, fila, número)
+    for seat in protected:
+        if seat["canvas_id"] and seat["canvas_id"] in ids:
+            continue
+        if (seat["section"], seat["row"], seat["number"]) in seen:
+            continue
+        report.error(
+            "seat_in_use", "Seat is held or booked and cannot be removed",
+            ids=[seat["canvas_id"]], section=seat["section"], row=seat["row"], number=seat["number"],
+        )
+
+
+def validate_seatmap(data: Dict, protected: Optional[List[Dict]] = None) -> Dict:
+    """
+    {"errors": [...], "warnings": [...], "truncated": bool}; sin errores se puede guardar.
+    `protected`: asientos retenidos o vendidos ({"canvas_id", "section", "row",
+    "number"}) que el documento no puede quitar.
+    """
+    protected = protected or []
+    report = _Report()
+    if not isinstance(data, dict):
+        report.error("invalid_document", "Seat map data must be an object")
+        return report.as_dict()
+    fabric = data.get("fabric") or {}
+    objects = fabric.get("objects") if isinstance(fabric, dict) else None
+    if not isinstance(objects, list):
+        report.error("invalid_document", "fabric.objects must be a list")
+        return report.as_dict()
+
+    # --- secciones (como en la sincronización) ---
+    sections: Dict[str, str] = {}
+    for index, obj in enumerate(objects):
+        if not isinstance(obj, dict):
+            continue
+        if obj.get("kind") == "section" and obj.get("type") in ("polygon", "polyline", "path"):
+            name = str(obj.get("section_name") or "Sección").strip()
+            key = obj.get("section_key") or name.lower()
+            if len(name) > _SECTION_NAME_MAX:
+                report.error("name_too_long", f"Section name longer than {_SECTION_NAME_MAX} characters",
+                             objects=[index], section=name[:40])
+            order_val = obj.get("section_order")
+            if order_val is None:
+                order_val = obj.get("order") or 0
+            try:
+                int(order_val)
+            except (TypeError, ValueError):
+                report.error("invalid_section", "Section order must be an integer",
+                             objects=[index], section=name)
+            sections[key] = name
+
+    # --- asientos ---
+    seats = []  # (índice del objeto, clave de sección, cx, cy, r, número, id, fila del canvas, índice de fila)
+    for index, obj in enumerate(objects):
+        if not isinstance(obj, dict) or obj.get("kind") != "seat" or obj.get("type") != "circle":
+            continue
+        left, top, radius = _number(obj.get("left")), _number(obj.get("top")), _number(obj.get("radius"))
+        if left is None or top is None or radius is None or radius <= 0:
+            report.error("invalid_seat", "Seat has no valid position or radius",
+                         objects=[index], ids=[obj.get("id")])
+            continue
+        skey = obj.get("section_key") or ""
+        if skey not in sections:
+            report.warning("seat_without_section", "Seat is not inside any section and will not be saved",
+                           objects=[index], ids=[obj.get("id")])
+            continue
+        number = str(obj.get("number") or "").strip()
+        row_name = str(obj.get("row_name") or "").strip()
+        if len(row_name) > _ROW_NAME_MAX:
+            report.error("name_too_long", f"Row name longer than {_ROW_NAME_MAX} characters",
+                         objects=[index], ids=[obj.get("id")], row=row_name[:40])
+        seats.append((index, skey, left + radius, top + radius, radius, number, obj.get("id"),
+                      row_name, obj.get("row_index")))
+
+    if not seats:
+        _check_protected(report, protected, set(), {})
+        return report.as_dict()
+
+    n = len(seats)
+    x = np.fromiter((s[2] for s in seats), dtype=np.float64, count=n)
+    y = np.fromiter((s[3] for s in seats), dtype=np.float64, count=n)
+    r = np.fromiter((s[4] for s in seats), dtype=np.float64, count=n)
+
+    # --- solapes ---
+    # Uno más que MAX_ISSUES: el informe marca `truncated` si hay más
+    for i, j in overlapping_pairs(x, y, r, limit=MAX_ISSUES + 1).tolist():
+        report.error(
+            "seat_overlap", "Seats overlap",
+            objects=[seats[i][0], seats[j][0]], ids=[seats[i][6], seats[j][6]],
+            section=sections[seats[i][1]],
+        )
+
+    # --- contorno de sección ---
+    polygons = _polygons_by_key(data)
+    keys = np.array([s[1] for s in seats], dtype=object)
+    for skey, polygon in polygons.items():
+        mask = keys == skey
+        if not mask.any():
+            continue
+        members = np.flatnonzero(mask)
+        outside = members[~points_in_polygon(x[members], y[members], polygon)]
+        for i in outside.tolist():
+            report.error(
+                "outside_section", "Seat is outside its section",
+                objects=[seats[i][0]], ids=[seats[i][6]], section=sections[seats[i][1]],
+            )
+
+    # --- filas y números (mismo agrupado y numeración que la sincronización) ---
+    tolerance, layout, centre = row_params(data)
+    by_key: Dict[str, List[Dict]] = {}
+    for i, seat in enumerate(seats):
+        if len(seat[5]) > _NUMBER_MAX:
+            report.error("number_too_long", f"Seat number longer than {_NUMBER_MAX} characters",
+                         objects=[seat[0]], ids=[seat[6]], number=seat[5])
+        by_key.setdefault(seat[1], []).append(
+            {"cx": seat[2], "cy": seat[3], "row": seat[7] or None, "row_index": seat[8], "i": i}
+        )
+    # Claves distintas con el mismo nombre comparten sección (y filas) en la BD
+    seen: Dict[tuple, int] = {}
+    for skey, items in by_key.items():
+        section_name = sections[skey]
+        for row_name, row_items in assign_rows(items, tolerance, layout, centre):
+            for seat_idx, item in enumerate(row_items, start=1):
+                i = item["i"]
+                number = seats[i][5] or str(seat_idx)
+                first = seen.setdefault((section_name, row_name, number), i)
+                if first != i:
+                    report.error(
+                        "duplicate_number", f"Duplicate seat number {number} in row {row_name}",
+                        objects=[seats[first][0], seats[i][0]], ids=[seats[first][6], seats[i][6]],
+                        section=section_name, row=row_name, number=number,
+                    )
+    _check_protected(report, protected, {str(s[6])[:64] for s in seats if s[6]}, seen)
+    return report.as_dict()
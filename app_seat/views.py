@@ -1,67 +1,77 @@
 # views.py
 from django.db import transaction
-from django.http import JsonResponse
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
 from django.views.decorators.http import require_http_methods
 
-from .models import Venue, SeatMap, Section, Row, Seat
+from .adjacency import rebuild_seat_positions
+from .spatial import invalidate_spatial
+from .clustering import assign_rows, row_params
+from .generator import merge_generated
+from .json_body import read_json_body
+from .models import Venue, SeatMap, Section, Row, Seat, EventSeat
+from .seatmap_history import VersionConflict, apply_patch, save_seatmap
+from .services import SeatServiceError, SeatsInUse
+from .sync_jobs import enqueue_sync, job_status, sync_now
+from .tiles import accepts_gzip
+from .validation import validate_seatmap
 
-import json
+import gzip
 from math import isfinite
 
+# Estados de EventSeat que impiden borrar el asiento del plano
+PROTECTED_STATUSES = ("held", "booked")
 
-def _parse_json_body(request):
-    try:
-        return json.loads(request.body.decode("utf-8"))
-    except Exception:
-        return {}
-
-
-# --------- util de agrupado por Y (filas) ----------
-def _cluster_rows_y(points, tolerance):
-    """
-    points: [{"cx": float, "cy": float, ...}, ...]
-    Agrupa por Y con tolerancia y devuelve:
-      [{ "y": y_prom, "items": [point,...] }, ...] ordenado arriba->abajo.
-    """
-    pts = sorted(points, key=lambda p: p["cy"])
-    clusters = []
-    for p in pts:
-        if not clusters:
-            clusters.append({"ys": [p["cy"]], "items": [p]})
-            continue
-        last = clusters[-1]
-        last_mean = sum(last["ys"]) / len(last["ys"])
-        if abs(p["cy"] - last_mean) <= tolerance:
-            last["ys"].append(p["cy"])
-            last["items"].append(p)
-        else:
-            clusters.append({"ys": [p["cy"]], "items": [p]})
 
-    out = []
-    for c in clusters:
-        y_mean = sum(c["ys"]) / len(c["ys"])
-        out.append({"y": y_mean, "items": sorted(c["items"], key=lambda it: it["cx"])})
-    out.sort(key=lambda c: c["y"])
-    return out
+def _protected_seats(venue: Venue) -> list:
+    """Asientos del recinto retenidos o vendidos en algún evento (ver validate_seatmap)."""
+    rows = (
+        Seat.objects.filter(row__section__venue=venue, event_seats__status__in=PROTECTED_STATUSES)
+        .values_list("canvas_id", "row__section__name", "row__name", "number")
+        .distinct()
+    )
+    return [
+        {"canvas_id": canvas_id, "section": section, "row": row, "number": number}
+        for canvas_id, section, row, number in rows
+    ]
 
 
-def _row_name_for_index(idx: int) -> str:
-    # A, B, C ... R27, etc.
-    return chr(ord("A") + idx) if idx < 26 else f"R{idx + 1}"
+def _ensure_removable(seats) -> None:
+    """SeatsInUse si alguno de `seats` está retenido o vendido en algún evento."""
+    in_use = list(
+        EventSeat.objects.filter(seat__in=seats, status__in=PROTECTED_STATUSES)
+        .order_by("seat__row__section__name", "seat__row__name", "seat__number")
+        .values_list("seat__row__section__name", "seat__row__name", "seat__number")
+        .distinct()[:50]
+    )
+    if in_use:
+        raise SeatsInUse(
+            "The seat map would remove seats that are held or booked",
+            seats=[{"section": sec, "row": row, "number": number} for sec, row, number in in_use],
+        )
 
 
-def _sync_canvas_to_models(venue: Venue, data: dict) -> None:
+def _sync_canvas_to_models(venue: Venue, data: dict, progress=None) -> None:
     """
     Sincroniza el JSON de Fabric con Section/Row/Seat del venue.
-    - Borra secciones que ya no existan en el canvas.
-    - Upsert de secciones presentes (actualiza category y order si ese campo existe).
-    - Recrea filas/asientos desde los círculos del canvas.
+    `progress(porcentaje, etapa)`, si se da, se llama al empezar cada etapa.
+    - Empareja secciones por id de BD, clave del canvas o nombre, y las
+      renombra en sitio; borra las que ya no están en el canvas.
+    - Nunca borra asientos retenidos o vendidos: SeatsInUse (y la transacción
+      se deshace).
+    - Aplica a filas/asientos solo las diferencias con el canvas: los asientos
+      se emparejan por id del canvas o por (sección, fila, número) y conservan
+      su PK (y con ella sus EventSeat, retenciones y reservas).
     """
+    progress = progress or (lambda percent, stage: None)
     fabric = (data or {}).get("fabric", {})
     objects = fabric.get("objects", [])
 
     # --- 1) Secciones del canvas ---
+    progress(0, "sections")
     sections_from_canvas = []
     for obj in objects:
         if obj.get("kind") == "section" and obj.get("type") in ("polygon", "polyline", "path"):
@@ -74,41 +84,62 @@ def _sync_canvas_to_models(venue: Venue, data: dict) -> None:
             sections_from_canvas.append({
                 "name": name,
                 "key": key,
+                "db_id": str(obj.get("section_db_id") or ""),
                 "category": category,
                 "order": int(order_val),
             })
 
-    # --- 2) BORRADO: todo lo que no esté en el canvas desaparece de la BD ---
-    names_in_canvas = {s["name"] for s in sections_from_canvas}
-    if names_in_canvas:
-        Section.objects.filter(venue=venue).exclude(name__in=names_in_canvas).delete()
-    else:
-        Section.objects.filter(venue=venue).delete()
-
-    # --- 3) UPSERT de secciones presentes ---
-    section_by_key = {}
+    # --- 2) Emparejar con las existentes: id de BD, clave del canvas y por último nombre ---
+    # Varias claves del canvas con el mismo nombre comparten sección (gana la última)
+    groups = {}
     for sec in sections_from_canvas:
-        defaults = {"category": sec["category"]}
-        if hasattr(Section, "order"):  # por si tu modelo sí tiene 'order'
-            defaults["order"] = sec["order"]
-
-        s, _created = Section.objects.get_or_create(
-            venue=venue, name=sec["name"], defaults=defaults
-        )
+        groups.setdefault(sec["name"], []).append(sec)
+    existing_sections = list(Section.objects.filter(venue=venue))
+    lookups = (
+        ({s.pk: s for s in existing_sections}, lambda name, secs: [sec["db_id"] for sec in secs]),
+        ({s.canvas_key: s for s in existing_sections if s.canvas_key}, lambda name, secs: [sec["key"] for sec in secs]),
+        ({s.name: s for s in existing_sections}, lambda name, secs: [name]),
+    )
+    by_name, claimed = {}, set()
+    for index, candidates in lookups:
+        for name, secs in groups.items():
+            if name in by_name:
+                continue
+            for ident in candidates(name, secs):
+                found = index.get(ident)
+                if found is not None and found.pk not in claimed:
+                    by_name[name] = found
+                    claimed.add(found.pk)
+                    break
 
-        to_update = []
-        if getattr(s, "category", "") != sec["category"]:
-            s.category = sec["category"]
-            to_update.append("category")
-        if hasattr(Section, "order") and getattr(s, "order", 0) != sec["order"]:
-            s.order = sec["order"]
-            to_update.append("order")
-        if to_update:
-            s.save(update_fields=to_update)
+    # --- 3) BORRADO de las que ya no están (nunca con asientos retenidos o vendidos) ---
+    stale_sections = [s.pk for s in existing_sections if s.pk not in claimed]
+    _ensure_removable(Seat.objects.filter(row__section_id__in=stale_sections))
+    Section.objects.filter(pk__in=stale_sections).delete()
 
-        section_by_key[sec["key"]] = s
+    # --- 4) Renombrar/actualizar en sitio y crear las nuevas ---
+    renamed = [sec for name, sec in by_name.items() if sec.name != name]
+    # Nombres temporales para que un intercambio no choque con unique (venue, name)
+    Section.objects.bulk_update([Section(pk=sec.pk, name=f"~{sec.pk}") for sec in renamed], ["name"])
+    new_sections = []
+    for name, secs in groups.items():
+        last = secs[-1]
+        section = by_name.get(name)
+        if section is None:
+            section = by_name[name] = Section(venue=venue)
+            new_sections.append(section)
+        section.name, section.category, section.order, section.canvas_key = (
+            name, last["category"], last["order"], last["key"],
+        )
+    Section.objects.bulk_update(
+        [sec for sec in by_name.values() if sec not in new_sections],
+        ["name", "category", "order", "canvas_key"],
+    )
+    Section.objects.bulk_create(new_sections)
+    section_by_key = {sec["key"]: by_name[sec["name"]] for sec in sections_from_canvas}
 
-    # --- 4) Recolectar seats por sección ---
+    # --- 5) Recolectar seats por sección ---
+    progress(15, "clustering")
     seats_by_section = {}
     for obj in objects:
         if obj.get("kind") == "seat" and obj.get("type") == "circle":
@@ -125,36 +156,165 @@ def _sync_canvas_to_models(venue: Venue, data: dict) -> None:
                 "cy": cy,
                 "number": str(obj.get("number") or "").strip(),
                 "seat_type": obj.get("seat_type") or "standard",
+                "canvas_id": str(obj.get("id") or "")[:64],
+                "row": obj.get("row_name") or None,
+                "row_index": obj.get("row_index"),
             })
 
-    # --- 5) Limpiar filas/asientos de secciones presentes y recrearlas ---
-    for section in section_by_key.values():
-        section.rows.all().delete()
-
-    ui = data.get("ui", {}) if isinstance(data, dict) else {}
-    gapY = ui.get("gapY") if isinstance(ui, dict) else None
-    tolerance = 0.6 * (gapY if isinstance(gapY, (int, float)) else 26) or 15.0
+    # --- 6) Filas y asientos deseados (filas del canvas o agrupadas; posición a lo largo de la fila) ---
+    tolerance, layout, arc_centre = row_params(data)
 
+    desired_rows = {}   # (section_id, row_name) -> order
+    desired = []        # un dict por asiento del canvas
+    seen_canvas_ids = set()
     for skey, items in seats_by_section.items():
         section = section_by_key[skey]
-        clusters = _cluster_rows_y(items, tolerance)
-        for i, cluster in enumerate(clusters):
-            row = Row.objects.create(section=section, name=_row_name_for_index(i), order=i)
-            for seat_idx, it in enumerate(cluster["items"], start=1):
-                Seat.objects.create(
-                    row=row,
-                    number=(it["number"] or str(seat_idx)),
-                    seat_type=it["seat_type"],
-                )
+        for i, (row_name, row_items) in enumerate(assign_rows(items, tolerance, layout, arc_centre)):
+            desired_rows[(section.pk, row_name)] = i
+            for seat_idx, it in enumerate(row_items, start=1):
+                canvas_id = it["canvas_id"]
+                if canvas_id in seen_canvas_ids:
+                    canvas_id = ""  # copia con id repetido: se empareja por número
+                seen_canvas_ids.add(canvas_id)
+                desired.append({
+                    "row_key": (section.pk, row_name),
+                    "number": it["number"] or str(seat_idx),
+                    "seat_type": it["seat_type"],
+                    "position": seat_idx,  # items ya ordenados dentro de la fila
+                    "canvas_id": canvas_id,
+                    "x": it["cx"],
+                    "y": it["cy"],
+                })
+
+    # --- 7) Filas: reutiliza por (sección, nombre), crea las nuevas ---
+    progress(40, "rows")
+    section_ids = [sec.pk for sec in section_by_key.values()]
+    rows_by_key = {(r.section_id, r.name): r for r in Row.objects.filter(section_id__in=section_ids)}
+    new_rows = [
+        Row(section_id=key[0], name=key[1], order=order)
+        for key, order in desired_rows.items() if key not in rows_by_key
+    ]
+    Row.objects.bulk_create(new_rows, batch_size=1000)
+    rows_by_key.update({(r.section_id, r.name): r for r in new_rows})
+    moved_rows = []
+    for key, order in desired_rows.items():
+        row = rows_by_key[key]
+        if row.order != order:
+            row.order = order
+            moved_rows.append(row)
+    Row.objects.bulk_update(moved_rows, ["order"], batch_size=1000)
+
+    # --- 8) Asientos: emparejar por canvas_id y si no por (sección, fila, número) ---
+    progress(55, "seats")
+    existing = list(
+        Seat.objects.filter(row__section_id__in=section_ids)
+        .select_related("row")
+        .only("id", "row_id", "row__section_id", "row__name", "number", "seat_type", "position", "canvas_id", "x", "y")
+    )
+    by_canvas = {seat.canvas_id: seat for seat in existing if seat.canvas_id}
+    by_number = {(seat.row.section_id, seat.row.name, seat.number): seat for seat in existing}
+    matched = {}
+    for item in desired:
+        seat = by_canvas.get(item["canvas_id"]) if item["canvas_id"] else None
+        if seat is not None:
+            matched[seat.pk] = seat
+            item["seat"] = seat
+    for item in desired:
+        seat = None if "seat" in item else by_number.get((*item["row_key"], item["number"]))
+        if seat is not None and seat.pk not in matched:
+            matched[seat.pk] = seat
+            item["seat"] = seat
+
+    to_update, renumbered = [], []
+    for item in desired:
+        seat = item.get("seat")
+        if seat is None:
+            continue
+        values = {
+            "row_id": rows_by_key[item["row_key"]].pk,
+            "number": item["number"],
+            "seat_type": item["seat_type"],
+            "position": item["position"],
+            "canvas_id": item["canvas_id"] or seat.canvas_id,
+            "x": item["x"],
+            "y": item["y"],
+        }
+        if all(getattr(seat, f) == v for f, v in values.items()):
+            continue
+        if (seat.row_id, seat.number) != (values["row_id"], values["number"]):
+            renumbered.append(seat)
+        for f, v in values.items():
+            setattr(seat, f, v)
+        to_update.append(seat)
+
+    # Borrados primero: liberan (fila, número) para los que se mueven o crean
+    stale = [seat.pk for seat in existing if seat.pk not in matched]
+    _ensure_removable(Seat.objects.filter(pk__in=stale))
+    Seat.objects.filter(pk__in=stale).delete()
+    # Números temporales para que un intercambio no choque con unique (row, number)
+    Seat.objects.bulk_update(
+        [Seat(pk=seat.pk, number=f"~{i}") for i, seat in enumerate(renumbered)], ["number"]
+    )
+    Seat.objects.bulk_update(
+        to_update, ["row", "number", "seat_type", "position", "canvas_id", "x", "y"], batch_size=1000
+    )
+    Seat.objects.bulk_create(
+        [
+            Seat(
+                row=rows_by_key[item["row_key"]],
+                number=item["number"],
+                seat_type=item["seat_type"],
+                position=item["position"],
+                canvas_id=item["canvas_id"],
+                x=item["x"],
+                y=item["y"],
+            )
+            for item in desired if "seat" not in item
+        ],
+        batch_size=1000,
+    )
+    Row.objects.filter(section_id__in=section_ids).exclude(
+        pk__in=[rows_by_key[key].pk for key in desired_rows]
+    ).delete()
+
+    # Posiciones de filas que no vienen del canvas + invalidar índices de adyacencia
+    progress(90, "positions")
+    rebuild_seat_positions(venue.pk)
+    # Tras el commit: antes, otra petición reconstruiría el índice con los asientos viejos
+    venue_id = venue.pk
+    transaction.on_commit(lambda: invalidate_spatial(venue_id))
+
+
+def _seatmap_response(request, seatmap: SeatMap) -> HttpResponse:
+    """
+    Respuesta cacheable del plano: 304 si el ETag coincide; si no, el cuerpo
+    precomprimido tal cual (o descomprimido si el cliente no acepta gzip).
+    """
+    etag = quote_etag(seatmap.content_hash)
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        response = HttpResponseNotModified()
+    elif accepts_gzip(request.headers.get("Accept-Encoding", "")):
+        response = HttpResponse(bytes(seatmap.data_gzip), content_type="application/json")
+        response["Content-Encoding"] = "gzip"
+    else:
+        response = HttpResponse(gzip.decompress(seatmap.data_gzip), content_type="application/json")
+    response["ETag"] = etag
+    patch_vary_headers(response, ["Accept-Encoding"])
+    # El navegador guarda la copia pero revalida siempre (los planos cambian al guardar)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 @require_http_methods(["GET"])
 def seatmap_load(request, venue_id: int):
     venue = get_object_or_404(Venue, pk=venue_id)
-    seatmap = venue.seatmaps.order_by("-created_at").first()
-    if not seatmap or not seatmap.data:
+    # Sin el JSON completo: se sirve data_gzip, ya serializado al guardar
+    # (los planos anteriores a la precompresión se rellenan en la migración 0027)
+    seatmap = venue.seatmaps.defer("data").order_by("-created_at").first()
+    if not seatmap or not seatmap.content_hash:
         return JsonResponse({
             "ok": True,
+            "version": seatmap.version if seatmap else 0,
             "data": {
                 "engine": "fabric",
                 "legend": [],
@@ -162,24 +322,158 @@ def seatmap_load(request, venue_id: int):
                 "fabric": {"version": "5.3.0", "objects": []},
             },
         })
-    return JsonResponse({"ok": True, "data": seatmap.data})
+    return _seatmap_response(request, seatmap)
+
+
+def _candidate_document(venue: Venue, data, patch, base_version):
+    """Documento que quedaría guardado (el parche se aplica sobre una lectura sin bloqueo)."""
+    if patch is None:
+        return data
+    current = venue.seatmaps.filter(name="Diseño actual").only("pk", "data", "version").first()
+    if current is not None and base_version is not None and base_version != current.version:
+        raise VersionConflict(
+            "The seat map was modified by another save",
+            version=current.version,
+            base_version=base_version,
+        )
+    return apply_patch(current.data if current else {}, patch)
 
 
 @require_http_methods(["POST"])
 @transaction.atomic
 def seatmap_save(request, venue_id: int):
+    """
+    Cuerpo: {"data": {...}} (documento completo) o
+    {"base_version": n, "patch": [operaciones RFC 6902]}. Con base_version,
+    responde 409 si el plano ya no está en esa versión; 422 con la lista de
+    errores si el plano no pasa la validación (no se escribe nada). El cuerpo
+    se lee por bloques (app_seat.json_body): 413 si supera el límite, 400 con
+    línea y columna si el JSON está mal formado.
+    """
     venue = get_object_or_404(Venue, pk=venue_id)
-    body = _parse_json_body(request)
-    data = body.get("data")
-    if not data:
+    try:
+        body = read_json_body(request)
+    except SeatServiceError as exc:
+        return JsonResponse({"ok": False, "error": str(exc), **exc.extra}, status=exc.status_code)
+    data, patch = body.get("data"), body.get("patch")
+    if not data and patch is None:
         return JsonResponse({"ok": False, "error": "Sin payload"}, status=400)
+    base_version = body.get("base_version")
+    if base_version is not None and (isinstance(base_version, bool) or not isinstance(base_version, int)):
+        return JsonResponse({"ok": False, "error": "base_version must be an integer"}, status=400)
+
+    # 1) Validar el documento resultante antes de escribir o bloquear nada
+    try:
+        report = validate_seatmap(
+            _candidate_document(venue, data, patch, base_version), protected=_protected_seats(venue)
+        )
+    except SeatServiceError as exc:
+        return JsonResponse({"ok": False, "error": str(exc), **exc.extra}, status=exc.status_code)
+    if report["errors"]:
+        return JsonResponse({
+            "ok": False,
+            "error": f"The seat map has {len(report['errors'])} validation errors",
+            **report,
+        }, status=422)
+
+    # 2) Guardar JSON (nueva versión + historial) para re-editar
+    seatmap, _ = SeatMap.objects.get_or_create(venue=venue, name="Diseño actual")
+    try:
+        seatmap = save_seatmap(
+            seatmap,
+            base_version=base_version,
+            data=data if patch is None else None,
+            patch=patch,
+            user=request.user,
+        )
+    except SeatServiceError as exc:
+        return JsonResponse({"ok": False, "error": str(exc), **exc.extra}, status=exc.status_code)
+
+    # 3) Sincronizar a las tablas (incluye BORRADOS) en segundo plano
+    job = enqueue_sync(seatmap)
+
+    return JsonResponse({
+        "ok": True,
+        "seatmap_id": seatmap.id,
+        "version": seatmap.version,
+        "warnings": report["warnings"],
+        "sync": job_status(job),
+        "sync_url": reverse("designer:seatmap_sync_status", args=[venue.pk]),
+    })
+
+
+@require_http_methods(["POST"])
+@transaction.atomic
+def seatmap_generate(request, venue_id: int):
+    """
+    Genera secciones paramétricas (ver app_seat.generator) y las sincroniza
+    en la misma petición. Cuerpo: {"sections": [especificaciones],
+    "replace": bool, "base_version": n}. Las secciones del mismo nombre se
+    sustituyen; con "replace" se descarta el resto del plano. Si la
+    sincronización falla, se deshace todo y responde 500 con el error.
+    """
+    venue = get_object_or_404(Venue, pk=venue_id)
+    try:
+        body = read_json_body(request)
+    except SeatServiceError as exc:
+        return JsonResponse({"ok": False, "error": str(exc), **exc.extra}, status=exc.status_code)
+    base_version = body.get("base_version")
+    if base_version is not None and (isinstance(base_version, bool) or not isinstance(base_version, int)):
+        return JsonResponse({"ok": False, "error": "base_version must be an integer"}, status=400)
 
-    # 1) Guardar JSON para re-editar
     seatmap, _ = SeatMap.objects.get_or_create(venue=venue, name="Diseño actual")
-    seatmap.data = data
-    seatmap.save()
+    try:
+        data, summary = merge_generated(seatmap.data, body.get("sections"), replace=bool(body.get("replace")))
+    except SeatServiceError as exc:
+        return JsonResponse({"ok": False, "error": str(exc), **exc.extra}, status=exc.status_code)
+    report = validate_seatmap(data, protected=_protected_seats(venue))
+    if report["errors"]:
+        return JsonResponse({
+            "ok": False,
+            "error": f"The generated seat map has {len(report['errors'])} validation errors",
+            **report,
+        }, status=422)
 
-    # 2) Sincronizar a las tablas (incluye BORRADOS)
-    _sync_canvas_to_models(venue, data)
+    try:
+        seatmap = save_seatmap(seatmap, base_version=base_version, data=data, user=request.user)
+    except SeatServiceError as exc:
+        return JsonResponse({"ok": False, "error": str(exc), **exc.extra}, status=exc.status_code)
+    job = sync_now(seatmap)
+    if job.status == "failed":
+        # Sin sincronizar no se guarda nada: ni la versión nueva ni el trabajo
+        transaction.set_rollback(True)
+        return JsonResponse({
+            "ok": False,
+            "error": "The generated seat map could not be synchronised",
+            "detail": job.error,
+        }, status=500)
+
+    return JsonResponse({
+        "ok": True,
+        "seatmap_id": seatmap.id,
+        "version": seatmap.version,
+        "sections": summary,
+        "warnings": report["warnings"],
+        "sync": job_status(job),
+    })
 
-    return JsonResponse({"ok": True, "seatmap_id": seatmap.id})
+
+@require_http_methods(["GET"])
+def seatmap_sync_status(request, venue_id: int):
+    """
+    Estado de la sincronización del plano con las tablas: el trabajo pedido
+    (?job=<id>) o el último del recinto. `synced_version` es la última
+    versión del plano ya reflejada en Section/Row/Seat.
+    """
+    venue = get_object_or_404(Venue, pk=venue_id)
+    jobs = venue.sync_jobs.order_by("-created_at")
+    job = jobs.filter(pk=request.GET["job"]).first() if request.GET.get("job") else jobs.first()
+    if job is None and request.GET.get("job"):
+        return JsonResponse({"ok": False, "error": "Job not found"}, status=404)
+    synced = jobs.filter(status="done").values_list("seatmap_version", flat=True).first()
+    return JsonResponse({
+        "ok": True,
+        "job": job_status(job) if job else None,
+        "pending": jobs.filter(status__in=["queued", "running"]).exists(),
+        "synced_version": synced,
+    })
@@ -18,8 +18,8 @@ sio = socketio.AsyncServer(
 )
 
 
-# from .socket_handlers import register_socket_handlers
-# register_socket_handlers(sio)
+from .socket_handlers import register_socket_handlers
+register_socket_handlers(sio)
 
 # ⚙️ FastAPI y middlewares
 from fastapi import FastAPI, Depends
@@ -37,6 +37,7 @@ import mimetypes
 apps.populate(settings.INSTALLED_APPS)
 
 from app_user.router import router as router_user
+from app_seat.router import router as router_seat
 # from core.utils import JwtBearer
 # from web.utils import CustomResponse
 # from web.exception_handlers import custom_http_exception_handler, custom_validation_exception_handler
@@ -80,6 +81,7 @@ def get_application() -> FastAPI:
     mount_from_settings(app)
     # 📦 Rutas protegidas y públicas
     app.include_router(router_user, prefix="/api/auth")
+    app.include_router(router_seat, prefix="/api/seats")
     # app.include_router(user_router, prefix="/api/auth")
     # app.include_router(driver_router_public, prefix="/api/public/driver")
 
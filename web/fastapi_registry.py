@@ -5,7 +5,7 @@ from decimal import Decimal
 import importlib
 import warnings
 
-from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi import APIRouter, HTTPException, Query, Depends, Header
 from pydantic import BaseModel, create_model, ConfigDict
 
 from django.conf import settings
@@ -188,6 +188,14 @@ class ModelOptions(BaseModel):
     auth: Optional[bool] = None
     auth_methods: Optional[List[str]] = None
 
+    # Dependencias extra ("modulo:funcion"), p. ej. control de admisión
+    dependencies: Optional[List[str]] = None
+    dependency_methods: Optional[List[str]] = None
+
+    # Manejador propio de PUT/PATCH ("modulo:funcion"), p. ej. compare-and-swap.
+    # Firma: handler(pk, payload: dict, if_match: Optional[str]) -> instancia
+    update_handler: Optional[str] = None
+
     # Expansiones
     expand_allowed: Optional[List[str]] = None
     expand_default: Optional[List[str]] = None
@@ -241,6 +249,19 @@ def _needs_auth(method: str, opts: ModelOptions) -> bool:
     return bool(opts.auth)
 
 
+def _deps_for(method: str, opts: ModelOptions, auth_dependency: Optional[Callable]) -> List[Any]:
+    """Dependencias de una ruta: auth (si aplica) + dependencias extra del modelo."""
+    deps = [Depends(auth_dependency)] if (auth_dependency and _needs_auth(method, opts)) else []
+    if opts.dependencies:
+        methods = {m.upper() for m in (opts.dependency_methods or [])}
+        if not methods or method.upper() in methods:
+            for path in opts.dependencies:
+                dep = _load_dependency(path)
+                if dep is not None:
+                    deps.append(Depends(dep))
+    return deps
+
+
 # ============================================================
 # Expansiones (expand=foo&expand=bar.baz)
 # ============================================================
@@ -344,6 +365,9 @@ def _get_model_opts(model_cls: Type[Model]) -> "ModelOptions":
         default_order=raw.get("default_order"),
         auth=raw.get("auth"),
         auth_methods=raw.get("auth_methods"),
+        dependencies=raw.get("dependencies"),
+        dependency_methods=raw.get("dependency_methods"),
+        update_handler=raw.get("update_handler"),
         expand_allowed=raw.get("expand_allowed"),
         expand_default=raw.get("expand_default") or [],
         expand_max_depth=int(raw.get("expand_max_depth", 2)),
@@ -428,7 +452,7 @@ def build_router(
     pk_typ = _py_type_for_field(model._meta.pk)
 
     # ---- LIST (GET /)
-    deps_list = [Depends(auth_dependency)] if (auth_dependency and _needs_auth("GET", opts)) else []
+    deps_list = _deps_for("GET", opts, auth_dependency)
 
     @r.get("/", response_model=List[OutSchema], dependencies=deps_list)  # type: ignore[name-defined]
     def list_items(
@@ -455,7 +479,7 @@ def build_router(
         ]
 
     # ---- RETRIEVE (GET /{pk})
-    deps_retrieve = [Depends(auth_dependency)] if (auth_dependency and _needs_auth("GET", opts)) else []
+    deps_retrieve = _deps_for("GET", opts, auth_dependency)
 
     @r.get("/{pk}", response_model=OutSchema, dependencies=deps_retrieve)  # type: ignore[name-defined]
     def retrieve(pk: pk_typ, expand: List[str] = Query(default=[])):  # type: ignore[valid-type]
@@ -471,7 +495,7 @@ def build_router(
         return OutSchema(**_serialize_with_expand(obj, OutSchema, tree))  # type: ignore[name-defined]
 
     # ---- CREATE (POST /)
-    deps_create = [Depends(auth_dependency)] if (auth_dependency and _needs_auth("POST", opts)) else []
+    deps_create = _deps_for("POST", opts, auth_dependency)
 
     @r.post("/", response_model=OutSchema, status_code=201, dependencies=deps_create)  # type: ignore[name-defined]
     def create(item: InSchema):
@@ -494,21 +518,21 @@ def build_router(
         return retrieve(getattr(obj, model._meta.pk.name))  # type: ignore[arg-type]
 
     # ---- UPDATE (PUT /{pk})
-    deps_update_put = [Depends(auth_dependency)] if (auth_dependency and _needs_auth("PUT", opts)) else []
+    deps_update_put = _deps_for("PUT", opts, auth_dependency)
 
     @r.put("/{pk}", response_model=OutSchema, dependencies=deps_update_put)  # type: ignore[name-defined]
-    def update_put(pk: pk_typ, item: InSchema):  # type: ignore[valid-type]
-        return _update_common(model, pk, item)
+    def update_put(pk: pk_typ, item: InSchema, if_match: Optional[str] = Header(None)):  # type: ignore[valid-type]
+        return _update_common(model, pk, item, if_match)
 
     # ---- UPDATE (PATCH /{pk})
-    deps_update_patch = [Depends(auth_dependency)] if (auth_dependency and _needs_auth("PATCH", opts)) else []
+    deps_update_patch = _deps_for("PATCH", opts, auth_dependency)
 
     @r.patch("/{pk}", response_model=OutSchema, dependencies=deps_update_patch)  # type: ignore[name-defined]
-    def update_patch(pk: pk_typ, item: InSchema):  # type: ignore[valid-type]
-        return _update_common(model, pk, item)
+    def update_patch(pk: pk_typ, item: InSchema, if_match: Optional[str] = Header(None)):  # type: ignore[valid-type]
+        return _update_common(model, pk, item, if_match)
 
     # ---- DELETE (DELETE /{pk})
-    deps_delete = [Depends(auth_dependency)] if (auth_dependency and _needs_auth("DELETE", opts)) else []
+    deps_delete = _deps_for("DELETE", opts, auth_dependency)
 
     @r.delete("/{pk}", status_code=204, dependencies=deps_delete)  # type: ignore[name-defined]
     def delete(pk: pk_typ):  # type: ignore[valid-type]
@@ -519,7 +543,16 @@ def build_router(
     return r
 
 
-def _update_common(model: Type[Model], pk, item: BaseModel):
+def _update_common(model: Type[Model], pk, item: BaseModel, if_match: Optional[str] = None):
+    OutSchema = _get_out_schema_for(model)
+
+    handler_path = _get_model_opts(model).update_handler
+    if handler_path:
+        handler = _load_dependency(handler_path)
+        if handler is not None:
+            obj = handler(pk, item.model_dump(exclude_unset=True), if_match)
+            return OutSchema(**_build_out_data(obj, OutSchema))  # type: ignore[name-defined]
+
     try:
         obj = model.objects.get(pk=pk)
     except model.DoesNotExist:
@@ -543,7 +576,6 @@ def _update_common(model: Type[Model], pk, item: BaseModel):
             getattr(obj, name).set(ids)
 
     # Serialización igual a retrieve (sin expand)
-    OutSchema = _get_out_schema_for(model)
     return OutSchema(**_build_out_data(obj, OutSchema))  # type: ignore[name-defined]
 
 
@@ -551,17 +583,21 @@ def _update_common(model: Type[Model], pk, item: BaseModel):
 # Montaje desde settings
 # ============================================================
 
-def _load_auth_dependency() -> Optional[Callable]:
-    path = (getattr(settings, "GENERIC_API", {}) or {}).get("AUTH_DEPENDENCY")
-    if not path:
-        return None
+def _load_dependency(path: str) -> Optional[Callable]:
     try:
         module_path, func_name = path.split(":")
         module = importlib.import_module(module_path)
         return getattr(module, func_name)
     except Exception as exc:
-        warnings.warn(f"Could not load AUTH_DEPENDENCY '{path}': {exc}", RuntimeWarning)
+        warnings.warn(f"Could not load dependency '{path}': {exc}", RuntimeWarning)
+        return None
+
+
+def _load_auth_dependency() -> Optional[Callable]:
+    path = (getattr(settings, "GENERIC_API", {}) or {}).get("AUTH_DEPENDENCY")
+    if not path:
         return None
+    return _load_dependency(path)
 
 
 def mount_from_settings(fastapi_app) -> None:
@@ -596,6 +632,9 @@ def mount_from_settings(fastapi_app) -> None:
         default_order = opt_raw.get("default_order")
         auth = opt_raw.get("auth")
         auth_methods = opt_raw.get("auth_methods")
+        dependencies = opt_raw.get("dependencies")
+        dependency_methods = opt_raw.get("dependency_methods")
+        update_handler = opt_raw.get("update_handler")
         expand_allowed = opt_raw.get("expand_allowed")
         expand_default = opt_raw.get("expand_default")
         expand_max_depth = int(opt_raw.get("expand_max_depth", 2))
@@ -608,6 +647,9 @@ def mount_from_settings(fastapi_app) -> None:
             default_order=default_order,
             auth=auth,
             auth_methods=auth_methods,
+            dependencies=dependencies,
+            dependency_methods=dependency_methods,
+            update_handler=update_handler,
             expand_allowed=expand_allowed,
             expand_default=expand_default or [],
             expand_max_depth=expand_max_depth,
@@ -130,6 +130,53 @@ CACHES = {
 }
 # LOGIN_REDIRECT_URL = "/admin/"
 
+# Socket.IO: intervalo (segundos) de agrupado de cambios de estado de asientos
+SEAT_BROADCAST_INTERVAL = 0.1
+
+# Sala de espera virtual para on-sales (app_seat.admission); la cola la avanza
+# `manage.py run_waiting_room_ticker` (un único proceso)
+SEAT_ADMISSION = {
+    # "app_seat.admission.InMemoryQueueBackend" para un único nodo
+    "BACKEND": "app_seat.admission.DatabaseQueueBackend",
+    "RATE_PER_SECOND": 50,
+    "BURST": 100,
+    "TOKEN_MAX_AGE": 2 * 60 * 60,  # ticket de cola
+    "PASS_MAX_AGE": 15 * 60,       # pase de admisión
+}
+
+# Retenciones de asientos (app_seat.services)
+SEAT_HOLD_TTL = 10 * 60
+SEAT_HOLD_MAX_SEATS = 500
+# Clave de los advisory locks de retención: "row" (evento, fila) o "section" (evento, sección)
+SEAT_HOLD_LOCK_GRANULARITY = "row"
+# Rechaza retenciones que dejen un asiento suelto en la fila (índice de adyacencia)
+SEAT_HOLD_NO_ORPHANS = True
+# Barrido de retenciones vencidas en el bucle de Socket.IO (app_seat.realtime)
+SEAT_HOLD_SWEEP_INTERVAL = 5.0
+SEAT_HOLD_SWEEP_BATCH = 5000
+# Índices de adyacencia que cada proceso guarda en memoria (eventos más recientes)
+SEAT_ADJACENCY_LOCAL_EVENTS = 16
+
+# Motor de precios dinámicos (app_seat.pricing); sobrescribe DEFAULT_RULES
+SEAT_PRICING = {
+    "DEMAND_SCOPE": "section",
+    "ROUND_TO": 0.5,
+}
+
+# Historial de planos (app_seat.seatmap_history): snapshot cada N versiones
+SEAT_MAP_SNAPSHOT_EVERY = 20
+SEAT_MAP_KEEP_SNAPSHOTS = 5
+# Tamaño máximo del cuerpo al guardar el plano (app_seat.json_body)
+SEAT_MAP_MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+
+# Teselas del plano (app_seat.tiles): asientos máximos por tesela de detalle
+SEAT_TILE_MAX_SEATS = 2000
+SEAT_TILE_MAX_ZOOM = 6
+
+# Generador paramétrico de secciones (app_seat.generator): límites por petición
+SEAT_GENERATOR_MAX_SEATS = 100_000
+SEAT_GENERATOR_MAX_ROWS = 500
+
 # LOGIN_REDIRECT_URL = 'admin:index'
 # TWO_FACTOR_PATCH_ADMIN = True
 
@@ -443,7 +490,7 @@ GENERIC_API = {
 
         # ============ Event ============
         "app_seat.Event": {
-            "include": ["id", "name", "slug", "venue", "seatmap", "start_datetime", "end_datetime", "description"],
+            "include": ["id", "name", "slug", "venue", "seatmap", "published_seatmap", "start_datetime", "end_datetime", "description"],
             "search_fields": ["name", "slug", "venue__name"],
             "default_order": "-start_datetime",
             "expand_allowed": [
@@ -468,9 +515,14 @@ GENERIC_API = {
 
         # ============ EventSeat ============
         "app_seat.EventSeat": {
-            "include": ["id", "event", "seat", "status", "price_category", "hold_expires_at"],
+            "include": ["id", "event", "seat", "status", "price_category", "price", "hold_expires_at", "version"],
             "search_fields": ["event__name", "seat__row__section__venue__name", "seat__row__section__name", "seat__row__name", "seat__number"],
             "default_order": "seat__row__section__name",
+            # Escritura solo para personal: los compradores usan retenciones y confirmación
+            "dependencies": ["app_seat.router:require_staff"],
+            "dependency_methods": ["POST", "PUT", "PATCH", "DELETE"],
+            # PUT/PATCH como compare-and-swap sobre `version` (cabecera If-Match)
+            "update_handler": "app_seat.router:update_event_seat",
             "expand_allowed": [
                 "event",
                 "seat",
@@ -485,6 +537,8 @@ GENERIC_API = {
             "include": ["id", "user", "event", "seats", "expires_at"],
             "search_fields": ["user__username", "event__name"],
             "default_order": "expires_at",
+            "dependencies": ["app_seat.admission:require_admission"],
+            "dependency_methods": ["POST", "PUT", "PATCH"],
             "expand_allowed": [
                 "user",
                 "event",
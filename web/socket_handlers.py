@@ -0,0 +1,40 @@
+# web/socket_handlers.py
+from app_seat.realtime import flush_loop, room_for_event
+
+
+def _event_id_from(data):
+    if isinstance(data, dict):
+        data = data.get("event_id") or data.get("event")
+    return str(data).strip() if data else None
+
+
+def register_socket_handlers(sio) -> None:
+    """
+    Registra los handlers de Socket.IO:
+      - join_event / leave_event: suscripción a la sala de un evento.
+      - Arranca (una sola vez) el bucle que emite los cambios agrupados.
+    """
+    state = {"flusher": None}
+
+    @sio.event
+    async def connect(sid, environ, auth=None):
+        # El bucle necesita un event loop corriendo: se lanza con la primera conexión
+        if state["flusher"] is None:
+            state["flusher"] = sio.start_background_task(flush_loop, sio)
+
+    @sio.on("join_event")
+    async def join_event(sid, data):
+        event_id = _event_id_from(data)
+        if not event_id:
+            return {"ok": False, "error": "event_id requerido"}
+        room = room_for_event(event_id)
+        await sio.enter_room(sid, room)
+        return {"ok": True, "room": room}
+
+    @sio.on("leave_event")
+    async def leave_event(sid, data):
+        event_id = _event_id_from(data)
+        if not event_id:
+            return {"ok": False, "error": "event_id requerido"}
+        await sio.leave_room(sid, room_for_event(event_id))
+        return {"ok": True}